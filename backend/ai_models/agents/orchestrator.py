@@ -69,14 +69,14 @@ class OrchestratorAgent(BaseAgent):
             model_preference = None
             if context and 'model_preference' in context:
                 model_preference = context['model_preference']
-                logger.info(f"Using model preference: {model_preference}")
+                logger.info("Using model preference: %s", model_preference)
             
             # OPTIMIZATION 1: Check cache first
             cache_key = self._get_cache_key(query, session_id, model_preference)
             if self.config.agent.enable_response_caching and cache_key in self.response_cache:
                 cached_time, cached_response = self.response_cache[cache_key]
                 if time.time() - cached_time < self.cache_ttl:
-                    logger.info(f"Returning cached response for query: {query[:50]}...")
+                    logger.info("Returning cached response for query: %.50s...", query)
                     return cached_response
             
             # Use provided conversation_history if present, else use backend memory
@@ -90,7 +90,7 @@ class OrchestratorAgent(BaseAgent):
             })
             
             # Step 1: Query Analysis and Decomposition
-            self.logger.info(f"Step 1: Analyzing query for session {session_id}")
+            self.logger.info("Step 1: Analyzing query for session %s", session_id)
             query_analysis = await self.query_agent(
                 query=query,
                 context={
@@ -146,7 +146,7 @@ class OrchestratorAgent(BaseAgent):
                 timeout=15  # Increased timeout
             )
             
-            self.logger.info(f"Verified {len(verified_results)} results")
+            self.logger.info("Verified %d results", len(verified_results))
             
             # Step 4: Synthesis
             self.logger.info("Step 4: Synthesizing final response")
@@ -19,6 +19,14 @@ from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field
 import uvicorn
 
+# orjson renders responses in C; ORJSONResponse itself needs the package installed
+try:
+    import orjson
+    from fastapi.responses import ORJSONResponse
+    DefaultResponse = ORJSONResponse
+except ImportError:
+    DefaultResponse = JSONResponse
+
 # Import your existing Genie AI system
 from main import GenieAI
 from config.settings import config
@@ -73,7 +81,8 @@ app = FastAPI(
     title="Genie AI API",
     description="AI Companion and Support System API",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=DefaultResponse
 )
 
 # Add CORS middleware to allow frontend connections
@@ -401,12 +410,12 @@ async def analyze_emotion(request: EmotionAnalysisRequest):
             if request.audio_format.lower() == "webm":
                 # Decode base64 to bytes for WebM processing
                 audio_bytes = base64.b64decode(request.audio_data)
-                emotion_results = emotion_service.analyze_emotion_from_webm(
+                emotion_results = await emotion_service.aanalyze_emotion_from_webm(
                     audio_bytes, top_k=request.top_emotions
                 )
             else:
                 # Use base64 analysis for other formats
-                emotion_results = emotion_service.analyze_emotion_from_base64(
+                emotion_results = await emotion_service.aanalyze_emotion_from_base64(
                     request.audio_data, top_k=request.top_emotions
                 )
         except Exception as analysis_error:
@@ -533,7 +542,7 @@ async def get_conversation_history(session_id: str):
 async def global_exception_handler(request, exc):
     """Global exception handler"""
     logger.error(f"Unhandled exception: {exc}", exc_info=True)
-    return JSONResponse(
+    return DefaultResponse(
         status_code=500,
         content={
             "error": "Internal server error",
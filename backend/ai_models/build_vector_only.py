@@ -22,7 +22,7 @@ sys.path.insert(0, str(project_root))
 # Import optimization and main modules
 from optimize_cpu import main as optimize_cpu
 from main import GenieAI
-from config.settings import config
+from config.index_files import INDEX_ARTIFACTS, index_paths, index_status
 
 async def check_existing_indexes():
     """Check what indexes already exist"""
@@ -30,32 +30,19 @@ async def check_existing_indexes():
     print("="*50)
     
     # Check index files
-    vector_faiss = Path(config.data.vector_store_path) / "mental_health_index.faiss"
-    vector_pkl = Path(config.data.vector_store_path) / "mental_health_index.pkl"
-    bm25_index = Path(config.data.ai_models_dir) / "indexes" / "bm25_index.pkl"
-    graph_index = Path(config.data.graph_store_path) / "knowledge_graph.pkl"
-    
-    # Check status
-    vector_exists = vector_faiss.exists() and vector_pkl.exists()
-    bm25_exists = bm25_index.exists()
-    graph_exists = graph_index.exists()
+    paths = index_paths()
+    status = index_status({name: path.exists() for name, path in paths.items()})
+    vector_exists, bm25_exists, graph_exists = status["vector"], status["bm25"], status["graph"]
     
     print(f"📊 INDEX STATUS:")
     print(f"  Vector Store: {'✅ EXISTS' if vector_exists else '❌ MISSING'}")
     print(f"  BM25 Index: {'✅ EXISTS' if bm25_exists else '❌ MISSING'}")
     print(f"  Knowledge Graph: {'✅ EXISTS' if graph_exists else '❌ MISSING'}")
     
-    if vector_exists:
-        vector_size = (vector_faiss.stat().st_size + vector_pkl.stat().st_size) / 1024 / 1024
-        print(f"  Vector Store Size: {vector_size:.1f} MB")
-    
-    if bm25_exists:
-        bm25_size = bm25_index.stat().st_size / 1024 / 1024
-        print(f"  BM25 Index Size: {bm25_size:.1f} MB")
-    
-    if graph_exists:
-        graph_size = graph_index.stat().st_size / 1024 / 1024
-        print(f"  Knowledge Graph Size: {graph_size:.1f} MB")
+    for name, label in (("vector", "Vector Store"), ("bm25", "BM25 Index"), ("graph", "Knowledge Graph")):
+        if status[name]:
+            size = sum(paths[a].stat().st_size for a in INDEX_ARTIFACTS[name] if paths[a].exists())
+            print(f"  {label} Size: {size / 1024 / 1024:.1f} MB")
     
     print("="*50)
     
@@ -93,7 +80,8 @@ async def build_vector_only():
         # Step 1: CPU Optimization (if needed)
         print("\n🚀 STEP 1: CPU OPTIMIZATION")
         print("-" * 30)
-        optimize_success = optimize_cpu()
+        # One builder process - keeps every core rather than binding to a NUMA node
+        optimize_success = optimize_cpu("process_pool", 1)
         if optimize_success:
             print("✅ CPU optimization completed")
         else:
@@ -0,0 +1,47 @@
+# config/index_files.py
+"""
+On-disk files that make up each search index - shared by the runtime
+and the setup scripts so they agree on what counts as built
+"""
+
+from pathlib import Path
+from typing import Dict
+
+from .settings import config
+
+# Artifact names of each index, as keyed in index_paths()
+INDEX_ARTIFACTS = {
+    "vector": ("vector_faiss", "vector_docs", "vector_offsets", "vector_pkl"),
+    "bm25": ("bm25", "bm25_matrix"),
+    "graph": ("graph",),
+}
+
+def index_paths() -> Dict[str, Path]:
+    """Standardized index paths"""
+    vector_base = Path(config.data.vector_store_path) / "mental_health_index"
+    index_dir = Path(config.data.ai_models_dir) / "indexes"
+    return {
+        "vector_faiss": vector_base.with_suffix(".faiss"),
+        "vector_docs": vector_base.with_suffix(".docs.jsonl"),
+        "vector_offsets": vector_base.with_suffix(".docs.npy"),
+        "vector_pkl": vector_base.with_suffix(".pkl"),  # Legacy sidecar
+        "bm25": index_dir / "bm25_index.pkl",
+        "bm25_matrix": index_dir / "bm25_index.npz",
+        "graph": Path(config.data.graph_store_path) / "knowledge_graph.pkl",
+    }
+
+def index_status(present: Dict[str, bool]) -> Dict[str, bool]:
+    """Which indexes can be loaded, given which artifact files exist"""
+    return {
+        "vector": present["vector_faiss"] and (
+            (present["vector_docs"] and present["vector_offsets"]) or present["vector_pkl"]
+        ),
+        # A pickle without its term matrix (e.g. from before the sparse format)
+        # is rebuilt from its own documents on load
+        "bm25": present["bm25"],
+        "graph": present["graph"],
+    }
+
+def check_index_status() -> Dict[str, bool]:
+    """Return which of the vector, BM25 and graph indexes exist on disk"""
+    return index_status({name: path.exists() for name, path in index_paths().items()})
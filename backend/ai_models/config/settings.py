@@ -53,6 +53,7 @@ class ModelConfig:
     
     # Embedding settings
     embedding_dim: int = 1024
+    embedding_batch_size: int = 64  # Texts per embedding forward pass - raised to 128 on GPU
     
     # API keys
     openai_api_key: str = os.getenv("OPENAI_API_KEY", "")
@@ -79,6 +80,10 @@ class RetrievalConfig:
     
     # Strategy thresholds
     use_multi_method_threshold: float = 0.7  # When to use multiple retrieval methods
+    
+    # Approximate vector search (IVF-PQ indexes only) - higher is more accurate but slower
+    ivf_nprobe: int = 16  # Inverted lists scanned per query
+    hnsw_ef_search: int = 64  # Candidate list size when searching the HNSW centroid graph
 
 @dataclass
 class AgentConfig:
@@ -103,6 +108,9 @@ class AgentConfig:
     # Verification settings
     max_to_verify: int = 5  # Limit verification for speed
     verification_batch_size: int = 3  # Process in small batches
+    
+    # Resident graph
+    graph_idle_ttl: int = 900  # Load the knowledge graph on first use, unload after this many idle seconds (0 = always resident)
 
 @dataclass
 class QualityConfig:
@@ -120,6 +128,9 @@ class QualityConfig:
     # Enhancement settings
     enable_cove_enhancement: bool = True
     cove_quality_threshold: float = 0.7  # Only enhance if below this quality
+    cove_cache_size: int = 128  # Refined responses kept for identical inputs
+    cove_cache_ttl: int = 3600  # Seconds a cached refinement stays valid
+    fact_check_max_concurrency: int = 5  # Parallel fact-check LLM calls, kept under provider rate limits
     
     # Response characteristics
     require_citations: bool = True
@@ -325,6 +336,9 @@ class Config:
                     gpu_memory_gb = torch.cuda.get_device_properties(0).total_memory / (1024**3)
                     logger.info(f"GPU detected: {gpu_name} with {gpu_memory_gb:.1f}GB memory")
                     
+                    # Larger forward batches are needed to saturate the GPU
+                    self.model.embedding_batch_size = 128
+                    
                     # Adjust embedding batch size for GPU
                     if gpu_memory_gb >= 6:
                         self.system.embedding_batch_size = min(1024, self.system.embedding_batch_size * 2)
@@ -7,7 +7,10 @@ Handles text embeddings for vector search
 import numpy as np
 from typing import List, Union, Any
 import torch
+import hashlib
 import logging
+import sqlite3
+import threading
 import warnings
 import multiprocessing
 
@@ -33,6 +36,50 @@ except ImportError as e:
 
 logger = logging.getLogger(__name__)
 
+SQLITE_MAX_PARAMS = 900  # Stay under SQLite's default 999 host parameter limit
+
+class EmbeddingCache:
+    """Persistent embedding cache keyed by the SHA-256 of model name and text"""
+    
+    def __init__(self, path: str, model_name: str):
+        self.path = str(path)
+        self.model_name = model_name
+        self._lock = threading.Lock()
+        # Index builders call in from worker threads
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS cache (key BLOB PRIMARY KEY, vec BLOB NOT NULL)")
+        self._conn.commit()
+    
+    def key(self, text: str) -> bytes:
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).digest()
+    
+    def get_many(self, keys: List[bytes]) -> dict:
+        """Return {key: vector} for the keys present in the cache"""
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), SQLITE_MAX_PARAMS):
+                chunk = keys[i:i + SQLITE_MAX_PARAMS]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vec FROM cache WHERE key IN ({placeholders})", chunk
+                )
+                for key, vec in rows:
+                    found[key] = np.frombuffer(vec, dtype=np.float32)
+        return found
+    
+    def put_many(self, keys: List[bytes], vectors: np.ndarray):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO cache (key, vec) VALUES (?, ?)",
+                ((key, vec.astype(np.float32).tobytes()) for key, vec in zip(keys, vectors))
+            )
+            self._conn.commit()
+    
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
 class EmbeddingManager:
     """Manages embedding models and operations"""
     
@@ -203,6 +250,28 @@ class EmbeddingManager:
                 return self.encode(texts, batch_size=batch_size // 2, show_progress_bar=show_progress_bar)
             raise
     
+    def encode_cached(self, texts: List[str], cache: EmbeddingCache,
+                      batch_size: int = None,
+                      show_progress_bar: bool = False) -> np.ndarray:
+        """Encode texts, reusing embeddings stored in the cache and storing new ones"""
+        keys = [cache.key(text) for text in texts]
+        cached = cache.get_many(keys)
+        
+        # Encode each distinct missing text once
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+        
+        if missing:
+            new_embeddings = self.encode(list(missing.values()), batch_size=batch_size,
+                                         show_progress_bar=show_progress_bar)
+            cache.put_many(list(missing.keys()), new_embeddings)
+            cached.update(zip(missing.keys(), new_embeddings))
+        
+        logger.info(f"💾 Embedding cache: {len(texts) - len(missing)}/{len(texts)} hits")
+        return np.stack([cached[key] for key in keys]).astype('float32')
+    
     async def aencode(self, texts: Union[str, List[str]]) -> np.ndarray:
         """Async encode texts (runs in thread pool)"""
         import asyncio
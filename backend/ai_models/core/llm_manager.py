@@ -1,4 +1,5 @@
 import os
+import httpx
 import torch
 from typing import Optional, Dict, Any
 from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
@@ -176,6 +177,10 @@ class LLMManager:
         # Cache for dynamic model instances
         self._model_cache = {}
         
+        # One keep-alive connection pool shared by every Groq model instance,
+        # so TLS sessions to the API survive across calls and models
+        self._http_client = httpx.Client(timeout=httpx.Timeout(60.0, connect=10.0))
+        
         self.setup_hybrid_llms()
     
     def setup_hybrid_llms(self):
@@ -237,7 +242,8 @@ class LLMManager:
             api_key=api_key,
             model_name=model,
             temperature=0.7,
-            max_tokens=1024
+            max_tokens=1024,
+            http_client=self._http_client
         )
     
     def _create_local_llm(self):
@@ -8,13 +8,16 @@ import os
 from pathlib import Path
 import pandas as pd
 import json
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator, Tuple
 import logging
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Metadata string values up to this length are treated as repeated labels and interned
+INTERN_MAX_LEN = 64
+
 # Fix the path - go up one level from ai_models to reach data
 current_file = Path(__file__).resolve()  # Get absolute path
 data_processing_dir = current_file.parent  # data_processing
@@ -82,9 +85,23 @@ class DataLoader:
     
     def load_all_data(self) -> List[Dict[str, Any]]:
         """Load all training data using existing scripts"""
-        all_data = []
-        
+        return list(self.iter_documents())
+    
+    def iter_batches(self, batch_size: int = 1024) -> Iterator[List[Dict[str, Any]]]:
+        """Yield training documents in lists of at most batch_size"""
+        batch = []
+        for doc in self.iter_documents():
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    
+    def iter_documents(self) -> Iterator[Dict[str, Any]]:
+        """Yield training documents one at a time, without building the full list"""
         # First try to use the model.py function
+        df = None
         try:
             model_path = self.backend_dir / "ai_models" / "model"
             if model_path.exists():
@@ -93,31 +110,35 @@ class DataLoader:
                 
                 logger.info("Using load_mental_health_data from model.py")
                 df = load_mental_health_data()
-                
-                if not df.empty:
-                    for _, row in df.iterrows():
-                        all_data.append({
-                            "text": str(row.get('text', '')),
-                            "source": str(row.get('source', 'unknown')),
-                            "type": "mental_health",
-                            "metadata": {
-                                "relevance": float(row.get('relevance', 1.0)),
-                                "category": str(row.get('category', '')),
-                                "sentiment": str(row.get('sentiment', ''))
-                            }
-                        })
-                    logger.info(f"Loaded {len(df)} examples from model.py")
-                    return all_data
         except Exception as e:
             logger.error(f"Error using model.py: {e}")
         
+        if df is not None and not df.empty:
+            for _, row in df.iterrows():
+                yield {
+                    "text": str(row.get('text', '')),
+                    "source": str(row.get('source', 'unknown')),
+                    "type": "mental_health",
+                    "metadata": {
+                        "relevance": float(row.get('relevance', 1.0)),
+                        "category": str(row.get('category', '')),
+                        "sentiment": str(row.get('sentiment', ''))
+                    }
+                }
+            logger.info(f"Loaded {len(df)} examples from model.py")
+            return
+        
         # Fallback to loading from training directory
         logger.info("Falling back to loading from training directory")
-        return self._load_from_training_dir()
+        yield from self._iter_training_dir()
     
     def _load_from_training_dir(self) -> List[Dict]:
         """Fallback method to load from training directory"""
-        data = []
+        return list(self._iter_training_dir())
+    
+    def _iter_training_dir(self) -> Iterator[Dict]:
+        """Yield documents from the training directory files"""
+        count = 0
         
         # Check what files exist in training directory
         if self.training_dir.exists():
@@ -143,19 +164,21 @@ class DataLoader:
                             # Process intents
                             for intent in json_data.get('intents', []):
                                 for pattern in intent.get('patterns', []):
-                                    data.append({
+                                    count += 1
+                                    yield {
                                         "text": pattern,
                                         "source": filename,
                                         "type": data_type,
                                         "metadata": {"intent": intent.get('tag', '')}
-                                    })
+                                    }
                                 for response in intent.get('responses', []):
-                                    data.append({
+                                    count += 1
+                                    yield {
                                         "text": response,
                                         "source": filename,
                                         "type": f"{data_type}_response",
                                         "metadata": {"intent": intent.get('tag', '')}
-                                    })
+                                    }
                     else:
                         df = pd.read_csv(filepath)
                         logger.info(f"  Loaded {len(df)} rows from {filename}")
@@ -168,17 +191,17 @@ class DataLoader:
                                    row.get('Text', ''))  # Check capital T
                             
                             if text:
-                                data.append({
+                                count += 1
+                                yield {
                                     "text": str(text),
                                     "source": filename,
                                     "type": data_type,
                                     "metadata": dict(row)
-                                })
+                                }
                 except Exception as e:
                     logger.error(f"Error loading {filename}: {e}")
         
-        logger.info(f"Loaded {len(data)} total examples from training directory")
-        return data
+        logger.info(f"Loaded {count} total examples from training directory")
 
 class TextPreprocessor:
     """Adapter for existing text preprocessing functionality"""
@@ -204,9 +227,14 @@ class TextPreprocessor:
     
     def extract_metadata(self, document: Dict[str, Any]) -> Dict[str, Any]:
         """Extract metadata from document"""
-        metadata = document.get("metadata", {})
         text = document.get("text", "")
         
+        # Keys and short labels (category, intent, sentiment...) repeat across
+        # every document - interned, each distinct string is held only once
+        metadata = {
+            sys.intern(str(key)): sys.intern(value) if isinstance(value, str) and len(value) <= INTERN_MAX_LEN else value
+            for key, value in document.get("metadata", {}).items()
+        }
         metadata["char_count"] = len(text)
         metadata["word_count"] = len(text.split())
         
@@ -215,8 +243,11 @@ class TextPreprocessor:
 class DataIndexer:
     """Adapter for indexing functionality"""
     
-    def __init__(self, config: Any):
+    def __init__(self, config: Any, batch_size: int = None, embedding_cache: Any = None):
         self.config = config
+        # Texts per embedding forward pass
+        self.batch_size = batch_size or config.model.embedding_batch_size
+        self.embedding_cache = embedding_cache
         self.vector_store = None
         self.bm25_search = None
         self.graph_store = None
@@ -273,19 +304,19 @@ class DataIndexer:
             # Vector store (most CPU intensive - gets priority)
             if self.vector_store and processed_docs:
                 logger.info("🔧 Starting vector index build (parallel embeddings)...")
-                vector_future = executor.submit(self._build_vector_index, processed_docs)
+                vector_future = executor.submit(self._build_vector_index, [processed_docs])
                 index_futures.append(("vector", vector_future))
             
             # BM25 search (CPU intensive but different operations)
             if self.bm25_search and processed_docs:
                 logger.info("🔧 Starting BM25 index build...")
-                bm25_future = executor.submit(self._build_bm25_index, processed_docs)
+                bm25_future = executor.submit(self._build_bm25_index, [processed_docs])
                 index_futures.append(("bm25", bm25_future))
             
             # Knowledge graph (less CPU intensive)
             if self.graph_store and processed_docs:
                 logger.info("🔧 Starting knowledge graph build...")
-                graph_future = executor.submit(self._build_graph_index, processed_docs)
+                graph_future = executor.submit(self._build_graph_index, [processed_docs])
                 index_futures.append(("graph", graph_future))
             
             # Wait for all indexes to complete
@@ -298,6 +329,64 @@ class DataIndexer:
 
         logger.info("🎉 All indexes built successfully with parallel processing!")
     
+    def preprocess_documents(self, documents: List[Dict[str, Any]], quiet: bool = False) -> List[Dict[str, Any]]:
+        """Clean text and extract metadata for all documents in parallel"""
+        import concurrent.futures
+        
+        preprocessor = TextPreprocessor()
+        processed_docs = []
+        
+        def preprocess_batch(doc_batch):
+            batch_processed = []
+            for doc in doc_batch:
+                if doc.get("text"):
+                    doc["processed_text"] = preprocessor.preprocess(doc["text"])
+                    doc["metadata"] = preprocessor.extract_metadata(doc)
+                    batch_processed.append(doc)
+            return batch_processed
+        
+        batch_size = max(100, len(documents) // (self.config.system.max_workers * 4))
+        doc_batches = [documents[i:i + batch_size] for i in range(0, len(documents), batch_size)]
+        
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.config.system.max_workers) as executor:
+            futures = [executor.submit(preprocess_batch, batch) for batch in doc_batches]
+            
+            for future in concurrent.futures.as_completed(futures):
+                processed_docs.extend(future.result())
+        
+        if not quiet:
+            logger.info(f"✅ Preprocessed {len(processed_docs)} documents")
+        return processed_docs
+    
+    def save_preprocessed_corpus(self, documents: List[Dict[str, Any]]) -> str:
+        """Preprocess documents once and save them for the standalone index builders"""
+        corpus_path, _ = self.write_preprocessed_corpus([documents])
+        return corpus_path
+    
+    def write_preprocessed_corpus(self, batches: Iterable[List[Dict[str, Any]]]) -> Tuple[str, int]:
+        """
+        Preprocess document batches one at a time and append each to the corpus
+        file as its own pickle frame, so only one batch is held in memory.
+        Returns the corpus path and the number of documents written.
+        """
+        import pickle
+        
+        corpus_path = Path(self.config.data.ai_models_dir) / "indexes" / "preprocessed_corpus.pkl"
+        corpus_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        total = 0
+        with open(corpus_path, "wb") as f:
+            for batch in batches:
+                processed = self.preprocess_documents(batch, quiet=True)
+                if processed:
+                    pickle.dump(processed, f, protocol=pickle.HIGHEST_PROTOCOL)
+                total += len(processed)
+                if total and total % 50000 < len(processed):
+                    logger.info(f"✅ Preprocessing progress: {total:,} documents")
+        
+        logger.info(f"💾 Saved {total:,} preprocessed documents to {corpus_path}")
+        return str(corpus_path), total
+    
     def build_specific_indexes(self, documents: List[Dict[str, Any]], missing_indexes: List[str]):
         """Build only specific missing indexes to avoid unnecessary rebuilds"""
         import concurrent.futures
@@ -345,17 +434,17 @@ class DataIndexer:
         with concurrent.futures.ThreadPoolExecutor(max_workers=min(3, len(missing_indexes))) as executor:
             if "vector store" in missing_indexes and self.vector_store:
                 logger.info("🔧 Building missing VECTOR index...")
-                vector_future = executor.submit(self._build_vector_index, processed_docs)
+                vector_future = executor.submit(self._build_vector_index, [processed_docs])
                 index_futures.append(("vector store", vector_future))
             
             if "BM25" in missing_indexes and self.bm25_search:
                 logger.info("🔧 Building missing BM25 index...")
-                bm25_future = executor.submit(self._build_bm25_index, processed_docs)
+                bm25_future = executor.submit(self._build_bm25_index, [processed_docs])
                 index_futures.append(("BM25", bm25_future))
             
             if "knowledge graph" in missing_indexes and self.graph_store:
                 logger.info("🔧 Building missing KNOWLEDGE GRAPH...")
-                graph_future = executor.submit(self._build_graph_index, processed_docs)
+                graph_future = executor.submit(self._build_graph_index, [processed_docs])
                 index_futures.append(("knowledge graph", graph_future))
             
             # Wait for completion
@@ -368,20 +457,25 @@ class DataIndexer:
 
         logger.info(f"🎉 Missing indexes ({', '.join(missing_indexes)}) built successfully!")
     
-    def _build_vector_index(self, processed_docs):
-        """Build vector index in separate thread"""
+    def _build_vector_index(self, batches: Iterable[List[Dict[str, Any]]]):
+        """Build vector index from batches of preprocessed documents"""
+        # The store needs the corpus size up front to pick its index type, so
+        # the batches are collected - keeping only the fields it stores
         vector_docs = [
             {
                 "text": doc["processed_text"],
                 "metadata": doc["metadata"]
             }
-            for doc in processed_docs
+            for batch in batches
+            for doc in batch
         ]
         
         # Use optimized batch size for embeddings
         self.vector_store.add_documents(
             vector_docs, 
-            batch_size=self.config.system.embedding_batch_size
+            batch_size=self.config.system.embedding_batch_size,
+            encode_batch_size=self.batch_size,
+            embedding_cache=self.embedding_cache
         )
         
         # Save index
@@ -389,24 +483,13 @@ class DataIndexer:
         self.vector_store.save_index(str(save_path))
         logger.info(f"💾 Saved vector index to {save_path}")
     
-    def _build_bm25_index(self, processed_docs):
-        """Build BM25 index in separate thread"""
-        texts = [doc["processed_text"] for doc in processed_docs]
-        
-        # Process in optimized batches
-        batch_size = self.config.system.batch_size
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i:i + batch_size]
-            if i == 0:
-                # First batch - initialize
-                self.bm25_search.add_documents(batch)
-            else:
-                # Subsequent batches - extend
-                self.bm25_search.documents.extend(batch)
-                self.bm25_search._build_index(self.bm25_search.documents)
-            
-            if (i + batch_size) % 25000 == 0:  # More frequent progress updates
-                logger.info(f"📈 BM25 progress: {min(i + batch_size, len(texts)):,}/{len(texts):,} documents")
+    def _build_bm25_index(self, batches: Iterable[List[Dict[str, Any]]]):
+        """Build BM25 index from batches of preprocessed documents"""
+        # Each batch is tokenized as it arrives and the term counts are merged
+        # once at save, so only the texts are kept
+        for batch in batches:
+            self.bm25_search.add_documents([doc["processed_text"] for doc in batch])
+        logger.info(f"📈 BM25 indexed {len(self.bm25_search.documents):,} documents")
         
         # Save index
         save_path = Path(self.config.data.ai_models_dir) / "indexes" / "bm25_index.pkl"
@@ -414,10 +497,8 @@ class DataIndexer:
         self.bm25_search.save(str(save_path))
         logger.info(f"💾 Saved BM25 index to {save_path}")
     
-    def _build_graph_index(self, processed_docs):
-        """Build knowledge graph in separate thread"""
-        import concurrent.futures
-        
+    def _build_graph_index(self, batches: Iterable[List[Dict[str, Any]]]):
+        """Build knowledge graph from batches of preprocessed documents"""
         def process_doc_batch_for_graph(doc_batch):
             """Process a batch of documents for graph building"""
             batch_triples = []
@@ -439,26 +520,81 @@ class DataIndexer:
                     ))
             return batch_triples
         
-        # Process graph building in parallel batches
-        batch_size = self.config.system.batch_size * 5  # Larger batches for graph
-        doc_batches = [processed_docs[i:i + batch_size] for i in range(0, len(processed_docs), batch_size)]
-        
-        all_triples = []
-        with concurrent.futures.ThreadPoolExecutor(max_workers=self.config.system.max_workers // 2) as executor:
-            futures = [executor.submit(process_doc_batch_for_graph, batch) for batch in doc_batches]
+        # Extraction is pure Python and holds the GIL, so the batches are
+        # processed one at a time as they are read
+        triple_count = 0
+        for i, batch in enumerate(batches):
+            batch_triples = process_doc_batch_for_graph(batch)
             
-            for i, future in enumerate(concurrent.futures.as_completed(futures)):
-                batch_triples = future.result()
-                
-                # Add triples to graph store
-                for subject, predicate, obj, metadata in batch_triples:
-                    self.graph_store.add_triple(subject, predicate, obj, metadata)
-                
-                all_triples.extend(batch_triples)
-                logger.info(f"📈 Graph progress: batch {i+1}/{len(doc_batches)} completed ({len(all_triples)} triples)")
+            # Add triples to graph store
+            for subject, predicate, obj, metadata in batch_triples:
+                self.graph_store.add_triple(subject, predicate, obj, metadata)
+            
+            triple_count += len(batch_triples)
+            logger.info(f"📈 Graph progress: batch {i+1} completed ({triple_count} triples)")
         
         # Save graph
         save_path = Path(self.config.data.graph_store_path) / "knowledge_graph"
         save_path.parent.mkdir(parents=True, exist_ok=True)
         self.graph_store.save(str(save_path))
-        logger.info(f"💾 Saved knowledge graph to {save_path} ({len(all_triples)} triples)")
\ No newline at end of file
+        logger.info(f"💾 Saved knowledge graph to {save_path} ({triple_count} triples)")
+
+def _iter_preprocessed_corpus(corpus_path: str) -> Iterator[List[Dict[str, Any]]]:
+    """Yield the batches written by DataIndexer.write_preprocessed_corpus"""
+    import pickle
+    
+    with open(corpus_path, "rb") as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+def vector_build_threads(concurrent_builders: int) -> int:
+    """
+    Native threads for the vector build when it runs beside other builders.
+    The BM25 and graph builds are single-threaded Python, so each of them
+    only needs one core - the embedding build gets the rest.
+    """
+    return max(1, (os.cpu_count() or 1) - (concurrent_builders - 1))
+
+# Standalone builders - module level so they can run in separate processes.
+# Each streams the corpus file batch by batch instead of loading it whole
+
+def build_vector_index(corpus_path: str, batch_size: int = None, embed_cache_path: str = None,
+                       num_threads: int = None):
+    """Build and save the vector index from a preprocessed corpus"""
+    from config.settings import config
+    from core.embeddings import EmbeddingManager, EmbeddingCache
+    from retrieval.vector_store import VectorStore
+    
+    if num_threads:
+        import torch
+        torch.set_num_threads(num_threads)
+    
+    cache = EmbeddingCache(embed_cache_path, config.model.embedding_model) if embed_cache_path else None
+    try:
+        indexer = DataIndexer(config, batch_size=batch_size, embedding_cache=cache)
+        indexer.vector_store = VectorStore(EmbeddingManager(config))
+        indexer._build_vector_index(_iter_preprocessed_corpus(corpus_path))
+    finally:
+        if cache is not None:
+            cache.close()
+
+def build_bm25_index(corpus_path: str):
+    """Build and save the BM25 index from a preprocessed corpus"""
+    from config.settings import config
+    from retrieval.bm25_search import BM25Search
+    
+    indexer = DataIndexer(config)
+    indexer.bm25_search = BM25Search()
+    indexer._build_bm25_index(_iter_preprocessed_corpus(corpus_path))
+
+def build_graph_index(corpus_path: str):
+    """Build and save the knowledge graph from a preprocessed corpus"""
+    from config.settings import config
+    from retrieval.graph_store import GraphStore
+    
+    indexer = DataIndexer(config)
+    indexer.graph_store = GraphStore()
+    indexer._build_graph_index(_iter_preprocessed_corpus(corpus_path))
@@ -4,20 +4,72 @@ import librosa
 import torch
 from transformers import AutoModelForAudioClassification, AutoFeatureExtractor
 
-# Load model & extractor once at import time
+# soxr's quick resampler is far faster than librosa's default kaiser filter
+# and plenty accurate for emotion classification
+try:
+    import soxr  # noqa: F401
+    RES_TYPE = "soxr_qq"
+except ImportError:
+    RES_TYPE = "kaiser_best"
+
 MODEL_ID = "firdhokk/speech-emotion-recognition-with-openai-whisper-large-v3"
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
-model = AutoModelForAudioClassification.from_pretrained(MODEL_ID).to(device)
-feature_extractor = AutoFeatureExtractor.from_pretrained(MODEL_ID, do_normalize=True)
+def load_model():
+    """
+    Load the classifier in the cheapest precision for the device.
+    Only the argmax of the logits matters, so FP16 on GPU and dynamic
+    int8 Linear layers on CPU do not change the predicted emotion.
+    """
+    # torchscript=True makes forward return plain tuples so it can be traced
+    loaded = AutoModelForAudioClassification.from_pretrained(MODEL_ID, torchscript=True)
+    if device.type == "cuda":
+        loaded = loaded.half().to(device)
+    else:
+        loaded = torch.quantization.quantize_dynamic(loaded, {torch.nn.Linear}, dtype=torch.qint8)
+    loaded.eval()
+
+    extractor = AutoFeatureExtractor.from_pretrained(MODEL_ID, do_normalize=True)
+
+    if device.type == "cuda":
+        torch.cuda.empty_cache()
+    return loaded, extractor
+
+# Load model & extractor once at import time
+model, feature_extractor = load_model()
 id2label = model.config.id2label
+# Quantized CPU models keep float32 activations; only the GPU path runs in half
+input_dtype = torch.float16 if device.type == "cuda" else torch.float32
 
-def preprocess_audio(audio_path: str, max_duration: float = 30.0):
-    audio, sr = librosa.load(audio_path, sr=feature_extractor.sampling_rate)
+def _to_device(tensor: torch.Tensor) -> torch.Tensor:
+    if tensor.is_floating_point():
+        return tensor.to(device, dtype=input_dtype)
+    return tensor.to(device)
+
+@torch.no_grad()
+def _trace_model():
+    """
+    Trace and freeze the classifier once on a silent clip of the fixed
+    30 s input length. Falls back to the eager model if tracing fails.
+    """
+    sr = feature_extractor.sampling_rate
+    example = feature_extractor(np.zeros(sr * 30, dtype=np.float32), sampling_rate=sr, return_tensors="pt")
+    example_features = _to_device(example[model.main_input_name])
+    try:
+        return torch.jit.freeze(torch.jit.trace(model, example_features))
+    except Exception:
+        return model
+
+traced = _trace_model()
+# Batch sizes the frozen trace rejected - the trace may have specialized to
+# its batch-1 example, so these go straight to the eager model
+_eager_batch_sizes = set()
+
+def preprocess_waveform(audio: np.ndarray, sr: int, max_duration: float = 30.0):
     max_length = int(sr * max_duration)
     if len(audio) > max_length:
         audio = audio[:max_length]
-    else:
+    elif len(audio) < max_length:
         audio = np.pad(audio, (0, max_length - len(audio)), mode="constant")
 
     inputs = feature_extractor(
@@ -27,16 +79,57 @@ def preprocess_audio(audio_path: str, max_duration: float = 30.0):
         truncation=True,
         return_tensors="pt",
     )
-    return {k: v.to(device) for k, v in inputs.items()}
+    return {k: _to_device(v) for k, v in inputs.items()}
+
+def preprocess_audio(audio_path: str, max_duration: float = 30.0):
+    audio, sr = librosa.load(audio_path, sr=feature_extractor.sampling_rate, res_type=RES_TYPE)
+    return preprocess_waveform(audio, sr, max_duration)
+
+@torch.inference_mode()
+def _infer(inputs) -> torch.Tensor:
+    """Run the traced classifier and return float32 logits"""
+    features = inputs[model.main_input_name]
+    batch_size = features.shape[0]
+    if traced is not model and batch_size not in _eager_batch_sizes:
+        try:
+            return traced(features)[0].float()
+        except RuntimeError:
+            _eager_batch_sizes.add(batch_size)
+    return model(features)[0].float()
+
+def _top_k(logits: torch.Tensor, top_k: int):
+    probs = torch.softmax(logits, dim=-1).cpu().numpy()
+    top_indices = np.argsort(probs)[::-1][:top_k]
+    return [(id2label[idx], float(probs[idx])) for idx in top_indices]
 
 def predict_emotion(audio_path: str, top_k: int = 5):
     """
     Returns the top_k (label, score) tuples for the given WAV file.
     """
     inputs = preprocess_audio(audio_path)
-    with torch.no_grad():
-        outputs = model(**inputs)
-    logits = outputs.logits.squeeze(0)
-    probs = torch.softmax(logits, dim=-1).cpu().numpy()
-    top_indices = np.argsort(probs)[::-1][:top_k]
-    return [(id2label[idx], float(probs[idx])) for idx in top_indices]
+    return _top_k(_infer(inputs).squeeze(0), top_k)
+
+def predict_emotion_from_waveform(audio: np.ndarray, sr: int, top_k: int = 5):
+    """
+    Returns the top_k (label, score) tuples for an in-memory waveform.
+    A waveform already padded to 30 s is passed through without copying.
+    """
+    inputs = preprocess_waveform(audio, sr)
+    return _top_k(_infer(inputs).squeeze(0), top_k)
+
+def predict_emotion_batch(waveforms, sr: int, top_k: int = 5):
+    """
+    Returns a list of top_k (label, score) tuples per waveform, running
+    all waveforms through the classifier in a single forward pass.
+    """
+    max_length = int(sr * 30.0)
+    inputs = feature_extractor(
+        [audio[:max_length] for audio in waveforms],
+        sampling_rate=sr,
+        max_length=max_length,
+        padding="max_length",
+        truncation=True,
+        return_tensors="pt",
+    )
+    logits = _infer({k: _to_device(v) for k, v in inputs.items()})
+    return [_top_k(row, top_k) for row in logits]
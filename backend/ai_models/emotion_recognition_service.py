@@ -4,99 +4,169 @@ Emotion Recognition Service for Genie AI
 Provides a clean interface for emotion analysis from audio data
 """
 
+import atexit
 import logging
 import os
+import shutil
 import tempfile
 import base64
+import binascii
 import io
+import re
+import asyncio
+import threading
+import time
 from typing import Dict, List, Tuple, Optional
 from pathlib import Path
 
+import numpy as np
+
+try:
+    import librosa
+    import soundfile as sf
+except ImportError:
+    librosa = sf = None
+
+try:
+    import soxr
+except ImportError:
+    soxr = None
+
 # Import the emotion recognition model
-from emotion_recognition_model.model import predict_emotion, preprocess_audio
+from emotion_recognition_model.model import (
+    predict_emotion, predict_emotion_from_waveform, predict_emotion_batch,
+    preprocess_audio, feature_extractor, id2label, RES_TYPE
+)
 import torch
 
 logger = logging.getLogger(__name__)
 
+# The model always sees 16 kHz audio
+SAMPLE_RATE = feature_extractor.sampling_rate
+
+# Temp directories left behind by earlier processes are removed after this long
+TEMP_DIR_PREFIX = "genie_emotion_"
+STALE_TEMP_DIR_AGE = 3600  # seconds
+
+# Dynamic batching of concurrent requests
+BATCH_MAX_SIZE = 8
+BATCH_MAX_WAIT = 0.010  # seconds
+
+# Mental health categories, one named group per category
+_CATEGORY_PATTERN = re.compile(
+    r"(?P<depression_risk>sad|depression|grief|sorrow)"
+    r"|(?P<anxiety_risk>anxiety|fear|panic|worry)"
+    r"|(?P<anger_management>anger|rage|fury|irritation)"
+    r"|(?P<positive_mood>happy|joy|content|pleased)"
+    r"|(?P<stable_mood>calm|relaxed|peaceful)"
+    r"|(?P<stress_response>stress|overwhelm|pressure)"
+    r"|(?P<neutral_mood>neutral|normal)"
+)
+
+# Base64 input is decoded in slices of this many characters (a multiple of 4)
+B64_CHUNK_CHARS = 64 * 1024
+
+def _b64decode_chunked(audio_base64: str) -> bytearray:
+    """
+    Decode base64 into one preallocated buffer, a slice at a time, so the
+    whole input is never copied to an intermediate ASCII bytes object.
+    """
+    out = bytearray(len(audio_base64) * 3 // 4)
+    written = 0
+    try:
+        for start in range(0, len(audio_base64), B64_CHUNK_CHARS):
+            chunk = binascii.a2b_base64(audio_base64[start:start + B64_CHUNK_CHARS])
+            out[written:written + len(chunk)] = chunk
+            written += len(chunk)
+    except binascii.Error:
+        # Embedded whitespace can misalign the slices - decode in one go
+        return bytearray(base64.b64decode(audio_base64))
+    del out[written:]
+    return out
+
+def _match_category(emotion_lower: str) -> str:
+    match = _CATEGORY_PATTERN.search(emotion_lower)
+    return match.lastgroup if match else "other_emotion"
+
+# Precomputed categories for every label the model can emit
+_EMOTION_TO_CATEGORY = {
+    label.lower(): _match_category(label.lower()) for label in id2label.values()
+}
+
 class EmotionRecognitionService:
     """Service for analyzing emotions from audio data"""
     
     def __init__(self):
         self.model_loaded = False
         self.temp_dir = None
+        # Device probes are CUDA driver calls - do them once, not per request
+        self._cuda_available = torch.cuda.is_available()
+        self._device_label = torch.cuda.get_device_name(0) if self._cuda_available else "CPU"
+        self._queue = None
+        self._batcher = None
         self._setup_temp_directory()
-        self._validate_model()
+        self._check_imports()
+        
+        # The smoke test is a full forward pass - keep it off the startup path
+        if self.model_loaded:
+            threading.Thread(target=self._warm_smoke_test, daemon=True).start()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.cleanup()
+        return False
+    
+    def _remove_stale_temp_directories(self):
+        """Remove temp directories leaked by earlier processes that never cleaned up"""
+        cutoff = time.time() - STALE_TEMP_DIR_AGE
+        for path in Path(tempfile.gettempdir()).glob(f"{TEMP_DIR_PREFIX}*"):
+            try:
+                if path.is_dir() and path.stat().st_mtime < cutoff:
+                    shutil.rmtree(path, ignore_errors=True)
+                    logger.info(f"Removed stale temporary directory: {path}")
+            except OSError:
+                pass  # Another process may be removing it
     
     def _setup_temp_directory(self):
         """Setup temporary directory for audio files"""
+        self._remove_stale_temp_directories()
         try:
-            self.temp_dir = tempfile.mkdtemp(prefix="genie_emotion_")
+            self.temp_dir = tempfile.mkdtemp(prefix=TEMP_DIR_PREFIX)
             logger.info(f"Created temporary directory for emotion analysis: {self.temp_dir}")
         except Exception as e:
             logger.error(f"Failed to create temporary directory: {e}")
             self.temp_dir = None
     
-    def _validate_model(self):
-        """Validate that the emotion recognition model is working"""
+    def _check_imports(self):
+        """Check that the emotion recognition dependencies are importable"""
         try:
-            # Check if required dependencies are available
-            import librosa
-            import soundfile as sf
+            if librosa is None or sf is None:
+                raise ImportError("librosa and soundfile are required")
             from transformers import AutoModelForAudioClassification, AutoFeatureExtractor
             
-            # Test model loading
-            logger.info("Validating emotion recognition model...")
+            # Weights were already loaded when the model module was imported
+            self.model_loaded = True
             
-            # Test if the model can be loaded and used
-            try:
-                from emotion_recognition_model.model import predict_emotion
-                # Create a simple test to verify the model works
-                import tempfile
-                import numpy as np
-                
-                # Create a minimal test audio file
-                with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as tmp_file:
-                    # Generate 1 second of silence at 16kHz
-                    sample_rate = 16000
-                    duration = 1.0
-                    samples = np.zeros(int(sample_rate * duration))
-                    sf.write(tmp_file.name, samples, sample_rate)
-                    
-                    # Test the model
-                    results = predict_emotion(tmp_file.name, top_k=1)
-                    
-                    # Clean up
-                    try:
-                        os.unlink(tmp_file.name)
-                    except:
-                        pass
-                
-                self.model_loaded = True
-                logger.info("Emotion recognition model validated successfully")
-                
-            except Exception as model_error:
-                logger.error(f"Model validation failed: {model_error}")
-                self.model_loaded = False
-                
         except ImportError as e:
             logger.error(f"Missing dependencies for emotion recognition: {e}")
             logger.info("To enable emotion recognition, install: pip install torch transformers librosa soundfile")
             self.model_loaded = False
+    
+    def _warm_smoke_test(self):
+        """Run one inference on silence to warm up the model and confirm it works"""
+        logger.info("Validating emotion recognition model...")
+        try:
+            # 1 second of silence at 16kHz, analyzed in memory
+            predict_emotion_from_waveform(np.zeros(SAMPLE_RATE, dtype=np.float32), SAMPLE_RATE, top_k=1)
+            logger.info("Emotion recognition model validated successfully")
         except Exception as e:
-            logger.error(f"Failed to validate emotion recognition model: {e}")
+            logger.error(f"Model validation failed: {e}")
             self.model_loaded = False
     
-    def analyze_emotion_from_base64(self, audio_base64: str, top_k: int = 3) -> Dict:
-        """
-        Analyze emotion from base64 encoded audio data
-        
-        Args:
-            audio_base64: Base64 encoded audio data
-            top_k: Number of top emotions to return
-            
-        Returns:
-            Dict containing emotion analysis results
-        """
+    def _not_ready(self, needs_temp_dir: bool = False) -> Optional[Dict]:
+        """Return an error response if the service cannot analyze audio"""
         if not self.model_loaded:
             return {
                 "error": "Emotion recognition model not available",
@@ -105,7 +175,7 @@ class EmotionRecognitionService:
                 "confidence": 0.0
             }
         
-        if not self.temp_dir:
+        if needs_temp_dir and not self.temp_dir:
             return {
                 "error": "Temporary directory not available",
                 "emotions": [],
@@ -113,27 +183,74 @@ class EmotionRecognitionService:
                 "confidence": 0.0
             }
         
+        return None
+    
+    def _decode_base64(self, audio_base64: str) -> np.ndarray:
+        """Decode base64 audio into a 16 kHz waveform without touching disk"""
+        audio_data = _b64decode_chunked(audio_base64)
+        
+        # libsndfile parses the WAV header and samples in C straight from memory
         try:
-            # Decode base64 audio data
-            audio_data = base64.b64decode(audio_base64)
-            
-            # Create temporary audio file
-            temp_audio_path = os.path.join(self.temp_dir, f"audio_{os.getpid()}.wav")
-            
-            # Write audio data to temporary file
-            with open(temp_audio_path, 'wb') as f:
-                f.write(audio_data)
-            
-            # Analyze emotion
-            results = self._analyze_audio_file(temp_audio_path, top_k)
-            
+            audio, sr = sf.read(io.BytesIO(audio_data), dtype="float32")
+        except RuntimeError:
+            # Formats libsndfile cannot parse (m4a/aac, mp3 on older builds) -
+            # librosa falls back to audioread/ffmpeg, which needs a file
+            return self._decode_with_librosa(audio_data, suffix="")
+        if audio.ndim > 1:
+            audio = audio.mean(axis=1)
+        return self._resample(audio, sr)
+    
+    def _resample(self, audio: np.ndarray, sr: int) -> np.ndarray:
+        """Resample a mono waveform to SAMPLE_RATE"""
+        if sr == SAMPLE_RATE:
+            return audio
+        if soxr is not None:
+            return soxr.resample(audio, sr, SAMPLE_RATE, "QQ")
+        return librosa.resample(audio, orig_sr=sr, target_sr=SAMPLE_RATE, res_type=RES_TYPE)
+    
+    def _decode_webm(self, webm_data: bytes) -> np.ndarray:
+        """Decode WebM bytes into a 16 kHz waveform"""
+        return self._decode_with_librosa(webm_data, suffix=".webm")
+    
+    def _decode_with_librosa(self, audio_data: bytes, suffix: str) -> np.ndarray:
+        """Decode encoded audio through a temporary file with librosa"""
+        # Write the data to a uniquely named temporary file so concurrent
+        # requests in the same process never share a path. The directory is
+        # recreated in case another process swept it as stale while idle.
+        if self.temp_dir:
+            os.makedirs(self.temp_dir, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=self.temp_dir, suffix=suffix, delete=False) as f:
+            f.write(audio_data)
+            temp_path = f.name
+        
+        try:
+            audio, _ = librosa.load(temp_path, sr=SAMPLE_RATE, res_type=RES_TYPE)
+            return audio
+        finally:
             # Clean up temporary file
             try:
-                os.remove(temp_audio_path)
+                os.remove(temp_path)
             except:
                 pass  # Ignore cleanup errors
+    
+    def analyze_emotion_from_base64(self, audio_base64: str, top_k: int = 3) -> Dict:
+        """
+        Analyze emotion from base64 encoded audio data
+        
+        Args:
+            audio_base64: Base64 encoded audio data
+            top_k: Number of top emotions to return
             
-            return results
+        Returns:
+            Dict containing emotion analysis results
+        """
+        error = self._not_ready()
+        if error:
+            return error
+        
+        try:
+            audio = self._decode_base64(audio_base64)
+            return self._analyze_waveform(audio, top_k)
             
         except Exception as e:
             logger.error(f"Error analyzing emotion from base64 audio: {e}")
@@ -155,55 +272,51 @@ class EmotionRecognitionService:
         Returns:
             Dict containing emotion analysis results
         """
-        if not self.model_loaded:
+        error = self._not_ready(needs_temp_dir=True)
+        if error:
+            return error
+        
+        try:
+            audio = self._decode_webm(webm_data)
+            return self._analyze_waveform(audio, top_k)
+            
+        except Exception as e:
+            logger.error(f"Error analyzing emotion from WebM audio: {e}")
             return {
-                "error": "Emotion recognition model not available",
+                "error": f"Failed to analyze emotion: {str(e)}",
                 "emotions": [],
                 "primary_emotion": None,
                 "confidence": 0.0
             }
+    
+    async def aanalyze_emotion_from_base64(self, audio_base64: str, top_k: int = 3) -> Dict:
+        """Async variant of analyze_emotion_from_base64 that goes through the micro-batcher"""
+        error = self._not_ready()
+        if error:
+            return error
         
-        if not self.temp_dir:
+        try:
+            audio = await asyncio.to_thread(self._decode_base64, audio_base64)
+            return await self.analyze(audio, top_k)
+            
+        except Exception as e:
+            logger.error(f"Error analyzing emotion from base64 audio: {e}")
             return {
-                "error": "Temporary directory not available",
+                "error": f"Failed to analyze emotion: {str(e)}",
                 "emotions": [],
                 "primary_emotion": None,
                 "confidence": 0.0
             }
+    
+    async def aanalyze_emotion_from_webm(self, webm_data: bytes, top_k: int = 3) -> Dict:
+        """Async variant of analyze_emotion_from_webm that goes through the micro-batcher"""
+        error = self._not_ready(needs_temp_dir=True)
+        if error:
+            return error
         
         try:
-            import librosa
-            import soundfile as sf
-            
-            # Create temporary files
-            temp_webm_path = os.path.join(self.temp_dir, f"audio_{os.getpid()}.webm")
-            temp_wav_path = os.path.join(self.temp_dir, f"audio_{os.getpid()}.wav")
-            
-            # Write WebM data to temporary file
-            with open(temp_webm_path, 'wb') as f:
-                f.write(webm_data)
-            
-            # Convert WebM to WAV using librosa
-            try:
-                audio, sr = librosa.load(temp_webm_path, sr=16000)
-                sf.write(temp_wav_path, audio, sr)
-            except Exception as e:
-                logger.error(f"Failed to convert WebM to WAV: {e}")
-                # Try direct analysis with the WebM file
-                temp_wav_path = temp_webm_path
-            
-            # Analyze emotion
-            results = self._analyze_audio_file(temp_wav_path, top_k)
-            
-            # Clean up temporary files
-            for path in [temp_webm_path, temp_wav_path]:
-                try:
-                    if os.path.exists(path):
-                        os.remove(path)
-                except:
-                    pass  # Ignore cleanup errors
-            
-            return results
+            audio = await asyncio.to_thread(self._decode_webm, webm_data)
+            return await self.analyze(audio, top_k)
             
         except Exception as e:
             logger.error(f"Error analyzing emotion from WebM audio: {e}")
@@ -214,6 +327,75 @@ class EmotionRecognitionService:
                 "confidence": 0.0
             }
     
+    async def analyze(self, audio: np.ndarray, top_k: int = 3) -> Dict:
+        """
+        Queue a 16 kHz waveform for the micro-batcher and wait for its result
+        
+        Args:
+            audio: Mono waveform sampled at SAMPLE_RATE
+            top_k: Number of top emotions to return
+            
+        Returns:
+            Dict containing emotion analysis results
+        """
+        if self._batcher is None or self._batcher.done():
+            self._queue = asyncio.Queue()
+            self._batcher = asyncio.create_task(self._batch_loop())
+        
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((audio, top_k, future))
+        return await future
+    
+    async def _batch_loop(self):
+        """Drain queued waveforms into batches and run one forward per batch"""
+        while True:
+            batch = [await self._queue.get()]
+            try:
+                # Give concurrent requests a moment to arrive, then take what is
+                # queued. get_nowait cannot lose an item the way a timed-out
+                # wait_for(queue.get()) can before Python 3.12
+                if self._queue.qsize() < BATCH_MAX_SIZE - 1:
+                    await asyncio.sleep(BATCH_MAX_WAIT)
+                while len(batch) < BATCH_MAX_SIZE:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except asyncio.QueueEmpty:
+                        break
+                
+                waveforms = [audio for audio, _, _ in batch]
+                top_ks = [top_k for _, top_k, _ in batch]
+                results = await asyncio.to_thread(self._analyze_batch, waveforms, top_ks)
+            except asyncio.CancelledError:
+                for _, _, future in batch:
+                    future.cancel()
+                raise
+            except Exception as e:
+                # Fail this batch's callers instead of ending the loop and leaving them waiting
+                logger.error(f"Emotion batch of {len(batch)} failed: {e}")
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            
+            for (_, _, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+    
+    def _analyze_batch(self, waveforms: List[np.ndarray], top_ks: List[int]) -> List[Dict]:
+        """Analyze several waveforms with a single model forward"""
+        try:
+            # The feature extractor truncates and pads each waveform to 30 s itself
+            batch_results = predict_emotion_batch(waveforms, SAMPLE_RATE, top_k=max(top_ks))
+            return [
+                self._format_results(emotion_results[:top_k])
+                for emotion_results, top_k in zip(batch_results, top_ks)
+            ]
+            
+        except Exception as e:
+            logger.error(f"Error analyzing audio batch of {len(waveforms)}: {e}")
+            return [self._analysis_error(e) for _ in waveforms]
+    
+
     def _analyze_audio_file(self, audio_path: str, top_k: int = 3) -> Dict:
         """
         Analyze emotion from audio file
@@ -228,43 +410,69 @@ class EmotionRecognitionService:
         try:
             # Use the existing emotion recognition model
             emotion_results = predict_emotion(audio_path, top_k=top_k)
+            return self._format_results(emotion_results)
             
-            # Format results
-            emotions = []
-            for label, score in emotion_results:
-                emotions.append({
-                    "emotion": label,
-                    "confidence": float(score),
-                    "score": float(score)
-                })
-            
-            # Get primary emotion (highest confidence)
-            primary_emotion = emotions[0] if emotions else None
-            primary_confidence = primary_emotion["confidence"] if primary_emotion else 0.0
-            
-            # Categorize emotion for mental health context
-            mental_health_category = self._categorize_emotion_for_mental_health(
-                primary_emotion["emotion"] if primary_emotion else None
-            )
+        except Exception as e:
+            logger.error(f"Error analyzing audio file {audio_path}: {e}")
+            return self._analysis_error(e)
+    
+    def _analyze_waveform(self, audio: np.ndarray, top_k: int = 3) -> Dict:
+        """
+        Analyze emotion from a 16 kHz waveform
+        
+        Args:
+            audio: Mono waveform sampled at SAMPLE_RATE
+            top_k: Number of top emotions to return
             
-            return {
-                "emotions": emotions,
-                "primary_emotion": primary_emotion["emotion"] if primary_emotion else None,
-                "confidence": primary_confidence,
-                "mental_health_category": mental_health_category,
-                "analysis_timestamp": torch.cuda.get_device_name(0) if torch.cuda.is_available() else "CPU",
-                "error": None
-            }
+        Returns:
+            Dict containing emotion analysis results
+        """
+        try:
+            emotion_results = predict_emotion_from_waveform(audio, SAMPLE_RATE, top_k=top_k)
+            return self._format_results(emotion_results)
             
         except Exception as e:
-            logger.error(f"Error analyzing audio file {audio_path}: {e}")
-            return {
-                "error": f"Failed to analyze audio: {str(e)}",
-                "emotions": [],
-                "primary_emotion": None,
-                "confidence": 0.0,
-                "mental_health_category": "unknown"
-            }
+            logger.error(f"Error analyzing audio waveform: {e}")
+            return self._analysis_error(e)
+    
+    def _format_results(self, emotion_results: List[Tuple[str, float]]) -> Dict:
+        """Format (label, score) pairs into the analysis response"""
+        emotions = []
+        for label, score in emotion_results:
+            emotions.append({
+                "emotion": label,
+                "confidence": float(score),
+                "score": float(score)
+            })
+        
+        # Get primary emotion (highest confidence)
+        primary_emotion = emotions[0] if emotions else None
+        primary_confidence = primary_emotion["confidence"] if primary_emotion else 0.0
+        
+        # Categorize emotion for mental health context
+        mental_health_category = self._categorize_emotion_for_mental_health(
+            primary_emotion["emotion"] if primary_emotion else None
+        )
+        
+        return {
+            "emotions": emotions,
+            "primary_emotion": primary_emotion["emotion"] if primary_emotion else None,
+            "confidence": primary_confidence,
+            "mental_health_category": mental_health_category,
+            "device": self._device_label,
+            "analysis_timestamp_ns": time.monotonic_ns(),
+            "error": None
+        }
+    
+    def _analysis_error(self, error: Exception) -> Dict:
+        """Build the error response for a failed analysis"""
+        return {
+            "error": f"Failed to analyze audio: {str(error)}",
+            "emotions": [],
+            "primary_emotion": None,
+            "confidence": 0.0,
+            "mental_health_category": "unknown"
+        }
     
     def _categorize_emotion_for_mental_health(self, emotion: Optional[str]) -> str:
         """
@@ -280,24 +488,8 @@ class EmotionRecognitionService:
             return "unknown"
         
         emotion_lower = emotion.lower()
-        
-        # Map emotions to mental health categories
-        if any(term in emotion_lower for term in ['sad', 'depression', 'grief', 'sorrow']):
-            return "depression_risk"
-        elif any(term in emotion_lower for term in ['anxiety', 'fear', 'panic', 'worry']):
-            return "anxiety_risk"
-        elif any(term in emotion_lower for term in ['anger', 'rage', 'fury', 'irritation']):
-            return "anger_management"
-        elif any(term in emotion_lower for term in ['happy', 'joy', 'content', 'pleased']):
-            return "positive_mood"
-        elif any(term in emotion_lower for term in ['calm', 'relaxed', 'peaceful']):
-            return "stable_mood"
-        elif any(term in emotion_lower for term in ['stress', 'overwhelm', 'pressure']):
-            return "stress_response"
-        elif any(term in emotion_lower for term in ['neutral', 'normal']):
-            return "neutral_mood"
-        else:
-            return "other_emotion"
+        category = _EMOTION_TO_CATEGORY.get(emotion_lower)
+        return category if category is not None else _match_category(emotion_lower)
     
     def is_available(self) -> bool:
         """Check if emotion recognition service is available"""
@@ -310,15 +502,18 @@ class EmotionRecognitionService:
             "model_loaded": self.model_loaded,
             "temp_dir_available": self.temp_dir is not None,
             "temp_dir_path": self.temp_dir,
-            "cuda_available": torch.cuda.is_available(),
-            "device": "cuda" if torch.cuda.is_available() else "cpu"
+            "cuda_available": self._cuda_available,
+            "device": "cuda" if self._cuda_available else "cpu"
         }
     
     def cleanup(self):
         """Cleanup resources"""
+        if self._batcher is not None:
+            self._batcher.cancel()
+            self._batcher = None
+        
         if self.temp_dir and os.path.exists(self.temp_dir):
             try:
-                import shutil
                 shutil.rmtree(self.temp_dir)
                 logger.info(f"Cleaned up temporary directory: {self.temp_dir}")
             except Exception as e:
@@ -332,6 +527,8 @@ def get_emotion_service() -> EmotionRecognitionService:
     global _emotion_service
     if _emotion_service is None:
         _emotion_service = EmotionRecognitionService()
+        # Remove the temp directory even if the caller never calls cleanup()
+        atexit.register(_emotion_service.cleanup)
     return _emotion_service
 
 def initialize_emotion_service() -> bool:
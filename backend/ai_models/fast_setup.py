@@ -4,22 +4,92 @@ Fast Initial Setup Script for Genie AI
 This script runs CPU optimization and then the initial setup with maximum parallelization.
 """
 
+import argparse
 import asyncio
+import functools
 import sys
 import os
 import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 # Add project root to path
 project_root = Path(__file__).parent
 sys.path.insert(0, str(project_root))
 
-# Import optimization and setup modules
+# Import optimization and index building modules
 from optimize_cpu import main as optimize_cpu
-from initial_setup import main as run_initial_setup
+from config.index_files import INDEX_ARTIFACTS, index_paths, check_index_status
+from data_processing.adapter import (
+    DataLoader, DataIndexer, build_vector_index, build_bm25_index, build_graph_index,
+    vector_build_threads
+)
 
-async def fast_setup():
-    """Run optimized setup process with smart index detection"""
+def remove_index_artifacts(names):
+    """Delete the on-disk files of the named indexes so they can be rebuilt"""
+    paths = index_paths()
+    for name in names:
+        for artifact in INDEX_ARTIFACTS[name]:
+            path = paths[artifact]
+            if path.exists():
+                print(f"  Removing {path.name}")
+                path.unlink()
+
+def preload_embedding_model():
+    """Download the embedding model into the local cache ahead of the vector build"""
+    from config.settings import config
+    from huggingface_hub import snapshot_download
+    
+    try:
+        snapshot_download(config.model.embedding_model)
+        print(f"✅ Embedding model {config.model.embedding_model} cached")
+    except Exception as e:
+        print(f"⚠️  Could not preload embedding model: {e}")
+
+def build_indexes_in_parallel(builders):
+    """Load and preprocess the corpus once, then build each index in its own process"""
+    from config.settings import config
+    
+    print("📚 Streaming training data through preprocessing once for all indexes...")
+    corpus_path, document_count = DataIndexer(config).write_preprocessed_corpus(
+        DataLoader(config).iter_batches(batch_size=1024)
+    )
+    if not document_count:
+        Path(corpus_path).unlink(missing_ok=True)
+        print("❌ No training data found! Cannot build indexes.")
+        return False
+    
+    print(f"📊 Preprocessed {document_count:,} documents")
+    
+    try:
+        # The builders only share the preprocessed corpus, so separate
+        # processes can run them side by side without contending for the GIL
+        with ProcessPoolExecutor(max_workers=len(builders)) as executor:
+            futures = [(name, executor.submit(builder, corpus_path)) for name, builder in builders]
+            
+            all_ok = True
+            for name, future in futures:
+                try:
+                    future.result()
+                    print(f"✅ {name} built")
+                except Exception as e:
+                    print(f"❌ {name} failed: {e}")
+                    all_ok = False
+    finally:
+        Path(corpus_path).unlink(missing_ok=True)
+    
+    return all_ok
+
+async def fast_setup(assume_yes: bool = False, rebuild: str = "missing", run_test: bool = False):
+    """
+    Run optimized setup process with smart index detection
+    
+    Args:
+        assume_yes: Skip the confirmation prompt
+        rebuild: "missing" builds only absent indexes, "all" rebuilds every index,
+                 "none" only reports the current status
+        run_test: Run a test query once setup completes
+    """
     print("🚀 GENIE AI FAST SETUP")
     print("="*50)
     print("This will:")
@@ -29,39 +99,49 @@ async def fast_setup():
     print("="*50)
     
     # Check existing indexes first
-    from config.settings import config
-    vector_faiss = Path("./indexes/vector_store/mental_health_index.faiss")
-    vector_pkl = Path("./indexes/vector_store/mental_health_index.pkl") 
-    bm25_index = Path("./indexes/bm25_index.pkl")
-    graph_index = Path("./indexes/graph_store/knowledge_graph.pkl")
-    
-    vector_exists = vector_faiss.exists() and vector_pkl.exists()
-    bm25_exists = bm25_index.exists()
-    graph_exists = graph_index.exists()
+    status = check_index_status()
+    vector_exists = status["vector"]
+    bm25_exists = status["bm25"]
+    graph_exists = status["graph"]
     
     print(f"\n🔍 CURRENT INDEX STATUS:")
     print(f"  Vector Store: {'✅' if vector_exists else '❌'}")
     print(f"  BM25 Index: {'✅' if bm25_exists else '❌'}")  
     print(f"  Knowledge Graph: {'✅' if graph_exists else '❌'}")
     
-    if vector_exists and bm25_exists and graph_exists:
+    if rebuild == "none":
+        print(f"\nRebuild mode 'none' - nothing will be built.")
+        return
+    
+    if rebuild == "all":
+        vector_exists = bm25_exists = graph_exists = False
+    elif vector_exists and bm25_exists and graph_exists:
         print(f"\n🎉 ALL INDEXES ALREADY EXIST!")
         print(f"No building needed - your system is ready!")
         return
     
-    missing = []
-    if not vector_exists: missing.append("Vector Store")
-    if not bm25_exists: missing.append("BM25") 
-    if not graph_exists: missing.append("Knowledge Graph")
+    builders = []
+    if not bm25_exists: builders.append(("BM25", build_bm25_index))
+    if not graph_exists: builders.append(("Knowledge Graph", build_graph_index))
+    if not vector_exists:
+        # The embedding build dominates the runtime - the other builders are
+        # single-threaded, so it gets every core they leave free
+        threads = vector_build_threads(len(builders) + 1)
+        builders.insert(0, ("Vector Store", functools.partial(build_vector_index, num_threads=threads)))
+    missing = [name for name, _ in builders]
     
     print(f"\n🔧 WILL BUILD: {', '.join(missing)}")
     print(f"✅ WILL PRESERVE: {', '.join([x for x in ['Vector Store', 'BM25', 'Knowledge Graph'] if x not in missing])}")
     
     # Confirm before starting
-    response = input("\nReady to start smart setup? (y/n): ")
-    if response.lower() != 'y':
-        print("Setup cancelled.")
-        return
+    if not assume_yes:
+        response = input("\nReady to start smart setup? (y/n): ")
+        if response.lower() != 'y':
+            print("Setup cancelled.")
+            return
+    
+    if rebuild == "all":
+        remove_index_artifacts(["vector", "bm25", "graph"])
     
     start_time = time.time()
     
@@ -71,16 +151,26 @@ async def fast_setup():
         print("STEP 1: CPU OPTIMIZATION")
         print("="*50)
         
-        success = optimize_cpu()
+        # Fetch the embedding model while the CPU settings are being tuned
+        if not vector_exists:
+            success, _ = await asyncio.gather(
+                asyncio.to_thread(optimize_cpu, "process_pool", len(builders)),
+                asyncio.to_thread(preload_embedding_model)
+            )
+        else:
+            success = optimize_cpu("process_pool", len(builders))
         if not success:
             print("❌ CPU optimization failed. Continuing anyway...")
         
-        # Step 2: Initial Setup
+        # Step 2: Build missing indexes in parallel
         print("\n" + "="*50)
-        print("STEP 2: INITIAL DATA SETUP")
+        print("STEP 2: PARALLEL INDEX BUILD")
         print("="*50)
         
-        await run_initial_setup()
+        success = await asyncio.to_thread(build_indexes_in_parallel, builders)
+        if not success:
+            print("❌ Some indexes failed to build. Check the logs for details.")
+            return
         
         # Calculate total time
         total_time = time.time() - start_time
@@ -98,6 +188,10 @@ async def fast_setup():
         print("  • Test: python test_companion.py")
         print("  • Start API: python api_server.py")
         
+        if run_test:
+            from initial_setup import quick_test
+            await quick_test()
+        
     except KeyboardInterrupt:
         print("\n\n⚠️  Setup interrupted by user!")
         print("You can resume by running this script again.")
@@ -109,7 +203,18 @@ async def fast_setup():
 
 def main():
     """Main entry point"""
-    asyncio.run(fast_setup())
+    parser = argparse.ArgumentParser(description="Genie AI fast setup")
+    parser.add_argument("--yes", action="store_true", help="Do not ask for confirmation")
+    parser.add_argument(
+        "--rebuild",
+        choices=["none", "missing", "all"],
+        default="missing",
+        help="Which indexes to build (default: missing)"
+    )
+    parser.add_argument("--test", action="store_true", help="Run a test query after setup")
+    args = parser.parse_args()
+    
+    asyncio.run(fast_setup(assume_yes=args.yes, rebuild=args.rebuild, run_test=args.test))
 
 if __name__ == "__main__":
     main()
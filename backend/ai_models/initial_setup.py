@@ -4,11 +4,14 @@ One-time initial setup script for Genie AI
 This processes all data and creates indexes - only run once!
 """
 
+import argparse
 import asyncio
+import functools
 import os
 import sys
 from pathlib import Path
 from main import GenieAI
+from config.index_files import index_paths, check_index_status
 import time
 from datetime import datetime
 
@@ -24,8 +27,9 @@ try:
 except:
     SUCCESS = ERROR = WARNING = INFO = RESET = ""
 
+@functools.lru_cache(maxsize=1)
 def check_environment():
-    """Check if environment is properly set up"""
+    """Check if environment is properly set up (checked once per process)"""
     print(f"\n{INFO}Checking environment...{RESET}")
     
     # Check for GROQ API key
@@ -37,23 +41,19 @@ def check_environment():
     else:
         print(f"{SUCCESS}✓ GROQ_API_KEY found{RESET}")
     
-    # Check for required packages
+    # Check for required packages: (import name, pip package name)
     required_packages = [
-        "faiss-cpu",  # or faiss-gpu if you have GPU
-        "sentence-transformers",
-        "rank-bm25",
-        "networkx",
-        "groq"
+        ("faiss", "faiss-cpu"),  # or faiss-gpu if you have GPU
+        ("sentence_transformers", "sentence-transformers"),
+        ("scipy", "scipy"),
+        ("networkx", "networkx"),
+        ("groq", "groq")
     ]
     
     missing_packages = []
-    for package in required_packages:
+    for module_name, package in required_packages:
         try:
-            # Special handling for faiss-cpu which imports as 'faiss'
-            if package == "faiss-cpu":
-                __import__("faiss")
-            else:
-                __import__(package.replace("-", "_"))
+            __import__(module_name)
             print(f"{SUCCESS}✓ {package} installed{RESET}")
         except ImportError:
             missing_packages.append(package)
@@ -102,8 +102,16 @@ def estimate_processing_time(num_documents: int = 510656) -> dict:
         "optimization_status": "OPTIMIZED" if workers >= cpu_count * 0.8 else "STANDARD"
     }
 
-async def run_initial_setup():
-    """Run the initial data setup"""
+async def run_initial_setup(rebuild: dict = None, assume_yes: bool = False):
+    """
+    Run the initial data setup
+    
+    Args:
+        rebuild: Which indexes to discard and rebuild, e.g. {"vector": False, "bm25": True, "graph": False}.
+                 Indexes not selected are loaded from disk; missing ones are always built.
+        assume_yes: Skip the confirmation prompt
+    """
+    rebuild = rebuild or {}
     print(f"{INFO}{'='*60}{RESET}")
     print(f"{INFO} GENIE AI - ONE-TIME INITIAL DATA SETUP {RESET}")
     print(f"{INFO}{'='*60}{RESET}")
@@ -147,11 +155,12 @@ async def run_initial_setup():
     print(f"  6. Build knowledge graph (if enabled)")
     print(f"  7. Save all indexes to disk")
     
-    print(f"\n{INFO}Ready to start? (y/n):{RESET}", end=" ")
-    
-    if input().lower() != 'y':
-        print(f"{INFO}Setup cancelled.{RESET}")
-        return
+    if not assume_yes:
+        print(f"\n{INFO}Ready to start? (y/n):{RESET}", end=" ")
+        
+        if input().lower() != 'y':
+            print(f"{INFO}Setup cancelled.{RESET}")
+            return
     
     try:
         # Start processing
@@ -167,8 +176,13 @@ async def run_initial_setup():
         print(f"\n{INFO}Processing...{RESET}\n")
         
         # Use smart index detection instead of forcing rebuild!
-        # This will only build what's actually missing
-        genie = GenieAI(skip_data_loading=True)
+        # This will only build what's missing or explicitly selected for rebuild
+        genie = GenieAI(
+            skip_data_loading=True,
+            rebuild_vector=rebuild.get("vector", False),
+            rebuild_bm25=rebuild.get("bm25", False),
+            rebuild_graph=rebuild.get("graph", False)
+        )
         
         # Calculate actual time
         elapsed_time = time.time() - start_time
@@ -191,12 +205,14 @@ async def run_initial_setup():
         
         # Verify files were created
         print(f"\n{INFO}Verifying created files...{RESET}")
-        from config.settings import config
-        
+        paths = index_paths()
         files_to_check = [
-            (Path(config.data.vector_store_path) / "mental_health_index.faiss", "FAISS index"),
-            (Path(config.data.vector_store_path) / "mental_health_index.pkl", "Vector metadata"),
-            (Path(config.data.ai_models_dir) / "indexes" / "bm25_index.pkl", "BM25 index"),
+            (paths["vector_faiss"], "FAISS index"),
+            (paths["vector_docs"], "Vector documents"),
+            (paths["vector_offsets"], "Vector document offsets"),
+            (paths["bm25"], "BM25 index"),
+            (paths["bm25_matrix"], "BM25 term matrix"),
+            (paths["graph"], "Knowledge graph"),
         ]
         
         all_good = True
@@ -226,23 +242,6 @@ async def run_initial_setup():
         traceback.print_exc()
         print(f"\n{INFO}Check the log files for more details.{RESET}")
 
-def cleanup_partial_files():
-    """Clean up any partial files from failed runs"""
-    print(f"\n{INFO}Cleaning up any partial files...{RESET}")
-    
-    from config.settings import config
-    files_to_clean = [
-        Path(config.data.vector_store_path) / "mental_health_index.faiss",
-        Path(config.data.vector_store_path) / "mental_health_index.pkl",
-        Path(config.data.ai_models_dir) / "indexes" / "bm25_index.pkl",
-        Path(config.data.graph_store_path) / "knowledge_graph.pkl",
-    ]
-    
-    for file_path in files_to_clean:
-        if file_path.exists():
-            print(f"  Removing {file_path.name}")
-            file_path.unlink()
-
 async def quick_test():
     """Quick test to verify setup worked"""
     print(f"\n{INFO}Running quick test...{RESET}")
@@ -269,16 +268,32 @@ async def quick_test():
         print(f"{ERROR}Test failed: {e}{RESET}")
         return False
 
-async def main():
-    """Main setup runner"""
+async def main(assume_yes: bool = False, rebuild: str = None, run_test: bool = False):
+    """
+    Main setup runner
+    
+    Args:
+        assume_yes: Skip confirmation prompts
+        rebuild: "none", "missing" or "all" to choose non-interactively; None shows the menu
+        run_test: Run a test query without asking
+    """
     print(f"{INFO}Genie AI Initial Setup Script{RESET}")
     print(f"{INFO}This will process all data and create indexes.{RESET}")
     
-    # Check if indexes already exist
-    from config.settings import config
-    vector_index = Path(config.data.vector_store_path) / "mental_health_index.faiss"
+    # Check which indexes already exist
+    status = check_index_status()
+    rebuild_all = {"vector": True, "bm25": True, "graph": True}
     
-    if vector_index.exists():
+    if rebuild == "all":
+        await run_initial_setup(rebuild_all, assume_yes=assume_yes)
+    elif rebuild == "missing":
+        if all(status.values()):
+            print(f"\n{SUCCESS}All indexes already exist - nothing to build.{RESET}")
+        else:
+            await run_initial_setup(assume_yes=assume_yes)
+    elif rebuild == "none":
+        print(f"\n{INFO}Rebuild mode 'none' - skipping index build.{RESET}")
+    elif all(status.values()):
         print(f"\n{WARNING}Existing indexes found!{RESET}")
         print(f"{INFO}What would you like to do?{RESET}")
         print(f"  1. Delete and rebuild from scratch")
@@ -288,15 +303,29 @@ async def main():
         choice = input(f"\n{INFO}Enter choice (1-3):{RESET} ")
         
         if choice == "1":
-            cleanup_partial_files()
-            await run_initial_setup()
+            await run_initial_setup(rebuild_all)
         elif choice == "2":
             success = await quick_test()
             if not success:
                 print(f"\n{INFO}Would you like to rebuild? (y/n):{RESET}", end=" ")
                 if input().lower() == 'y':
-                    cleanup_partial_files()
-                    await run_initial_setup()
+                    await run_initial_setup(rebuild_all)
+        else:
+            print(f"{INFO}Setup cancelled.{RESET}")
+    elif any(status.values()):
+        missing = [name for name, exists in status.items() if not exists]
+        print(f"\n{WARNING}Some indexes are missing: {', '.join(missing)}{RESET}")
+        print(f"{INFO}What would you like to do?{RESET}")
+        print(f"  1. Build only the missing indexes (keeps the existing ones)")
+        print(f"  2. Delete and rebuild from scratch")
+        print(f"  3. Cancel")
+        
+        choice = input(f"\n{INFO}Enter choice (1-3):{RESET} ")
+        
+        if choice == "1":
+            await run_initial_setup()
+        elif choice == "2":
+            await run_initial_setup(rebuild_all)
         else:
             print(f"{INFO}Setup cancelled.{RESET}")
     else:
@@ -304,11 +333,25 @@ async def main():
         await run_initial_setup()
     
     # Ask if user wants to run a test
-    print(f"\n{INFO}Run a test query? (y/n):{RESET}", end=" ")
-    if input().lower() == 'y':
+    if run_test:
         await quick_test()
+    elif not assume_yes:
+        print(f"\n{INFO}Run a test query? (y/n):{RESET}", end=" ")
+        if input().lower() == 'y':
+            await quick_test()
     
     print(f"\n{SUCCESS}Done!{RESET}")
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Genie AI initial setup")
+    parser.add_argument("--yes", action="store_true", help="Do not ask for confirmation")
+    parser.add_argument(
+        "--rebuild",
+        choices=["none", "missing", "all"],
+        default=None,
+        help="Which indexes to build (default: ask)"
+    )
+    parser.add_argument("--test", action="store_true", help="Run a test query after setup")
+    args = parser.parse_args()
+    
+    asyncio.run(main(assume_yes=args.yes, rebuild=args.rebuild, run_test=args.test))
\ No newline at end of file
@@ -7,10 +7,18 @@ both CLI and API interfaces for interacting with your AI companion.
 """
 
 import asyncio
+import atexit
+import concurrent.futures
+import functools
 import logging
+import logging.handlers
 import multiprocessing
+import os
 from pathlib import Path
+import queue
 import sys
+import threading
+import time
 from typing import Dict, Any, Optional, List
 import argparse
 import json
@@ -25,20 +33,50 @@ project_root = Path(__file__).parent
 sys.path.insert(0, str(project_root))
 
 from config.settings import config
+from config.index_files import INDEX_ARTIFACTS, index_paths, index_status
 from core.llm_manager import LLMManager
-from core.embeddings import EmbeddingManager
+from core.embeddings import EmbeddingManager, EmbeddingCache
 from agents.orchestrator import OrchestratorAgent
-from data_processing.adapter import DataLoader, DataIndexer
+from data_processing.adapter import (
+    DataLoader, DataIndexer, build_vector_index, build_bm25_index, build_graph_index,
+    vector_build_threads
+)
 from retrieval.vector_store import VectorStore
 from retrieval.bm25_search import BM25Search
 from retrieval.graph_store import GraphStore
 from retrieval.web_search import WebSearch
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    from prompt_toolkit import PromptSession
+    from prompt_toolkit.history import FileHistory
+    PROMPT_TOOLKIT_AVAILABLE = True
+except ImportError:
+    PROMPT_TOOLKIT_AVAILABLE = False
+
+# State behind these rarely changes between calls (e.g. healthcheck polling)
+SYSTEM_INFO_TTL = 5.0
+INDEX_CHECK_TTL = 30.0
+
+# Background thread that writes queued log records, started once by setup_logging
+_log_listener = None
+
 # Setup logging
 def setup_logging(log_level: str = None):
     """Configure logging for the application"""
+    global _log_listener
     level = getattr(logging, log_level or config.system.log_level)
     
+    if _log_listener is not None:
+        # Already configured - only the level changes
+        logging.getLogger().setLevel(level)
+        return logging.getLogger(__name__)
+    
     # Create logs directory if it doesn't exist
     log_dir = Path("logs")
     log_dir.mkdir(exist_ok=True)
@@ -47,13 +85,23 @@ def setup_logging(log_level: str = None):
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     log_file = log_dir / f"genie_ai_{timestamp}.log"
     
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    file_handler = logging.FileHandler(log_file, delay=True, encoding='utf-8')
+    file_handler.setFormatter(formatter)
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(formatter)
+    
+    # Callers only enqueue records - file and console writes happen on the listener thread
+    log_queue = queue.SimpleQueue()
+    _log_listener = logging.handlers.QueueListener(log_queue, file_handler, stream_handler)
+    _log_listener.start()
+    atexit.register(_log_listener.stop)  # Drains the queue before exit
+    
+    # The queue side only merges message and traceback; the listener's handlers add the prefix
     logging.basicConfig(
         level=level,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(log_file),
-            logging.StreamHandler(sys.stdout)
-        ]
+        format='%(message)s',
+        handlers=[logging.handlers.QueueHandler(log_queue)]
     )
     
     # Set specific loggers to WARNING to reduce noise
@@ -64,22 +112,90 @@ def setup_logging(log_level: str = None):
 
 logger = setup_logging()
 
+def _run_coroutine_sync(coro):
+    """Run a coroutine to completion from sync code, even if a loop is already running"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    
+    # Called from inside an event loop (e.g. the API server startup) - use a fresh loop
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
+
+@functools.lru_cache(maxsize=None)
+def _dir_entries(dirpath: Path) -> frozenset:
+    """Names in a directory, listed with a single scandir call"""
+    try:
+        with os.scandir(dirpath) as entries:
+            return frozenset(entry.name for entry in entries)
+    except FileNotFoundError:
+        return frozenset()
+
+def _close_event_loop(loop: asyncio.AbstractEventLoop):
+    """Finalize async generators and close a loop created with new_event_loop"""
+    try:
+        loop.run_until_complete(loop.shutdown_asyncgens())
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+
 class GenieAI:
     """Main Genie AI application class"""
     
-    def __init__(self, skip_data_loading: bool = True):
+    def __init__(self, skip_data_loading: bool = True,
+                 rebuild_vector: bool = False,
+                 rebuild_bm25: bool = False,
+                 rebuild_graph: bool = False):
         """
         Initialize Genie AI system
         
         Args:
             skip_data_loading: DEPRECATED - System now automatically detects existing indexes.
                              Always uses smart index checking to prevent unnecessary rebuilds.
+            rebuild_vector: Discard and rebuild the vector store
+            rebuild_bm25: Discard and rebuild the BM25 index
+            rebuild_graph: Discard and rebuild the knowledge graph
         """
         logger.info("="*60)
         logger.info(" Initializing Genie AI Companion System ")
         logger.info("="*60)
         
+        # (timestamp, value) caches for get_system_info and _check_indexes_exist
+        self._sysinfo_cache = (0.0, None)
+        self._index_check_cache = (0.0, None)
+        
+        # Parts of get_system_info fixed by config - built once, shared by every refresh
+        self._static_info = {
+            "version": "1.0.0",
+            "llm_model": config.model.llm_model,
+            "embedding_model": config.model.embedding_model
+        }
+        self._feature_flags = {
+            "web_search": config.agent.enable_web_search,
+            "cove": config.agent.enable_cove,
+            "fact_checking": config.agent.enable_fact_checking
+        }
+        
+        # Embeddings survive index rebuilds here, keyed by a hash of the text
+        self._embed_cache_path = Path(config.data.ai_models_dir) / "embed_cache.sqlite"
+        
+        # CLI command dispatch table, see run_cli
+        self._cli_commands = {
+            "exit": self._cmd_exit,
+            "quit": self._cmd_exit,
+            "clear": self._cmd_clear,
+            "history": self._cmd_history,
+            "info": self._cmd_info,
+            "help": self._cmd_help,
+        }
+        
         try:
+            # Drop only the indexes being rebuilt - the rest are loaded from disk
+            # and the missing ones are rebuilt by the normal index check below.
+            # This must run before VectorStore is created, as it loads on init.
+            self._clear_indexes(vector=rebuild_vector, bm25=rebuild_bm25, graph=rebuild_graph)
+            
             # Initialize managers
             logger.info("Initializing LLM and Embedding managers...")
             self.llm_manager = LLMManager(config)
@@ -120,62 +236,130 @@ class GenieAI:
             logger.info("="*60)
             
         except Exception as e:
-            logger.error(f"Failed to initialize Genie AI: {e}", exc_info=True)
+            logger.error("Failed to initialize Genie AI: %s", e, exc_info=logger.isEnabledFor(logging.DEBUG))
             raise
     
-    def _get_index_paths(self) -> Dict[str, Path]:
-        """Get standardized index paths"""
-        return {
-            "vector_faiss": Path(config.data.vector_store_path) / "mental_health_index.faiss",
-            "vector_pkl": Path(config.data.vector_store_path) / "mental_health_index.pkl",
-            "bm25": Path(config.data.ai_models_dir) / "indexes" / "bm25_index.pkl",
-            "graph": Path(config.data.graph_store_path) / "knowledge_graph.pkl"
-        }
+    @functools.cached_property
+    def _index_paths(self) -> Dict[str, Path]:
+        """Standardized index paths - fixed by config, so built once per instance"""
+        return index_paths()
+    
+    def _clear_indexes(self, vector: bool = False, bm25: bool = False, graph: bool = False):
+        """Remove the on-disk artifacts of the selected indexes"""
+        selected = []
+        if vector:
+            selected += INDEX_ARTIFACTS["vector"]
+        if bm25:
+            selected += INDEX_ARTIFACTS["bm25"]
+        if graph:
+            selected += INDEX_ARTIFACTS["graph"]
+        
+        paths = self._index_paths
+        for path_name in selected:
+            path = paths[path_name]
+            # unlink straight away - a separate exists() check would cost an extra stat
+            try:
+                path.unlink()
+                logger.info(f"🧹 Removed {path} for rebuild")
+            except FileNotFoundError:
+                pass
+        _dir_entries.cache_clear()
     
-    def _check_indexes_exist(self) -> bool:
+    def _invalidate_info_caches(self):
+        """Force the next system info / index check to hit the filesystem again"""
+        self._sysinfo_cache = (0.0, None)
+        self._index_check_cache = (0.0, None)
+        _dir_entries.cache_clear()
+    
+    @staticmethod
+    def _existing_index_files(paths: Dict[str, Path]) -> Dict[str, bool]:
+        """Check all index files with one directory listing per parent directory"""
+        return {name: path.name in _dir_entries(path.parent) for name, path in paths.items()}
+    
+    def _check_indexes_exist(self, verbose: bool = True) -> bool:
         """Check if any indexes exist - don't require ALL to exist"""
-        paths = self._get_index_paths()
+        checked_at, cached = self._index_check_cache
+        if cached is not None and time.monotonic() - checked_at < INDEX_CHECK_TTL:
+            return cached
         
-        # Check which indexes exist
-        vector_exists = paths["vector_faiss"].exists() and paths["vector_pkl"].exists()
-        bm25_exists = paths["bm25"].exists()
-        graph_exists = paths["graph"].exists()
+        paths = self._index_paths
+        
+        # The TTL has expired - pick up indexes built or removed by another process
+        _dir_entries.cache_clear()
         
-        logger.info(f"Index status check:")
-        logger.info(f"  Vector store: {'✅' if vector_exists else '❌'}")
-        logger.info(f"  BM25 index: {'✅' if bm25_exists else '❌'}")
-        logger.info(f"  Knowledge graph: {'✅' if graph_exists else '❌'}")
+        # Check which indexes exist
+        status = index_status(self._existing_index_files(paths))
+        vector_exists, bm25_exists, graph_exists = status["vector"], status["bm25"], status["graph"]
         
         # Return True if ANY index exists (we can load partial indexes)
         any_exist = vector_exists or bm25_exists or graph_exists
         
-        if any_exist:
-            logger.info("Found existing indexes - will load what's available")
-        else:
-            logger.info("No indexes found - will build from scratch")
+        if verbose:
+            logger.info(f"Index status check:")
+            logger.info(f"  Vector store: {'✅' if vector_exists else '❌'}")
+            logger.info(f"  BM25 index: {'✅' if bm25_exists else '❌'}")
+            logger.info(f"  Knowledge graph: {'✅' if graph_exists else '❌'}")
             
+            if any_exist:
+                logger.info("Found existing indexes - will load what's available")
+            else:
+                logger.info("No indexes found - will build from scratch")
+        
+        self._index_check_cache = (time.monotonic(), any_exist)
         return any_exist
     
-    def _load_existing_indexes(self):
-        """Load existing indexes - handle partial index availability gracefully"""
-        paths = self._get_index_paths()
+    async def _load_existing_indexes_async(self, vector_exists: bool, bm25_exists: bool,
+                                           graph_exists: bool) -> Dict[str, Any]:
+        """Load the available indexes concurrently - each reads its own files"""
+        paths = self._index_paths
         
-        # Check which indexes exist
-        vector_exists = paths["vector_faiss"].exists() and paths["vector_pkl"].exists()
-        bm25_exists = paths["bm25"].exists()
-        graph_exists = paths["graph"].exists()
+        loaders = {}
+        if vector_exists:
+            vector_base_path = str(paths["vector_faiss"].parent / "mental_health_index")
+            loaders["vector"] = asyncio.to_thread(self.vector_store.load_index, vector_base_path, mmap=True)
+        if bm25_exists:
+            loaders["bm25"] = asyncio.to_thread(self.bm25_search.load, str(paths["bm25"]))
+        if graph_exists:
+            graph_base_path = str(paths["graph"]).replace('.pkl', '')
+            if config.agent.graph_idle_ttl > 0:
+                # Loaded on the first graph-routed query instead, see GraphStore.attach
+                self.graph_store.attach(graph_base_path, idle_ttl=config.agent.graph_idle_ttl)
+            else:
+                loaders["graph"] = asyncio.to_thread(self.graph_store.load, graph_base_path)
+        
+        # return_exceptions so one failed load does not abort the others
+        results = await asyncio.gather(*loaders.values(), return_exceptions=True)
+        return dict(zip(loaders.keys(), results))
+    
+    def _load_existing_indexes(self, build_missing: bool = True):
+        """
+        Load existing indexes - handle partial index availability gracefully
+        
+        Args:
+            build_missing: Build indexes that are not on disk. Off right after a
+                           build, so a failed builder does not start another one
+        """
+        paths = self._index_paths
+        
+        # Check which indexes exist - listed fresh, a build may have just written them
+        _dir_entries.cache_clear()
+        status = index_status(self._existing_index_files(paths))
+        vector_exists, bm25_exists, graph_exists = status["vector"], status["bm25"], status["graph"]
+        
+        results = _run_coroutine_sync(
+            self._load_existing_indexes_async(vector_exists, bm25_exists, graph_exists)
+        )
         
         any_loaded = False
         
         # Load vector store if available
         if vector_exists:
-            try:
-                vector_base_path = str(paths["vector_faiss"].parent / "mental_health_index")
-                self.vector_store.load_index(vector_base_path)
+            error = results["vector"]
+            if error is None:
                 logger.info(f"✅ Loaded vector store with {len(self.vector_store.documents):,} documents")
                 any_loaded = True
-            except Exception as e:
-                logger.error(f"❌ Failed to load vector store: {e}")
+            else:
+                logger.error(f"❌ Failed to load vector store: {error}")
                 # Don't rebuild everything, just mark as unavailable
                 logger.info("Vector search will be unavailable until rebuilt")
         else:
@@ -183,27 +367,29 @@ class GenieAI:
 
         # Load BM25 index if available
         if bm25_exists:
-            try:
-                self.bm25_search.load(str(paths["bm25"]))
+            error = results["bm25"]
+            if error is None:
                 bm25_count = len(self.bm25_search.documents) if hasattr(self.bm25_search, 'documents') else 0
                 logger.info(f"✅ Loaded BM25 index with {bm25_count:,} documents")
                 any_loaded = True
-            except Exception as e:
-                logger.error(f"❌ Failed to load BM25 index: {e}")
+            else:
+                logger.error(f"❌ Failed to load BM25 index: {error}")
                 logger.info("BM25 search will be unavailable until rebuilt")
         else:
             logger.info("🔄 BM25 index not found - will need to build")
 
         # Load graph store if available
         if graph_exists:
-            try:
-                graph_base_path = str(paths["graph"]).replace('.pkl', '')
-                self.graph_store.load(graph_base_path)
+            error = results.get("graph")
+            if not self.graph_store.is_loaded:
+                logger.info("✅ Knowledge graph found - will load on first graph query")
+                any_loaded = True
+            elif error is None:
                 graph_count = len(self.graph_store.graph.nodes()) if hasattr(self.graph_store, 'graph') else 0
                 logger.info(f"✅ Loaded knowledge graph with {graph_count:,} nodes")
                 any_loaded = True
-            except Exception as e:
-                logger.error(f"❌ Failed to load knowledge graph: {e}")
+            else:
+                logger.error(f"❌ Failed to load knowledge graph: {error}")
                 logger.info("Knowledge graph search will be unavailable until rebuilt")
         else:
             logger.info("🔄 Knowledge graph not found - will need to build")
@@ -217,7 +403,10 @@ class GenieAI:
         if not graph_exists:
             missing_indexes.append("knowledge graph")
         
-        if missing_indexes:
+        if not build_missing:
+            if missing_indexes:
+                logger.warning(f"⚠️ Not available until rebuilt: {', '.join(missing_indexes)}")
+        elif missing_indexes:
             logger.info(f"🔧 Need to build missing indexes: {', '.join(missing_indexes)}")
             self._build_missing_indexes(missing_indexes)
         elif any_loaded:
@@ -243,7 +432,11 @@ class GenieAI:
             logger.info(f"📊 Loaded {len(documents)} documents for index building")
             
             # Build only the missing indexes using the optimized indexer
-            indexer = DataIndexer(config)
+            embedding_cache = None
+            if "vector store" in missing_indexes:
+                embedding_cache = EmbeddingCache(self._embed_cache_path, config.model.embedding_model)
+            indexer = DataIndexer(config, batch_size=config.model.embedding_batch_size,
+                                  embedding_cache=embedding_cache)
             
             # Set the components based on what's missing
             if "vector store" in missing_indexes:
@@ -254,9 +447,14 @@ class GenieAI:
                 indexer.graph_store = self.graph_store
             
             # Use the smart indexer that can build specific indexes
-            indexer.build_specific_indexes(documents, missing_indexes)
+            try:
+                indexer.build_specific_indexes(documents, missing_indexes)
+            finally:
+                if embedding_cache is not None:
+                    embedding_cache.close()
             
             logger.info("✅ Missing indexes built successfully!")
+            self._invalidate_info_caches()
             
         except Exception as e:
             logger.error(f"❌ Error building missing indexes: {e}")
@@ -268,44 +466,72 @@ class GenieAI:
         try:
             logger.info("🔨 Building ALL indexes from scratch...")
             
-            # Only clear indexes if we're doing a complete rebuild
-            logger.info("🧹 Clearing existing partial indexes...")
-            paths = self._get_index_paths()
-            for path_name, path in paths.items():
-                if path.exists():
-                    logger.info(f"  Removing {path}")
-                    path.unlink()
+            # No clearing pass: every index writer saves to a temp file and
+            # atomically replaces the old one, so stale files are overwritten
+            # in place and their page cache is not thrown away up front
+            self._invalidate_info_caches()
             
-            # Load data
-            logger.info("📚 Loading training data...")
+            # Stream the training data through preprocessing in batches so the
+            # raw corpus is never held in memory as a whole
+            logger.info("📚 Loading and preprocessing training data...")
             data_loader = DataLoader(config)
-            documents = data_loader.load_all_data()
+            corpus_path, document_count = DataIndexer(config).write_preprocessed_corpus(
+                data_loader.iter_batches(batch_size=1024)
+            )
             
-            if not documents:
+            if not document_count:
+                Path(corpus_path).unlink(missing_ok=True)
                 logger.warning("No training data found! System will work with limited functionality.")
                 logger.warning("Please ensure training data is available in:")
                 logger.warning(f"  - {config.data.training_dir}")
                 logger.warning(f"  - {config.data.data_dir}")
                 return
             
-            logger.info(f"📊 Loaded {len(documents)} documents")
+            logger.info(f"📊 Loaded {document_count} documents")
             
-            # Build indexes using the optimized indexer
+            # Build each index in its own process - the builders only share the
+            # read-only corpus, so wall-clock is the slowest builder rather than
+            # the sum of all three
             logger.info("🏗️ Building search indexes with full parallelization...")
-            indexer = DataIndexer(config)
-            indexer.vector_store = self.vector_store
-            indexer.bm25_search = self.bm25_search
-            indexer.graph_store = self.graph_store
-            indexer.build_all_indexes(documents)
             
-            logger.info("✅ All indexes built successfully")
+            builders = [
+                ("vector store", functools.partial(build_vector_index,
+                                                   batch_size=config.model.embedding_batch_size,
+                                                   embed_cache_path=str(self._embed_cache_path),
+                                                   num_threads=vector_build_threads(3))),
+                ("BM25", build_bm25_index),
+                ("knowledge graph", build_graph_index),
+            ]
+            failed = []
+            try:
+                workers = min(len(builders), multiprocessing.cpu_count())
+                with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+                    futures = [(name, executor.submit(builder, corpus_path)) for name, builder in builders]
+                    for name, future in futures:
+                        try:
+                            future.result()
+                            logger.info(f"✅ {name} index built")
+                        except Exception as e:
+                            logger.error(f"❌ {name} index failed: {e}")
+                            failed.append(name)
+            finally:
+                Path(corpus_path).unlink(missing_ok=True)
+            
+            self._invalidate_info_caches()
+            if failed:
+                # A worker killed mid-build (e.g. by the OOM killer) breaks the whole
+                # pool, so the other builders report failures too. Building again here
+                # would reload the raw corpus in this process - keep what was built
+                logger.error(f"❌ Failed to build: {', '.join(failed)} - run setup again to retry")
+            else:
+                logger.info("✅ All indexes built successfully")
             
-            # IMPORTANT: Reload the indexes after building
+            # IMPORTANT: Reload the indexes after building, without building again
             logger.info("🔄 Loading newly built indexes...")
-            self._load_existing_indexes()
+            self._load_existing_indexes(build_missing=False)
             
         except Exception as e:
-            logger.error(f"❌ Error building indexes: {e}", exc_info=True)
+            logger.error("❌ Error building indexes: %s", e, exc_info=logger.isEnabledFor(logging.DEBUG))
             logger.warning("System will operate with limited retrieval capabilities")
             logger.warning("You may need to check:")
             logger.warning("  1. Training data is available")
@@ -349,16 +575,18 @@ class GenieAI:
         Returns:
             Response dictionary with answer, confidence, sources, etc.
         """
+        # Validate query - before any logging or context work
+        if not query or not query.strip():
+            return {
+                "response": "I notice you haven't entered a question. How can I help you today?",
+                "confidence": 1.0,
+                "error": None
+            }
+        
         try:
-            # Validate query
-            if not query or not query.strip():
-                return {
-                    "response": "I notice you haven't entered a question. How can I help you today?",
-                    "confidence": 1.0,
-                    "error": None
-                }
-            
-            logger.info(f"Processing query for session {session_id} with model: {model_preference}: {query[:100]}...")
+            if logger.isEnabledFor(logging.INFO):
+                # %.100s truncates while formatting, so no slice is built up front
+                logger.info("Processing query for session %s with model: %s: %.100s...", session_id, model_preference, query)
             
             # Add model preference to context
             if context is None:
@@ -374,10 +602,11 @@ class GenieAI:
             )
             
             if response.success:
-                logger.info(f"Query processed successfully. Confidence: {response.data.get('confidence', 0):.2f}")
+                if logger.isEnabledFor(logging.INFO):
+                    logger.info("Query processed successfully. Confidence: %.2f", response.data.get('confidence', 0))
                 return response.data
             else:
-                logger.error(f"Query processing failed: {response.error}")
+                logger.error("Query processing failed: %s", response.error)
                 return {
                     "response": "I apologize, but I encountered an error processing your request. Please try rephrasing your question.",
                     "confidence": 0.0,
@@ -385,7 +614,8 @@ class GenieAI:
                 }
                 
         except Exception as e:
-            logger.error(f"Unexpected error processing query: {e}", exc_info=True)
+            # Tracebacks only at DEBUG - rate-limit storms would otherwise format one per request
+            logger.error("Unexpected error processing query: %s", e, exc_info=logger.isEnabledFor(logging.DEBUG))
             return {
                 "response": "I apologize, but I encountered an unexpected error. Please try again.",
                 "confidence": 0.0,
@@ -402,27 +632,28 @@ class GenieAI:
     
     def get_system_info(self) -> Dict[str, Any]:
         """Get system information and statistics"""
+        cached_at, cached = self._sysinfo_cache
+        if cached is not None and time.monotonic() - cached_at < SYSTEM_INFO_TTL:
+            # Shallow copy - callers that add keys must not change what the next caller sees
+            return dict(cached)
+        
         # Check index status
-        index_status = "ready" if self._check_indexes_exist() else "missing"
+        # Quiet check - this runs on every healthcheck poll
+        index_status = "ready" if self._check_indexes_exist(verbose=False) else "missing"
         
-        # Get actual counts from loaded components
+        # Get actual counts from loaded components - all O(1) len() calls
         vector_docs = len(self.vector_store.documents) if self.vector_store.documents else 0
         bm25_docs = len(self.bm25_search.documents) if hasattr(self.bm25_search, 'documents') and self.bm25_search.documents else 0
         graph_nodes = len(self.graph_store.graph.nodes()) if hasattr(self.graph_store, 'graph') else 0
         
-        return {
-            "version": "1.0.0",
-            "llm_model": config.model.llm_model,
-            "embedding_model": config.model.embedding_model,
+        info = {
+            **self._static_info,
             "vector_store_docs": vector_docs,
             "bm25_docs": bm25_docs,
             "graph_nodes": graph_nodes,
+            "graph_resident": self.graph_store.is_loaded,
             "index_status": index_status,
-            "features": {
-                "web_search": config.agent.enable_web_search,
-                "cove": config.agent.enable_cove,
-                "fact_checking": config.agent.enable_fact_checking
-            },
+            "features": self._feature_flags,
             "agent_metrics": {
                 agent_name: agent.get_metrics() 
                 for agent_name, agent in [
@@ -434,62 +665,156 @@ class GenieAI:
                 ]
             }
         }
+        self._sysinfo_cache = (time.monotonic(), info)
+        return dict(info)
+    
+    def _cmd_exit(self, session_id: str) -> Optional[str]:
+        print("\nGenie: Take care! I'm always here when you want to chat. 💙")
+        return None
+    
+    def _cmd_clear(self, session_id: str) -> Optional[str]:
+        self.clear_session(session_id)
+        print("\nGenie: I've started a fresh conversation. What's on your mind?")
+        return f"cli_session_{time.time_ns():x}"
+    
+    def _cmd_history(self, session_id: str) -> Optional[str]:
+        history = self.get_session_history(session_id)
+        # Build the whole dump first so it goes out in one write
+        lines = [f"{msg['role'].upper()}: {msg['content'][:100]}..." for msg in history]
+        print("\n".join(["\n--- Conversation History ---", *lines, "--- End of History ---"]))
+        return session_id
+    
+    def _cmd_info(self, session_id: str) -> Optional[str]:
+        info = self.get_system_info()
+        print("\n--- System Information ---")
+        if ORJSON_AVAILABLE:
+            # OPT_SERIALIZE_NUMPY covers numpy scalars/arrays in agent metrics
+            print(orjson.dumps(info, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY).decode())
+        else:
+            print(json.dumps(info, indent=2))
+        print("--- End of Information ---")
+        return session_id
+    
+    def _cmd_help(self, session_id: str) -> Optional[str]:
+        print("\nCommands:")
+        print("  'exit' or 'quit' - End the conversation")
+        print("  'clear' - Start a new conversation")
+        print("  'history' - View conversation history")
+        print("  'info' - Show system information")
+        print("  'help' - Show this help message")
+        return session_id
+    
+    async def _warm_cache(self, session_id: str):
+        """Pre-run retrieval for the latest user message while the next one is being typed"""
+        history = self.get_session_history(session_id)
+        last_user_msg = next((msg['content'] for msg in reversed(history) if msg['role'] == 'user'), None)
+        if not last_user_msg:
+            return
+        try:
+            # Pages in the FAISS lists and embedding weights the follow-up will most likely touch
+            await self.vector_store.asearch(last_user_msg, top_k=config.retrieval.vector_top_k)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.debug(f"Cache warm-up skipped: {e}")
+    
+    async def _prompt(self, message: str) -> str:
+        """Read a line without blocking the event loop"""
+        if self._prompt_session is not None:
+            return await self._prompt_session.prompt_async(message)
+        
+        # A daemon thread rather than the default executor: after Ctrl-C,
+        # exiting would otherwise wait for the thread still blocked in input()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        
+        def settle(callback, value):
+            if not future.done():
+                callback(value)
+        
+        def read_line():
+            try:
+                print(message, end="", flush=True)
+                outcome = (future.set_result, self._read_stdin_line())
+            except BaseException as e:
+                outcome = (future.set_exception, e)
+            try:
+                loop.call_soon_threadsafe(settle, *outcome)
+            except RuntimeError:
+                pass  # The loop closed while waiting for input
+        
+        threading.Thread(target=read_line, name="cli-input", daemon=True).start()
+        return await future
+    
+    def _create_prompt_session(self):
+        """prompt_toolkit session whose up-arrow history carries over between CLI runs"""
+        if not PROMPT_TOOLKIT_AVAILABLE:
+            return None
+        try:
+            os.makedirs(config.data.cache_dir, exist_ok=True)
+            return PromptSession(history=FileHistory(os.path.join(config.data.cache_dir, "cli_history")))
+        except OSError as e:
+            logger.debug(f"CLI history file unavailable, keeping it in memory: {e}")
+            return PromptSession()
+    
+    def _read_stdin_line(self) -> str:
+        """
+        Read one line straight from the stdin descriptor. Unlike input() this
+        holds no lock on sys.stdin, which would abort interpreter shutdown while
+        the reading thread is blocked. Read-ahead past the newline is kept for
+        the next call.
+        """
+        while b"\n" not in self._stdin_pending:
+            chunk = os.read(sys.stdin.fileno(), 4096)
+            if not chunk:
+                if not self._stdin_pending:
+                    raise EOFError
+                break
+            self._stdin_pending += chunk
+        line, _, self._stdin_pending = self._stdin_pending.partition(b"\n")
+        return line.decode(sys.stdin.encoding or "utf-8", errors="replace").rstrip("\r")
     
     def run_cli(self):
         """Run interactive command-line interface"""
+        # One loop for the whole session so HTTP client pools survive between turns
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_until_complete(self._run_cli_async())
+        finally:
+            _close_event_loop(loop)
+    
+    async def _run_cli_async(self):
         print("\n" + "="*60)
         print(" GENIE AI - Your Friendly Companion ")
         print("="*60)
         print("\nHello! I'm Genie, your AI companion and friend. I'm here for all of life's moments!")
         print("Whether you're celebrating, need support, want to chat, or have questions - I'm here!")
-        print("\nCommands:")
-        print("  'exit' or 'quit' - End the conversation")
-        print("  'clear' - Start a new conversation")
-        print("  'history' - View conversation history")
-        print("  'info' - Show system information")
-        print("  'help' - Show this help message")
+        self._cmd_help(None)
         print("\n" + "-"*60 + "\n")
         
-        session_id = f"cli_session_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        session_id = f"cli_session_{time.time_ns():x}"
+        self._prompt_session = self._create_prompt_session()
+        self._stdin_pending = b""
+        warm_task = None
         
         while True:
             try:
                 # Get user input
-                user_input = input("\nYou: ").strip()
-                
-                # Handle commands
-                if user_input.lower() in ['exit', 'quit']:
-                    print("\nGenie: Take care! I'm always here when you want to chat. 💙")
-                    break
-                
-                elif user_input.lower() == 'clear':
-                    self.clear_session(session_id)
-                    session_id = f"cli_session_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-                    print("\nGenie: I've started a fresh conversation. What's on your mind?")
-                    continue
-                
-                elif user_input.lower() == 'history':
-                    history = self.get_session_history(session_id)
-                    print("\n--- Conversation History ---")
-                    for msg in history:
-                        print(f"{msg['role'].upper()}: {msg['content'][:100]}...")
-                    print("--- End of History ---")
-                    continue
+                try:
+                    user_input = (await self._prompt("\nYou: ")).strip()
+                finally:
+                    # The user is done typing - stop warming for the previous turn
+                    if warm_task is not None:
+                        warm_task.cancel()
+                        warm_task = None
                 
-                elif user_input.lower() == 'info':
-                    info = self.get_system_info()
-                    print("\n--- System Information ---")
-                    print(json.dumps(info, indent=2))
-                    print("--- End of Information ---")
-                    continue
-                
-                elif user_input.lower() == 'help':
-                    print("\nCommands:")
-                    print("  'exit' or 'quit' - End the conversation")
-                    print("  'clear' - Start a new conversation")
-                    print("  'history' - View conversation history")
-                    print("  'info' - Show system information")
-                    print("  'help' - Show this help message")
+                # Handle commands - each handler returns the session id to continue with, or None to exit
+                handler = self._cli_commands.get(user_input.lower())
+                if handler:
+                    session_id = handler(session_id)
+                    if session_id is None:
+                        break
                     continue
                 
                 # Process normal query
@@ -498,7 +823,7 @@ class GenieAI:
                     print("\nGenie: ", end='', flush=True)
                     
                     # Get response
-                    response = asyncio.run(self.chat(user_input, session_id))
+                    response = await self.chat(user_input, session_id)
                     
                     # Clear thinking indicator and show response
                     print(response['response'])
@@ -511,15 +836,19 @@ class GenieAI:
                     # Show sources if available
                     sources = response.get('sources', [])
                     if sources and len(sources) > 0:
-                        print("\nSources:")
-                        for i, source in enumerate(sources, 1):  # Remove limit to show all sources
-                            print(f"  [{i}] {source.get('metadata', {}).get('source', 'Unknown source')}")
+                        lines = [
+                            f"  [{i}] {source.get('metadata', {}).get('source', 'Unknown source')}"
+                            for i, source in enumerate(sources, 1)  # Remove limit to show all sources
+                        ]
+                        print("\n".join(["\nSources:", *lines]))
+                    
+                    warm_task = asyncio.create_task(self._warm_cache(session_id))
                 
-            except KeyboardInterrupt:
+            except (KeyboardInterrupt, EOFError):
                 print("\n\nGenie: Take care! I'm always here when you want to chat. 💙")
                 break
             except Exception as e:
-                logger.error(f"CLI error: {e}", exc_info=True)
+                logger.error("CLI error: %s", e, exc_info=logger.isEnabledFor(logging.DEBUG))
                 print(f"\nGenie: I apologize, but I encountered an error. Please try again.")
 
 def main():
@@ -578,7 +907,7 @@ Examples:
         # Handle index rebuilding
         if args.rebuild_index:
             print("Rebuilding search indexes...")
-            genie = GenieAI(skip_data_loading=False)
+            genie = GenieAI(rebuild_vector=True, rebuild_bm25=True, rebuild_graph=True)
             print("Indexes rebuilt successfully!")
             return
         
@@ -590,7 +919,12 @@ Examples:
         # Handle test mode
         if args.test:
             print(f"\nTesting with query: {args.test}")
-            response = asyncio.run(genie.chat(args.test))
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            try:
+                response = loop.run_until_complete(genie.chat(args.test))
+            finally:
+                _close_event_loop(loop)
             print(f"\nResponse: {response['response']}")
             print(f"Confidence: {response.get('confidence', 0):.2%}")
             return
@@ -613,26 +947,31 @@ Examples:
         print("Please check the logs for more details.")
         sys.exit(1)
 
-# Create global genie instance for test files (like other test files expect)
-# Initialize with existing indexes by default
-genie = None
+# Global genie instance for test files, created lazily on first use.
+# Kept under a private name so module __getattr__ (PEP 562) can serve `main.genie`.
+_genie = None
+_genie_lock = threading.Lock()
 
 def initialize_genie(skip_data_loading: bool = True):
     """Initialize global Genie instance"""
-    global genie
-    if genie is None:
-        logger.info("Initializing new GenieAI instance...")
-        genie = GenieAI(skip_data_loading=skip_data_loading)
-    return genie
+    global _genie
+    if _genie is None:
+        # Serialize concurrent first access so only one instance is ever built
+        with _genie_lock:
+            if _genie is None:
+                logger.info("Initializing new GenieAI instance...")
+                _genie = GenieAI(skip_data_loading=skip_data_loading)
+    return _genie
+
+def get_genie():
+    """Return the global Genie instance, initializing it on first access"""
+    return _genie or initialize_genie()
+
+def __getattr__(name):
+    # `from main import genie` / `main.genie` only pay the index loading cost when used
+    if name == "genie":
+        return get_genie()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# Add auto-initialization for testing scenarios
 if __name__ == "__main__":
     main()
-else:
-    # Auto-initialize for imports (useful for testing)
-    try:
-        if 'genie' not in globals() or genie is None:
-            genie = initialize_genie(skip_data_loading=True)
-    except Exception as e:
-        logger.warning(f"Auto-initialization failed: {e}")
-        genie = None
\ No newline at end of file
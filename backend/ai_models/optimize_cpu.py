@@ -6,37 +6,174 @@ This script optimizes system settings for maximum CPU utilization during the ini
 
 import os
 import sys
+import ctypes
+import ctypes.util
+import functools
+import importlib.util
 import psutil
 import multiprocessing
 import logging
+import time
 from pathlib import Path
+from typing import Any, Dict, List
+
+HIGH_PRIORITY_CLASS = 0x80  # Win32 process priority class
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def get_system_info():
-    """Get detailed system information"""
-    cpu_count = multiprocessing.cpu_count()
-    memory = psutil.virtual_memory()
-    
-    info = {
-        "cpu_count": cpu_count,
-        "cpu_freq": psutil.cpu_freq(),
-        "memory_total_gb": memory.total / (1024**3),
-        "memory_available_gb": memory.available / (1024**3),
-        "memory_percent": memory.percent
+# Static info is cached briefly so repeated calls within one run reuse it
+SYSTEM_INFO_TTL = 5.0
+_cached_info = None
+_cached_info_time = 0.0
+
+# Window CPU usage is averaged over - one sample per optimizer run
+CPU_SAMPLE_INTERVAL = 1.0
+
+def get_static_system_info():
+    """CPU count, frequency and memory - cheap, no sampling"""
+    global _cached_info, _cached_info_time
+    now = time.monotonic()
+    if _cached_info is None or now - _cached_info_time > SYSTEM_INFO_TTL:
+        memory = psutil.virtual_memory()
+        _cached_info = {
+            "cpu_count": multiprocessing.cpu_count(),
+            "cpu_freq": psutil.cpu_freq(),
+            "memory_total_gb": memory.total / (1024**3),
+            "memory_available_gb": memory.available / (1024**3),
+            "memory_percent": memory.percent
+        }
+        _cached_info_time = now
+    return dict(_cached_info)
+
+def get_cpu_usage(interval: float = CPU_SAMPLE_INTERVAL):
+    """Per-core CPU usage, sampled over interval seconds (blocks for that long)"""
+    cpu_usage = psutil.cpu_percent(interval=interval, percpu=True)
+    return {
+        "cpu_usage_per_core": cpu_usage,
+        "avg_cpu_usage": sum(cpu_usage) / len(cpu_usage) if cpu_usage else 0.0
     }
-    
-    # Get CPU usage per core
-    cpu_usage = psutil.cpu_percent(interval=1, percpu=True)
-    info["cpu_usage_per_core"] = cpu_usage
-    info["avg_cpu_usage"] = sum(cpu_usage) / len(cpu_usage)
-    
+
+def get_system_info():
+    """Get detailed system information - call once per run, the CPU sample blocks"""
+    info = get_static_system_info()
+    info.update(get_cpu_usage())
     return info
 
-def optimize_system_for_processing():
-    """Optimize system settings for maximum CPU utilization"""
+def _parse_cpulist(cpulist: str) -> List[int]:
+    """Expand a sysfs cpulist such as "0-3,8-11" into CPU ids"""
+    cpus = []
+    for part in cpulist.strip().split(","):
+        if "-" in part:
+            start, end = part.split("-")
+            cpus.extend(range(int(start), int(end) + 1))
+        elif part:
+            cpus.append(int(part))
+    return cpus
+
+def get_numa_nodes() -> Dict[int, List[int]]:
+    """NUMA node id -> CPUs this process may run on (Linux only, empty elsewhere)"""
+    nodes = {}
+    allowed = os.sched_getaffinity(0) if hasattr(os, "sched_getaffinity") else None
+    for node_dir in Path("/sys/devices/system/node").glob("node[0-9]*"):
+        try:
+            cpus = _parse_cpulist((node_dir / "cpulist").read_text())
+        except (OSError, ValueError):
+            continue
+        if allowed is not None:
+            cpus = [cpu for cpu in cpus if cpu in allowed]
+        if cpus:
+            nodes[int(node_dir.name[4:])] = cpus
+    return nodes
+
+def get_node_free_memory_kb(node: int) -> int:
+    """MemFree of a NUMA node in kB, 0 if unknown"""
+    try:
+        for line in Path(f"/sys/devices/system/node/node{node}/meminfo").read_text().splitlines():
+            # Format: "Node 0 MemFree:  123456 kB"
+            if "MemFree:" in line:
+                return int(line.split()[3])
+    except (OSError, ValueError, IndexError):
+        pass
+    return 0
+
+def estimate_index_working_set_bytes() -> int:
+    """Size of the search index files already on disk, 0 if there are none or they can't be located"""
+    try:
+        from config.index_files import index_paths
+        paths = index_paths().values()
+    except Exception:
+        return 0
+    return sum(path.stat().st_size for path in paths if path.exists())
+
+THP_SYSFS_DIR = Path("/sys/kernel/mm/transparent_hugepage")
+THP_FALLBACK_WARN_RATIO = 0.05
+
+@functools.lru_cache(maxsize=1)
+def get_thp_state() -> Dict[str, Any]:
+    """
+    Transparent hugepage settings plus the thp_* counters from /proc/vmstat,
+    read once per process. Missing entries are left out.
+    """
+    state = {}
+    for key, path in (("enabled", THP_SYSFS_DIR / "enabled"),
+                      ("defrag", THP_SYSFS_DIR / "defrag"),
+                      ("khugepaged_defrag", THP_SYSFS_DIR / "khugepaged" / "defrag")):
+        try:
+            state[key] = path.read_text().strip()
+        except OSError:
+            pass
+    try:
+        state["vmstat"] = {
+            name: int(value)
+            for name, value in (line.split() for line in Path("/proc/vmstat").read_text().splitlines())
+            if name.startswith("thp_")
+        }
+    except (OSError, ValueError):
+        pass
+    return state
+
+def find_jemalloc():
+    """Name of the installed jemalloc shared library, or None"""
+    return ctypes.util.find_library("jemalloc")
+
+def jemalloc_preloaded() -> bool:
+    """Whether this process was started with jemalloc in LD_PRELOAD"""
+    return "jemalloc" in os.environ.get("LD_PRELOAD", "")
+
+def threads_per_worker(cores: int, parallel_mode: str, pool_size: int = None) -> int:
+    """
+    Native (OpenMP/MKL) threads each worker should use so that
+    workers x threads never exceeds the cores available.
+    """
+    if parallel_mode == "process_pool":
+        return max(1, cores // max(1, pool_size or cores))
+    return cores
+
+def _apply_thread_count(threads: int):
+    """Set the native thread pools, and torch's if it is already imported"""
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "NUMEXPR_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    if "torch" in sys.modules:
+        # Already imported, so the environment variables come too late for it
+        torch = sys.modules["torch"]
+        torch.set_num_threads(threads)
+        try:
+            torch.set_num_interop_threads(threads)
+        except RuntimeError:
+            pass  # Only settable before torch starts any parallel work
+
+def optimize_system_for_processing(parallel_mode: str = "single_process", pool_size: int = None):
+    """
+    Optimize system settings for maximum CPU utilization
+    
+    Args:
+        parallel_mode: "single_process" gives native libraries every core, or one NUMA
+                       node's when the indexes on disk fit in its free memory;
+                       "process_pool" splits the cores between pool_size worker processes
+        pool_size: Number of worker processes in "process_pool" mode
+    """
     logger.info("🚀 Optimizing system for maximum CPU utilization...")
     
     system_info = get_system_info()
@@ -55,46 +192,85 @@ def optimize_system_for_processing():
     # Set environment variables for optimal performance
     optimizations = []
     
-    # 1. PyTorch optimizations
-    os.environ["OMP_NUM_THREADS"] = str(system_info['cpu_count'])
-    os.environ["MKL_NUM_THREADS"] = str(system_info['cpu_count'])
-    os.environ["NUMEXPR_NUM_THREADS"] = str(system_info['cpu_count'])
-    optimizations.append(f"Set thread count to {system_info['cpu_count']} for PyTorch/MKL/NumExpr")
+    # 1. PyTorch optimizations - size thread pools so worker processes don't oversubscribe cores
+    threads = threads_per_worker(system_info['cpu_count'], parallel_mode, pool_size)
+    _apply_thread_count(threads)
+    os.environ["OMP_PROC_BIND"] = "close"
+    os.environ["OMP_PLACES"] = "cores"
+    os.environ["OMP_DYNAMIC"] = "FALSE"
+    os.environ["MKL_DYNAMIC"] = "FALSE"
+    optimizations.append(f"Set thread count to {threads} for PyTorch/MKL/NumExpr ({parallel_mode})")
     
     # 2. Memory optimizations
-    os.environ["MALLOC_ARENA_MAX"] = "4"  # Reduce memory fragmentation
-    optimizations.append("Optimized memory allocation (MALLOC_ARENA_MAX=4)")
+    jemalloc = find_jemalloc() if sys.platform.startswith("linux") else None
+    if jemalloc and jemalloc_preloaded():
+        optimizations.append("Using jemalloc allocator (per-thread arenas)")
+    else:
+        # glibc fallback - fewer arenas means less fragmentation
+        os.environ["MALLOC_ARENA_MAX"] = "4"
+        optimizations.append("Optimized memory allocation (MALLOC_ARENA_MAX=4)")
+        if jemalloc:
+            # The allocator is fixed at process start, so it has to come from the launching shell
+            logger.info("💡 jemalloc is installed - for lower allocator contention and RSS, run the setup with:")
+            logger.info(f"   LD_PRELOAD={jemalloc} MALLOC_CONF=\"narenas:{system_info['cpu_count']},dirty_decay_ms:10000\" python initial_setup.py")
     
     # 3. Process priority (Windows)
     if sys.platform == "win32":
         try:
-            import subprocess
-            # Set process priority to high
-            subprocess.run(['wmic', 'process', 'where', f'processid={os.getpid()}', 'CALL', 'setpriority', '128'], 
-                         capture_output=True, check=False)
+            # Set process priority to high - a direct Win32 call instead of spawning wmic
+            kernel32 = ctypes.windll.kernel32
+            if not kernel32.SetPriorityClass(kernel32.GetCurrentProcess(), HIGH_PRIORITY_CLASS):
+                raise ctypes.WinError()
             optimizations.append("Set process priority to HIGH")
         except Exception as e:
             logger.warning(f"Could not set process priority: {e}")
     
     # 4. Hugepages (Linux)
     elif sys.platform.startswith("linux"):
-        try:
-            # Enable transparent hugepages
-            with open('/sys/kernel/mm/transparent_hugepage/enabled', 'r') as f:
-                hugepage_status = f.read().strip()
-                if 'always' in hugepage_status:
-                    optimizations.append("Transparent hugepages already enabled")
-                else:
-                    optimizations.append("Transparent hugepages status: " + hugepage_status)
-        except Exception:
-            pass
+        thp = get_thp_state()
+        hugepage_status = thp.get("enabled")
+        if hugepage_status:
+            if '[always]' in hugepage_status:
+                optimizations.append("Transparent hugepages already enabled")
+            elif '[madvise]' in hugepage_status:
+                # retrieval.hugepages.advise_hugepage opts the index buffers in
+                optimizations.append("Transparent hugepages available to index buffers (madvise)")
+            else:
+                optimizations.append("Transparent hugepages status: " + hugepage_status)
+        
+        # Faults that wanted a huge page but got a small one mean THP is silently failing
+        vmstat = thp.get("vmstat", {})
+        attempts = vmstat.get("thp_fault_alloc", 0) + vmstat.get("thp_fault_fallback", 0)
+        if attempts:
+            fallback_ratio = vmstat.get("thp_fault_fallback", 0) / attempts
+            if fallback_ratio > THP_FALLBACK_WARN_RATIO:
+                logger.warning(f"⚠️  {fallback_ratio:.1%} of huge page faults fell back to small pages - memory is fragmented")
     
-    # 5. Set CPU affinity to use all cores
+    # 5. Set CPU affinity - one NUMA node when a single process serves indexes
+    #    that fit in that node's free memory, otherwise all cores
     try:
         current_process = psutil.Process()
-        available_cores = list(range(system_info['cpu_count']))
-        current_process.cpu_affinity(available_cores)
-        optimizations.append(f"Set CPU affinity to use all {len(available_cores)} cores")
+        numa_nodes = get_numa_nodes()
+        node = None
+        if len(numa_nodes) > 1 and parallel_mode == "single_process":
+            # Affinity is inherited by child processes, so index builds (no indexes yet,
+            # or a worker pool) keep every core
+            working_set_kb = estimate_index_working_set_bytes() // 1024
+            best_node = max(numa_nodes, key=get_node_free_memory_kb)
+            if 0 < working_set_kb <= get_node_free_memory_kb(best_node):
+                node = best_node
+        if node is not None:
+            # Keep FAISS/embedding memory local: run on the node with the most free memory
+            node_cores = numa_nodes[node]
+            current_process.cpu_affinity(node_cores)
+            
+            os.environ["OMP_PLACES"] = "{" + "},{".join(map(str, node_cores)) + "}"
+            _apply_thread_count(threads_per_worker(len(node_cores), parallel_mode, pool_size))
+            optimizations.append(f"Bound to NUMA node {node} ({len(node_cores)} cores, {len(numa_nodes)} nodes total)")
+        else:
+            available_cores = list(range(system_info['cpu_count']))
+            current_process.cpu_affinity(available_cores)
+            optimizations.append(f"Set CPU affinity to use all {len(available_cores)} cores")
     except Exception as e:
         logger.warning(f"Could not set CPU affinity: {e}")
     
@@ -110,7 +286,7 @@ def optimize_system_for_processing():
 
 def estimate_performance_improvement():
     """Estimate expected performance improvement"""
-    system_info = get_system_info()
+    system_info = get_static_system_info()
     
     # Calculate expected speedup based on CPU cores
     cpu_cores = system_info['cpu_count']
@@ -146,18 +322,18 @@ def verify_dependencies():
     ]
     
     for package, name in packages_to_check:
-        try:
-            __import__(package)
+        # Locate the package without importing it (no CUDA probes or BLAS thread setup)
+        if importlib.util.find_spec(package) is not None:
             logger.info(f"  ✅ {name} - Available")
-        except ImportError:
+        else:
             logger.warning(f"  ❌ {name} - Not installed")
             return False
     
     # Check if sentence-transformers supports multiprocessing
     try:
         from sentence_transformers import SentenceTransformer
-        model = SentenceTransformer('all-MiniLM-L6-v2')
-        if hasattr(model, 'start_multi_process_pool'):
+        # The method lives on the class - no need to download and load a model
+        if hasattr(SentenceTransformer, 'start_multi_process_pool'):
             logger.info(f"  ✅ Sentence Transformers multiprocessing - Supported")
         else:
             logger.warning(f"  ⚠️  Sentence Transformers multiprocessing - Not supported in this version")
@@ -166,13 +342,13 @@ def verify_dependencies():
     
     return True
 
-def main():
-    """Main optimization function"""
+def main(parallel_mode: str = "single_process", pool_size: int = None):
+    """Main optimization function - see optimize_system_for_processing for the arguments"""
     print("🚀 Genie AI CPU Optimization Tool")
     print("="*50)
     
     # Get system info and apply optimizations
-    system_info = optimize_system_for_processing()
+    system_info = optimize_system_for_processing(parallel_mode, pool_size)
     
     # Verify dependencies
     if not verify_dependencies():
@@ -3,12 +3,26 @@
 Extract factual claims from text
 """
 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator
 import re
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Numbers with optional qualifier and up to five words of context, compiled once.
+# The leading \b keeps digits inside tokens such as "covid19" from matching
+_STAT_CLAIM_RE = re.compile(
+    r'\b(?:(?:about|approximately|roughly|nearly|over|under|at least|up to|more than|less than)\s+)?'
+    r'(?:\d+(?:\.\d+)?%?|\d{1,3}(?:,\d{3})*(?:\.\d+)?)\s+(?:\w+\s+){0,5}',
+    re.IGNORECASE
+)
+
+# One line of the extraction output: a "FIELD: value" line or a "---" separator
+_CLAIM_LINE_RE = re.compile(
+    r'^[^\S\n]*(?:(?P<field>CLAIM|TYPE|CONFIDENCE|VERIFY):(?P<value>.*)|---[^\S\n]*)$',
+    re.MULTILINE
+)
+
 class ClaimExtractor:
     """Extract and categorize claims from text"""
     
@@ -38,20 +52,22 @@ VERIFY: [yes/no]
         claims = []
         current_claim = {}
         
-        for line in result.split('\n'):
-            line = line.strip()
+        # Only the recognised lines are visited; everything else is skipped by the scan
+        for match in _CLAIM_LINE_RE.finditer(result):
+            field = match.group("field")
+            value = (match.group("value") or "").strip()
             
-            if line.startswith('CLAIM:'):
+            if field == 'CLAIM':
                 if current_claim:
                     claims.append(current_claim)
-                current_claim = {"text": line[6:].strip()}
-            elif line.startswith('TYPE:'):
-                current_claim["type"] = line[5:].strip()
-            elif line.startswith('CONFIDENCE:'):
-                current_claim["confidence"] = line[11:].strip()
-            elif line.startswith('VERIFY:'):
-                current_claim["requires_verification"] = line[7:].strip().lower() == "yes"
-            elif line == '---':
+                current_claim = {"text": value}
+            elif field == 'TYPE':
+                current_claim["type"] = value
+            elif field == 'CONFIDENCE':
+                current_claim["confidence"] = value
+            elif field == 'VERIFY':
+                current_claim["requires_verification"] = value.lower() == "yes"
+            else:
                 if current_claim:
                     claims.append(current_claim)
                     current_claim = {}
@@ -62,19 +78,14 @@ VERIFY: [yes/no]
         
         return claims
     
+    def iter_statistical_claims(self, text: str) -> Iterator[str]:
+        """Yield claims containing statistics or numbers as they are found"""
+        for match in _STAT_CLAIM_RE.finditer(text):
+            claim = match.group().strip()
+            # Ensure it has meaningful context (more than just a number)
+            if len(claim.split()) > 1:
+                yield claim
+    
     def extract_statistical_claims(self, text: str) -> List[str]:
         """Extract claims containing statistics or numbers"""
-        # Pattern for numbers with context
-        pattern = r'(?:(?:about|approximately|roughly|nearly|over|under|at least|up to|more than|less than)\s+)?(?:\d+(?:\.\d+)?%?|\d{1,3}(?:,\d{3})*(?:\.\d+)?)\s+(?:\w+\s+){0,5}'
-        
-        matches = re.findall(pattern, text, re.IGNORECASE)
-        
-        # Clean and filter matches
-        claims = []
-        for match in matches:
-            match = match.strip()
-            # Ensure it has meaningful context (more than just a number)
-            if len(match.split()) > 1:
-                claims.append(match)
-        
-        return claims
\ No newline at end of file
+        return list(self.iter_statistical_claims(text))
\ No newline at end of file
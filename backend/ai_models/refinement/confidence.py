@@ -3,25 +3,103 @@
 Enhanced confidence scoring for high-quality responses
 """
 
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Set, Tuple
 import numpy as np
 import logging
 import re
-from dataclasses import dataclass
+from collections import defaultdict
 from config.settings import config
 
+# Aho-Corasick finds every marker phrase in one pass over the response
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
-@dataclass
-class ConfidenceComponents:
-    """Detailed confidence score components"""
-    source_quality: float = 0.0
-    content_relevance: float = 0.0
-    linguistic_confidence: float = 0.0
-    citation_quality: float = 0.0
-    structural_quality: float = 0.0
-    factual_accuracy: float = 0.0
-    overall_score: float = 0.0
+# Compiled once at import - these run on every scored response
+_CITATION_RE = re.compile(r'\[(\d+)\]')
+_SENTENCE_RE = re.compile(r'[^.!?]+')
+_STATISTIC_RE = re.compile(r'\d+%|\d+\s*(people|patients|studies|participants)')
+
+# Below this many items, plain Python arithmetic beats NumPy's dispatch overhead
+NUMPY_MIN_ITEMS = 64
+
+def _small_mean(values: List[float]) -> float:
+    return sum(values) / len(values) if values else 0.0
+
+def _scan_structure(response: str) -> Tuple[int, Optional[float]]:
+    """
+    Paragraph count and the variance of sentence lengths (in words), or None
+    when there are no sentences. Sentences are streamed through running
+    integer sums, so no paragraph or sentence lists are built.
+    """
+    paragraphs = response.strip().count('\n\n') + 1
+    
+    count = total = total_sq = 0
+    for match in _SENTENCE_RE.finditer(response):
+        words = len(match.group().split())
+        if words:
+            count += 1
+            total += words
+            total_sq += words * words
+    
+    if not count:
+        return paragraphs, None
+    # Population variance, computed exactly on the integer sums
+    return paragraphs, (count * total_sq - total * total) / (count * count)
+
+# Scored components - positions in the component vector and the weight vectors
+COMPONENT_NAMES = (
+    "source_quality", "content_relevance", "linguistic_confidence",
+    "citation_quality", "structural_quality", "factual_accuracy"
+)
+(IDX_SOURCE, IDX_RELEVANCE, IDX_LINGUISTIC,
+ IDX_CITATION, IDX_STRUCTURAL, IDX_FACTUAL) = range(len(COMPONENT_NAMES))
+
+# Response-type specific component weights
+RESPONSE_TYPE_WEIGHTS = {
+    "emotional_support": {
+        "source_quality": 0.15,
+        "content_relevance": 0.20,
+        "linguistic_confidence": 0.20,
+        "citation_quality": 0.10,
+        "structural_quality": 0.20,
+        "factual_accuracy": 0.15
+    },
+    "factual_explanation": {
+        "source_quality": 0.25,
+        "content_relevance": 0.20,
+        "linguistic_confidence": 0.10,
+        "citation_quality": 0.20,
+        "structural_quality": 0.10,
+        "factual_accuracy": 0.25
+    },
+    "practical_guidance": {
+        "source_quality": 0.20,
+        "content_relevance": 0.25,
+        "linguistic_confidence": 0.15,
+        "citation_quality": 0.15,
+        "structural_quality": 0.20,
+        "factual_accuracy": 0.15
+    },
+    "conversational": {
+        "source_quality": 0.20,
+        "content_relevance": 0.25,
+        "linguistic_confidence": 0.20,
+        "citation_quality": 0.10,
+        "structural_quality": 0.15,
+        "factual_accuracy": 0.10
+    }
+}
+
+# Scores kept for responses rescored with identical inputs (refinement loops)
+SCORE_CACHE_SIZE = 256
+
+# Factual accuracy credited per verifier recommendation; anything else scores 0.3
+RECOMMENDATION_ACCURACY = {"accept": 0.9, "use_with_caution": 0.6}
 
 class ConfidenceScorer:
     """Enhanced confidence scoring for responses"""
@@ -51,6 +129,61 @@ class ConfidenceScorer:
             "specific": ["specifically", "exactly", "precisely", "in particular", "for example"],
             "comprehensive": ["including", "such as", "furthermore", "additionally", "moreover"]
         }
+        
+        self.vague_terms = ["some", "many", "often", "usually", "generally"]
+        
+        # Marker category -> phrases; a phrase may belong to several categories
+        self._marker_phrases = {
+            "uncertainty": self.uncertainty_phrases,
+            "confidence": self.confidence_phrases,
+            "vague": self.vague_terms,
+            **{f"quality:{category}": indicators for category, indicators in self.quality_indicators.items()}
+        }
+        self._automaton = self._build_marker_automaton() if AHOCORASICK_AVAILABLE else None
+        if self._automaton is None:
+            # Fallback: one regex scan per category. The zero-width lookahead
+            # reports a phrase at every position, so overlapping phrases are
+            # not hidden by an earlier match
+            self._marker_patterns = {
+                category: re.compile(
+                    "(?=(" + "|".join(re.escape(p) for p in sorted(phrases, key=len, reverse=True)) + "))"
+                )
+                for category, phrases in self._marker_phrases.items()
+            }
+        
+        # Recently computed scores, oldest first
+        self._score_cache: Dict[tuple, float] = {}
+        
+        # Weight vectors aligned with the component vector
+        self._type_weights = {
+            response_type: np.array([weights[name] for name in COMPONENT_NAMES], dtype=np.float64)
+            for response_type, weights in RESPONSE_TYPE_WEIGHTS.items()
+        }
+    
+    def _build_marker_automaton(self):
+        """Build one automaton over every marker phrase, tagged with its categories"""
+        phrase_categories = defaultdict(list)
+        for category, phrases in self._marker_phrases.items():
+            for phrase in phrases:
+                phrase_categories[phrase].append(category)
+        
+        automaton = ahocorasick.Automaton()
+        for phrase, categories in phrase_categories.items():
+            automaton.add_word(phrase, (phrase, tuple(categories)))
+        automaton.make_automaton()
+        return automaton
+    
+    def _find_markers(self, response_lower: str) -> Dict[str, Set[str]]:
+        """Distinct marker phrases present in the response, grouped by category"""
+        found = defaultdict(set)
+        if self._automaton is not None:
+            for _, (phrase, categories) in self._automaton.iter(response_lower):
+                for category in categories:
+                    found[category].add(phrase)
+        else:
+            for category, pattern in self._marker_patterns.items():
+                found[category].update(pattern.findall(response_lower))
+        return found
     
     def calculate_response_confidence(self, 
                                     response: str,
@@ -60,49 +193,85 @@ class ConfidenceScorer:
         """
         Calculate comprehensive confidence score for a response
         """
+        cache_key = self._score_cache_key(response, verified_results, sources_used, response_type)
+        if cache_key in self._score_cache:
+            # Move to the end so the least recently used entry is evicted first
+            final_score = self._score_cache.pop(cache_key)
+            self._score_cache[cache_key] = final_score
+            return final_score
+        
+        # Lowercase and count words once - shared by the component scorers
+        response_lower = response.lower()
+        word_count = len(response.split())
+        
         # Get detailed confidence components
         components = self._calculate_confidence_components(
-            response, verified_results, sources_used, response_type
+            response, response_lower, verified_results, sources_used, response_type
         )
         
         # Apply response-type specific weighting
         weighted_score = self._apply_response_type_weighting(components, response_type)
         
         # Apply quality adjustments
-        final_score = self._apply_quality_adjustments(weighted_score, response, sources_used)
+        final_score = self._apply_quality_adjustments(weighted_score, response, sources_used, word_count)
         
         # Log confidence breakdown for debugging
-        logger.debug(f"Confidence breakdown - Source: {components.source_quality:.2f}, "
-                    f"Relevance: {components.content_relevance:.2f}, "
-                    f"Linguistic: {components.linguistic_confidence:.2f}, "
+        logger.debug(f"Confidence breakdown - Source: {components[IDX_SOURCE]:.2f}, "
+                    f"Relevance: {components[IDX_RELEVANCE]:.2f}, "
+                    f"Linguistic: {components[IDX_LINGUISTIC]:.2f}, "
                     f"Final: {final_score:.2f}")
         
+        self._score_cache[cache_key] = final_score
+        if len(self._score_cache) > SCORE_CACHE_SIZE:
+            del self._score_cache[next(iter(self._score_cache))]
+        
         return final_score
     
+    @staticmethod
+    def _score_cache_key(response: str, verified_results: List[Dict],
+                         sources_used: List[Dict], response_type: str) -> tuple:
+        """Every input field the score depends on - cheap next to the full scoring pipeline"""
+        return (
+            response,
+            response_type,
+            tuple(
+                (r.get("source", "unknown"), r.get("final_confidence", 0.5), r.get("relevance_score", 0.5),
+                 bool(r.get("metadata", {}).get("trusted_source")), bool(r.get("has_evidence")),
+                 r.get("recommendation"))
+                for r in verified_results
+            ),
+            tuple(s.get("confidence", 0) for s in sources_used)
+        )
+    
+    def clear_cache(self):
+        """Drop all memoized scores"""
+        self._score_cache.clear()
+    
     def _calculate_confidence_components(self, response: str, 
+                                       response_lower: str,
                                        verified_results: List[Dict],
                                        sources_used: List[Dict],
-                                       response_type: str) -> ConfidenceComponents:
-        """Calculate individual confidence components"""
-        components = ConfidenceComponents()
+                                       response_type: str) -> np.ndarray:
+        """Calculate individual confidence components, indexed by the IDX_* constants"""
+        components = np.empty(len(COMPONENT_NAMES), dtype=np.float64)
         
         # 1. Source Quality Score
-        components.source_quality = self._calculate_source_quality(verified_results, sources_used)
+        components[IDX_SOURCE] = self._calculate_source_quality(verified_results, sources_used)
         
         # 2. Content Relevance Score
-        components.content_relevance = self._calculate_content_relevance(verified_results)
+        components[IDX_RELEVANCE] = self._calculate_content_relevance(verified_results)
         
         # 3. Linguistic Confidence Score
-        components.linguistic_confidence = self._calculate_linguistic_confidence(response)
+        components[IDX_LINGUISTIC] = self._calculate_linguistic_confidence(response, response_lower)
         
         # 4. Citation Quality Score
-        components.citation_quality = self._calculate_citation_quality(response, sources_used)
+        components[IDX_CITATION] = self._calculate_citation_quality(response, sources_used)
         
         # 5. Structural Quality Score
-        components.structural_quality = self._calculate_structural_quality(response, response_type)
+        components[IDX_STRUCTURAL] = self._calculate_structural_quality(response, response_lower, response_type)
         
         # 6. Factual Accuracy Score (from verification)
-        components.factual_accuracy = self._calculate_factual_accuracy(verified_results)
+        components[IDX_FACTUAL] = self._calculate_factual_accuracy(verified_results)
         
         return components
     
@@ -112,48 +281,75 @@ class ConfidenceScorer:
         if not verified_results:
             return 0.3
         
-        source_scores = []
-        
-        for result in verified_results:  # Remove limit to consider all sources
-            source_type = result.get("source", "unknown")
-            base_weight = self.config.source_confidence_weights.get(source_type, 0.5)
-            
-            # Adjust for verification confidence
-            verification_confidence = result.get("final_confidence", 0.5)
-            adjusted_score = base_weight * verification_confidence
-            
-            # Boost for high-quality indicators
-            if result.get("metadata", {}).get("trusted_source"):
-                adjusted_score *= 1.2
-            if result.get("has_evidence"):
-                adjusted_score *= 1.1
-            
-            source_scores.append(min(1.0, adjusted_score))
-        
-        return np.mean(source_scores) if source_scores else 0.3
+        count = len(verified_results)
+        weights = self.config.source_confidence_weights
+        
+        if count < NUMPY_MIN_ITEMS:
+            source_scores = []
+            for result in verified_results:
+                # Adjust for verification confidence
+                adjusted_score = weights.get(result.get("source", "unknown"), 0.5) * result.get("final_confidence", 0.5)
+                
+                # Boost for high-quality indicators
+                if result.get("metadata", {}).get("trusted_source"):
+                    adjusted_score *= 1.2
+                if result.get("has_evidence"):
+                    adjusted_score *= 1.1
+                
+                source_scores.append(min(1.0, adjusted_score))
+            return _small_mean(source_scores)
+        
+        # Gather each field into a flat array, then score every source at once
+        base_weight = np.fromiter(
+            (weights.get(r.get("source", "unknown"), 0.5) for r in verified_results),
+            dtype=np.float64, count=count
+        )
+        verification_confidence = np.fromiter(
+            (r.get("final_confidence", 0.5) for r in verified_results), dtype=np.float64, count=count
+        )
+        trusted = np.fromiter(
+            (bool(r.get("metadata", {}).get("trusted_source")) for r in verified_results), dtype=bool, count=count
+        )
+        has_evidence = np.fromiter(
+            (bool(r.get("has_evidence")) for r in verified_results), dtype=bool, count=count
+        )
+        
+        # Boost for high-quality indicators
+        source_scores = np.minimum(
+            1.0,
+            base_weight * verification_confidence * np.where(trusted, 1.2, 1.0) * np.where(has_evidence, 1.1, 1.0)
+        )
+        return float(source_scores.mean())
     
     def _calculate_content_relevance(self, verified_results: List[Dict]) -> float:
         """Calculate relevance of content used"""
         if not verified_results:
             return 0.3
         
-        relevance_scores = []
-        for result in verified_results:  # Remove limit to consider all sources
-            relevance = result.get("relevance_score", 0.5)
-            confidence = result.get("final_confidence", 0.5)
-            combined = (relevance * 0.6) + (confidence * 0.4)
-            relevance_scores.append(combined)
+        count = len(verified_results)
+        if count < NUMPY_MIN_ITEMS:
+            return _small_mean([
+                (r.get("relevance_score", 0.5) * 0.6) + (r.get("final_confidence", 0.5) * 0.4)
+                for r in verified_results
+            ])
         
-        return np.mean(relevance_scores) if relevance_scores else 0.3
+        relevance = np.fromiter(
+            (r.get("relevance_score", 0.5) for r in verified_results), dtype=np.float64, count=count
+        )
+        confidence = np.fromiter(
+            (r.get("final_confidence", 0.5) for r in verified_results), dtype=np.float64, count=count
+        )
+        return float(((relevance * 0.6) + (confidence * 0.4)).mean())
     
-    def _calculate_linguistic_confidence(self, response: str) -> float:
+    def _calculate_linguistic_confidence(self, response: str, response_lower: str) -> float:
         """Enhanced linguistic confidence analysis"""
-        response_lower = response.lower()
         score = 0.7  # Base score
         
+        markers = self._find_markers(response_lower)
+        
         # Count confidence vs uncertainty markers
-        uncertainty_count = sum(1 for phrase in self.uncertainty_phrases if phrase in response_lower)
-        confidence_count = sum(1 for phrase in self.confidence_phrases if phrase in response_lower)
+        uncertainty_count = len(markers["uncertainty"])
+        confidence_count = len(markers["confidence"])
         
         # Calculate confidence ratio
         total_markers = uncertainty_count + confidence_count
@@ -162,56 +358,52 @@ class ConfidenceScorer:
             score = 0.5 + (confidence_ratio * 0.4)  # Scale to 0.5-0.9
         
         # Check for quality indicators
-        for category, indicators in self.quality_indicators.items():
-            if any(indicator in response_lower for indicator in indicators):
+        for category in self.quality_indicators:
+            if markers[f"quality:{category}"]:
                 score += 0.05
         
         # Penalize vague language
-        vague_terms = ["some", "many", "often", "usually", "generally"]
-        vague_count = sum(1 for term in vague_terms if term in response_lower)
+        vague_count = len(markers["vague"])
         score -= (vague_count * 0.02)
         
         # Boost for specific numbers or statistics
-        if re.search(r'\d+%|\d+\s*(people|patients|studies|participants)', response):
+        if _STATISTIC_RE.search(response):
             score += 0.1
         
         return max(0.3, min(1.0, score))
     
     def _calculate_citation_quality(self, response: str, sources_used: List[Dict]) -> float:
         """Calculate quality of citations in response"""
-        citations_in_response = re.findall(r'\[(\d+)\]', response)
-        
-        if not citations_in_response:
+        # One scan collects the cited ids and which thirds of the response they
+        # fall in (bit 0/1/2 = first/middle/last third)
+        response_thirds = len(response) // 3
+        unique_citations = set()
+        thirds_hit = 0
+        for match in _CITATION_RE.finditer(response):
+            unique_citations.add(match.group(1))
+            pos = match.start()
+            thirds_hit |= 1 if pos < response_thirds else (2 if pos < 2 * response_thirds else 4)
+        
+        if not unique_citations:
             return 0.3 if not self.config.require_citations else 0.1
         
         # Check citation coverage
-        unique_citations = set(citations_in_response)
         citation_coverage = len(unique_citations) / max(len(sources_used), 1)
         
         # Check citation placement (should be distributed throughout)
-        response_thirds = len(response) // 3
-        citation_positions = [m.start() for m in re.finditer(r'\[\d+\]', response)]
-        
-        distributed_score = 0.7  # Default
-        if citation_positions:
-            # Check if citations appear in different parts of response
-            in_first_third = any(pos < response_thirds for pos in citation_positions)
-            in_middle_third = any(response_thirds <= pos < 2*response_thirds for pos in citation_positions)
-            in_last_third = any(pos >= 2*response_thirds for pos in citation_positions)
-            
-            distribution_count = sum([in_first_third, in_middle_third, in_last_third])
-            distributed_score = distribution_count / 3.0
+        distributed_score = bin(thirds_hit).count("1") / 3.0
         
         # Combine scores
         return (citation_coverage * 0.5) + (distributed_score * 0.5)
     
-    def _calculate_structural_quality(self, response: str, response_type: str) -> float:
+    def _calculate_structural_quality(self, response: str, response_lower: str, response_type: str) -> float:
         """Calculate structural quality of response"""
         score = 0.5  # Base score
         
+        paragraphs, length_variance = _scan_structure(response)
+        
         # Check paragraph structure
-        paragraphs = response.strip().split('\n\n')
-        if 2 <= len(paragraphs) <= 4:
+        if 2 <= paragraphs <= 4:
             score += 0.2
         
         # Check for appropriate formatting
@@ -225,17 +417,14 @@ class ConfidenceScorer:
                 score += 0.2
         
         # Check sentence variety
-        sentences = re.split(r'[.!?]+', response)
-        sentence_lengths = [len(s.split()) for s in sentences if s.strip()]
-        if sentence_lengths:
+        if length_variance is not None:
             # Good variety in sentence length
-            length_variance = np.var(sentence_lengths)
             if 20 < length_variance < 100:  # Not too uniform, not too varied
                 score += 0.1
         
         # Check for professional disclaimer if needed
         if response_type in ["emotional_support", "practical_guidance"]:
-            if any(term in response.lower() for term in ["professional", "consult", "healthcare"]):
+            if any(term in response_lower for term in ["professional", "consult", "healthcare"]):
                 score += 0.1
         
         return min(1.0, score)
@@ -245,95 +434,59 @@ class ConfidenceScorer:
         if not verified_results:
             return 0.5
         
-        accuracy_scores = []
-        for result in verified_results:
-            if result.get("recommendation") == "accept":
-                accuracy_scores.append(0.9)
-            elif result.get("recommendation") == "use_with_caution":
-                accuracy_scores.append(0.6)
-            else:
-                accuracy_scores.append(0.3)
+        if len(verified_results) < NUMPY_MIN_ITEMS:
+            return _small_mean([RECOMMENDATION_ACCURACY.get(r.get("recommendation"), 0.3) for r in verified_results])
         
-        return np.mean(accuracy_scores) if accuracy_scores else 0.5
+        accuracy_scores = np.fromiter(
+            (RECOMMENDATION_ACCURACY.get(r.get("recommendation"), 0.3) for r in verified_results),
+            dtype=np.float64, count=len(verified_results)
+        )
+        return float(accuracy_scores.mean())
     
-    def _apply_response_type_weighting(self, components: ConfidenceComponents, 
+    def _apply_response_type_weighting(self, components: np.ndarray, 
                                      response_type: str) -> float:
         """Apply response-type specific weighting to components"""
-        weights = {
-            "emotional_support": {
-                "source_quality": 0.15,
-                "content_relevance": 0.20,
-                "linguistic_confidence": 0.20,
-                "citation_quality": 0.10,
-                "structural_quality": 0.20,
-                "factual_accuracy": 0.15
-            },
-            "factual_explanation": {
-                "source_quality": 0.25,
-                "content_relevance": 0.20,
-                "linguistic_confidence": 0.10,
-                "citation_quality": 0.20,
-                "structural_quality": 0.10,
-                "factual_accuracy": 0.25
-            },
-            "practical_guidance": {
-                "source_quality": 0.20,
-                "content_relevance": 0.25,
-                "linguistic_confidence": 0.15,
-                "citation_quality": 0.15,
-                "structural_quality": 0.20,
-                "factual_accuracy": 0.15
-            },
-            "conversational": {
-                "source_quality": 0.20,
-                "content_relevance": 0.25,
-                "linguistic_confidence": 0.20,
-                "citation_quality": 0.10,
-                "structural_quality": 0.15,
-                "factual_accuracy": 0.10
-            }
-        }
-        
-        type_weights = weights.get(response_type, weights["conversational"])
-        
-        weighted_score = (
-            components.source_quality * type_weights["source_quality"] +
-            components.content_relevance * type_weights["content_relevance"] +
-            components.linguistic_confidence * type_weights["linguistic_confidence"] +
-            components.citation_quality * type_weights["citation_quality"] +
-            components.structural_quality * type_weights["structural_quality"] +
-            components.factual_accuracy * type_weights["factual_accuracy"]
-        )
-        
-        return weighted_score
+        type_weights = self._type_weights.get(response_type, self._type_weights["conversational"])
+        return float(np.dot(components, type_weights))
     
     def _apply_quality_adjustments(self, base_score: float, response: str, 
-                                 sources_used: List[Dict]) -> float:
+                                 sources_used: List[Dict], word_count: int) -> float:
         """Apply final quality adjustments"""
-        final_score = base_score
+        min_length = self.config.min_response_length
+        max_length = self.config.max_response_length
         
         # Length appropriateness
-        word_count = len(response.split())
-        if self.config.min_response_length <= word_count <= self.config.max_response_length:
-            final_score *= 1.05
-        elif word_count < self.config.min_response_length:
-            final_score *= 0.9
-        elif word_count > self.config.max_response_length * 1.5:
-            final_score *= 0.95
-        
-        # Multiple high-quality sources boost
-        high_quality_sources = sum(1 for s in sources_used if s.get("confidence", 0) > 0.8)
+        if min_length <= word_count <= max_length:
+            multiplier = 1.05
+        elif word_count < min_length:
+            multiplier = 0.9
+        elif word_count > max_length * 1.5:
+            multiplier = 0.95
+        else:
+            multiplier = 1.0
+        
+        # Multiple high-quality sources boost - only 2 vs 3+ matters, so stop counting at 3
+        if len(sources_used) >= NUMPY_MIN_ITEMS:
+            confidences = np.fromiter(
+                (source.get("confidence", 0.0) for source in sources_used),
+                dtype=np.float64, count=len(sources_used)
+            )
+            high_quality_sources = int(np.count_nonzero(confidences > 0.8))
+        else:
+            high_quality_sources = 0
+            for source in sources_used:
+                if source.get("confidence", 0) > 0.8:
+                    high_quality_sources += 1
+                    if high_quality_sources == 3:
+                        break
         if high_quality_sources >= 3:
-            final_score *= 1.1
-        elif high_quality_sources >= 2:
-            final_score *= 1.05
-        
-        # Ensure minimum confidence for well-formed responses
-        if len(response) > 100 and len(sources_used) > 0:
-            final_score = max(0.6, final_score)
+            multiplier *= 1.1
+        elif high_quality_sources == 2:
+            multiplier *= 1.05
         
-        # Cap maximum confidence
-        return min(0.95, final_score)
+        # Ensure minimum confidence for well-formed responses, cap maximum confidence
+        floor = 0.6 if len(response) > 100 and sources_used else 0.0
+        return min(0.95, max(floor, base_score * multiplier))
     
     def get_confidence_explanation(self, confidence_score: float) -> str:
         """Get human-readable explanation of confidence level"""
@@ -4,10 +4,65 @@ Fact checking using retrieved context
 """
 
 from typing import List, Dict, Any, Tuple
+import asyncio
 import logging
+import re
+from config.settings import config
 
 logger = logging.getLogger(__name__)
 
+# Sources included in a fact-checking prompt, and the characters kept from each
+MAX_SOURCES = 5
+MAX_SOURCE_CHARS = 500
+_SOURCE_PREFIXES = tuple(f"Source {i+1}: " for i in range(MAX_SOURCES))
+
+# Splits a batched fact-check result into one block per numbered claim. Headers
+# must start a line, so "claim 2:" quoted inside an explanation does not split it
+_CLAIM_BLOCK_RE = re.compile(
+    r'^[ \t]*CLAIM\s+(\d+):(.*?)(?=^[ \t]*CLAIM\s+\d+:|\Z)',
+    re.DOTALL | re.MULTILINE | re.IGNORECASE
+)
+
+# One match per "FIELD: value" line of a fact-check result
+_FC_LINE_RE = re.compile(
+    r'^[ \t]*(SUPPORTED|SOURCES|CONTRADICTIONS|CONFIDENCE|EXPLANATION):[ \t]*(.*?)\s*$',
+    re.MULTILINE | re.IGNORECASE
+)
+_SOURCES_NUM_RE = re.compile(r'\d+')
+
+def _set_supported(value: str, parsed: Dict):
+    parsed["supported"] = value.lower()
+
+def _set_sources(value: str, parsed: Dict):
+    if value.lower() != 'none':
+        parsed["sources"] = [int(n) for n in _SOURCES_NUM_RE.findall(value)]
+
+def _set_contradictions(value: str, parsed: Dict):
+    parsed["has_contradictions"] = 'yes' in value.lower()
+
+def _set_confidence(value: str, parsed: Dict):
+    try:
+        parsed["confidence"] = float(value)
+    except ValueError:
+        pass
+
+def _set_explanation(value: str, parsed: Dict):
+    parsed["explanation"] = value
+
+_FIELD_HANDLERS = {
+    "SUPPORTED": _set_supported,
+    "SOURCES": _set_sources,
+    "CONTRADICTIONS": _set_contradictions,
+    "CONFIDENCE": _set_confidence,
+    "EXPLANATION": _set_explanation
+}
+
+_RESULT_FORMAT = """SUPPORTED: [yes/no/partially]
+SOURCES: [1,2,3 or none]
+CONTRADICTIONS: [yes/no]
+CONFIDENCE: [0.0-1.0]
+EXPLANATION: [your explanation]"""
+
 class FactChecker:
     """Check facts against retrieved context"""
     
@@ -16,11 +71,7 @@ class FactChecker:
     
     async def check_fact(self, claim: str, context: List[Dict]) -> Dict:
         """Check if a claim is supported by context"""
-        # Prepare context
-        context_text = "\n\n".join([
-            f"Source {i+1}: {doc.get('text', '')[:500]}"
-            for i, doc in enumerate(context[:5])
-        ])
+        context_text = self._format_context(context)
         
         prompt = f"""Verify if this claim is supported by the provided sources.
 
@@ -37,11 +88,7 @@ Analyze:
 5. Explanation: (brief explanation)
 
 Format your response as:
-SUPPORTED: [yes/no/partially]
-SOURCES: [1,2,3 or none]
-CONTRADICTIONS: [yes/no]
-CONFIDENCE: [0.0-1.0]
-EXPLANATION: [your explanation]"""
+{_RESULT_FORMAT}"""
         
         result = await self.llm_manager.ainvoke(prompt)
         
@@ -51,6 +98,80 @@ EXPLANATION: [your explanation]"""
         
         return parsed
     
+    async def check_facts_batched(self, claims: List[str], context: List[Dict]) -> List[Dict]:
+        """Check several claims with a single prompt sharing one copy of the context"""
+        if len(claims) <= 1:
+            return [await self.check_fact(claim, context) for claim in claims]
+        
+        context_text = self._format_context(context)
+        claims_text = "\n".join(f"{i+1}. {claim}" for i, claim in enumerate(claims))
+        
+        prompt = f"""Verify whether each of these claims is supported by the provided sources.
+
+Claims:
+{claims_text}
+
+Sources:
+{context_text}
+
+For each claim, analyze:
+1. Is the claim directly supported? (yes/no/partially)
+2. Which sources support it? (list source numbers)
+3. Are there any contradictions? (yes/no)
+4. Confidence level: (0.0-1.0)
+5. Explanation: (brief explanation)
+
+Format your response as one block per claim, in order:
+CLAIM <number>:
+{_RESULT_FORMAT}"""
+        
+        result = await self.llm_manager.ainvoke(prompt)
+        
+        # Parse one block per claim; the last block for a number wins
+        blocks = {}
+        for match in _CLAIM_BLOCK_RE.finditer(result):
+            blocks[int(match.group(1))] = match.group(2)
+        
+        results = [None] * len(claims)
+        missing = []
+        for i, claim in enumerate(claims):
+            block = blocks.get(i + 1)
+            if block is None:
+                missing.append(i)
+                continue
+            parsed = self._parse_fact_check_result(block)
+            parsed["claim"] = claim
+            results[i] = parsed
+        
+        # Claims the model skipped are checked on their own
+        if missing:
+            logger.warning(f"Batched fact check returned no result for {len(missing)} claim(s), checking individually")
+            rechecked = await self._check_facts_individually([claims[i] for i in missing], context)
+            for i, parsed in zip(missing, rechecked):
+                results[i] = parsed
+        
+        return results
+    
+    async def _check_facts_individually(self, claims: List[str], context: List[Dict]) -> List[Dict]:
+        """Check claims one call each, with at most fact_check_max_concurrency calls in flight"""
+        # gather under a semaphore rather than asyncio.TaskGroup, which needs 3.11 - above the 3.9 floor
+        semaphore = asyncio.Semaphore(max(1, config.quality.fact_check_max_concurrency))
+        
+        async def guarded_check(claim: str) -> Dict:
+            async with semaphore:
+                return await self.check_fact(claim, context)
+        
+        return await asyncio.gather(*(guarded_check(claim) for claim in claims))
+    
+    def _format_context(self, context: List[Dict]) -> str:
+        """Format the top sources for a fact-checking prompt"""
+        parts = []
+        for prefix, doc in zip(_SOURCE_PREFIXES, context):
+            text = doc.get('text') or ''
+            # Only long texts are sliced; short ones are used as-is without a copy
+            parts.append(prefix + (text if len(text) <= MAX_SOURCE_CHARS else text[:MAX_SOURCE_CHARS]))
+        return "\n\n".join(parts)
+    
     def _parse_fact_check_result(self, result: str) -> Dict:
         """Parse fact checking result"""
         parsed = {
@@ -61,41 +182,11 @@ EXPLANATION: [your explanation]"""
             "explanation": ""
         }
         
-        for line in result.split('\n'):
-            line = line.strip()
-            
-            if line.startswith('SUPPORTED:'):
-                value = line[10:].strip().lower()
-                parsed["supported"] = value
-            
-            elif line.startswith('SOURCES:'):
-                sources_str = line[8:].strip()
-                if sources_str.lower() != 'none':
-                    # Extract numbers
-                    import re
-                    numbers = re.findall(r'\d+', sources_str)
-                    parsed["sources"] = [int(n) for n in numbers]
-            
-            elif line.startswith('CONTRADICTIONS:'):
-                parsed["has_contradictions"] = 'yes' in line.lower()
-            
-            elif line.startswith('CONFIDENCE:'):
-                try:
-                    conf_str = line[11:].strip()
-                    parsed["confidence"] = float(conf_str)
-                except:
-                    pass
-            
-            elif line.startswith('EXPLANATION:'):
-                parsed["explanation"] = line[12:].strip()
+        for match in _FC_LINE_RE.finditer(result):
+            _FIELD_HANDLERS[match.group(1).upper()](match.group(2), parsed)
         
         return parsed
     
     async def check_multiple_facts(self, claims: List[str], context: List[Dict]) -> List[Dict]:
-        """Check multiple facts in parallel"""
-        import asyncio
-        
-        tasks = [self.check_fact(claim, context) for claim in claims]
-        results = await asyncio.gather(*tasks)
-        
-        return results
\ No newline at end of file
+        """Check multiple facts with one batched LLM call"""
+        return await self.check_facts_batched(claims, context)
@@ -1,84 +1,294 @@
 # retrieval/bm25_search.py
 """
 BM25 keyword-based search
+
+Okapi BM25 (same scoring as rank_bm25.BM25Okapi) over a sparse term-document
+matrix: every (term, document) weight is precomputed, so scoring a query is a
+sum of a few sparse rows instead of a Python loop over the corpus.
 """
 
-from rank_bm25 import BM25Okapi
 import numpy as np
+from scipy import sparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
 from typing import List, Dict, Any
 import pickle
 import logging
+import multiprocessing
+import os
+
+from .uring_io import read_file_uring
+from .hugepages import advise_hugepage
 
 logger = logging.getLogger(__name__)
 
+# BM25Okapi defaults
+BM25_K1 = 1.5
+BM25_B = 0.75
+BM25_EPSILON = 0.25  # Floor for negative IDFs, as a fraction of the average IDF
+
+# Corpora at least this large are tokenized across processes
+PARALLEL_TOKENIZE_MIN_DOCS = 20000
+
+def _tokenize(text: str) -> List[str]:
+    # Convert to lowercase and split
+    return text.lower().split()
+
+def _count_chunk(documents: List[str]):
+    """
+    Term counts for a chunk of documents against a chunk-local vocabulary:
+    (terms in id order, row ids, column ids, counts, document lengths)
+    """
+    vocabulary = {}
+    rows, cols, counts = [], [], []
+    doc_lengths = np.zeros(len(documents), dtype=np.float32)
+    
+    for doc_id, doc in enumerate(documents):
+        tokens = _tokenize(doc)
+        doc_lengths[doc_id] = len(tokens)
+        for token, count in Counter(tokens).items():
+            rows.append(vocabulary.setdefault(token, len(vocabulary)))
+            cols.append(doc_id)
+            counts.append(count)
+    
+    return (
+        list(vocabulary),
+        np.asarray(rows, dtype=np.int32),
+        np.asarray(cols, dtype=np.int32),
+        np.asarray(counts, dtype=np.float32),
+        doc_lengths
+    )
+
 class BM25Search:
     """BM25 keyword search implementation"""
     
     def __init__(self, documents: List[str] = None):
         self.documents = documents or []
-        self.bm25 = None
-        self.tokenized_docs = []
+        self.vocabulary: Dict[str, int] = {}
+        self.term_freqs = None  # (vocab, docs) CSR matrix of raw term counts
+        self.doc_lengths = None
+        self._weights = None    # (vocab, docs) CSR matrix of BM25 term weights
+        self._pending = []      # (term counts, doc lengths) of documents added since the last merge
         
         if documents:
             self._build_index(documents)
     
     def _tokenize(self, text: str) -> List[str]:
         """Simple tokenization"""
-        # Convert to lowercase and split
-        return text.lower().split()
+        return _tokenize(text)
+    
+    def _count_terms(self, documents: List[str], parallel: bool = True):
+        """
+        Term counts of the documents as a (vocab, docs) CSR block, adding new terms to the vocabulary.
+        parallel=False keeps the counting in this process, e.g. when called from a server's worker thread.
+        """
+        if parallel and len(documents) >= PARALLEL_TOKENIZE_MIN_DOCS and (os.cpu_count() or 1) > 1:
+            # Tokenizing and counting is pure Python - spread the chunks over processes.
+            # Spawned, not forked: forking a process with live threads (event loop,
+            # log listener, OpenMP pools) can leave a child stuck on a copied lock
+            workers = os.cpu_count()
+            chunk_size = -(-len(documents) // (workers * 4))
+            chunks = [documents[i:i + chunk_size] for i in range(0, len(documents), chunk_size)]
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+                chunk_counts = list(executor.map(_count_chunk, chunks))
+        else:
+            chunk_counts = [_count_chunk(documents)]
+        
+        # Map each chunk's local term ids onto the shared vocabulary. Chunks are
+        # merged in order, so term ids come out the same as a sequential pass
+        vocabulary = self.vocabulary
+        all_rows, all_cols, all_counts, all_lengths = [], [], [], []
+        offset = 0
+        for terms, rows, cols, counts, lengths in chunk_counts:
+            remap = np.fromiter(
+                (vocabulary.setdefault(term, len(vocabulary)) for term in terms),
+                dtype=np.int32, count=len(terms)
+            )
+            all_rows.append(remap[rows])
+            all_cols.append(cols + offset)
+            all_counts.append(counts)
+            all_lengths.append(lengths)
+            offset += len(lengths)
+        
+        term_freqs = sparse.csr_matrix(
+            (np.concatenate(all_counts), (np.concatenate(all_rows), np.concatenate(all_cols))),
+            shape=(len(vocabulary), len(documents))
+        )
+        return term_freqs, np.concatenate(all_lengths)
     
-    def _build_index(self, documents: List[str]):
+    def _build_index(self, documents: List[str], parallel: bool = True):
         """Build BM25 index"""
         logger.info(f"Building BM25 index for {len(documents)} documents")
         
         self.documents = documents
-        self.tokenized_docs = [self._tokenize(doc) for doc in documents]
-        self.bm25 = BM25Okapi(self.tokenized_docs)
+        self.vocabulary = {}
+        self._pending = []
+        self.term_freqs, self.doc_lengths = self._count_terms(documents, parallel)
+        self._compute_weights()
         
         logger.info("BM25 index built successfully")
     
+    def _merge_pending(self):
+        """Fold documents added since the last merge into the matrix and recompute the weights"""
+        if not self._pending:
+            return
+        
+        # Earlier blocks predate terms introduced by later ones - pad them with empty rows
+        num_terms = len(self.vocabulary)
+        blocks = [self.term_freqs] + [term_freqs for term_freqs, _ in self._pending]
+        for block in blocks:
+            block.resize((num_terms, block.shape[1]))
+        
+        self.term_freqs = sparse.hstack(blocks, format="csr")
+        self.doc_lengths = np.concatenate([self.doc_lengths] + [lengths for _, lengths in self._pending])
+        self._pending = []
+        # IDF and average length depend on the whole corpus, so all weights change
+        self._compute_weights()
+    
+    def _compute_weights(self):
+        """Precompute idf(t) * tf * (k1 + 1) / (tf + k1 * (1 - b + b * dl / avgdl)) for every entry"""
+        tf = self.term_freqs
+        num_docs = tf.shape[1]
+        if num_docs == 0 or tf.nnz == 0:
+            self._weights = None
+            return
+        
+        doc_freq = np.diff(tf.indptr).astype(np.float64)
+        idf = np.log(num_docs - doc_freq + 0.5) - np.log(doc_freq + 0.5)
+        # Terms in more than half the corpus get a small positive floor instead of a negative IDF
+        idf[idf < 0] = BM25_EPSILON * idf.mean()
+        
+        avgdl = self.doc_lengths.sum() / num_docs
+        length_norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths / avgdl)
+        
+        term_ids = np.repeat(np.arange(tf.shape[0]), np.diff(tf.indptr))
+        data = idf[term_ids] * tf.data * (BM25_K1 + 1) / (tf.data + length_norm[tf.indices])
+        self._weights = sparse.csr_matrix(
+            (data.astype(np.float32), tf.indices, tf.indptr), shape=tf.shape
+        )
+        # Every query gathers rows from these arrays
+        advise_hugepage(self._weights.data)
+        advise_hugepage(self._weights.indices)
+    
+    def get_scores(self, tokenized_query: List[str]) -> np.ndarray:
+        """BM25 score of every document for an already tokenized query"""
+        self._merge_pending()
+        num_docs = len(self.documents)
+        # Repeated query terms count once per occurrence, as in BM25Okapi
+        term_ids = [self.vocabulary[token] for token in tokenized_query if token in self.vocabulary]
+        if not term_ids:
+            return np.zeros(num_docs, dtype=np.float32)
+        
+        # Each term's row is a contiguous slice of the CSR arrays - concatenate
+        # the slices and scatter-add them into one dense score vector
+        weights = self._weights
+        starts, ends = weights.indptr[term_ids], weights.indptr[np.asarray(term_ids) + 1]
+        doc_ids = np.concatenate([weights.indices[start:end] for start, end in zip(starts, ends)])
+        term_weights = np.concatenate([weights.data[start:end] for start, end in zip(starts, ends)])
+        return np.bincount(doc_ids, weights=term_weights, minlength=num_docs).astype(np.float32)
+    
     def add_documents(self, documents: List[str]):
-        """Add documents to the index"""
+        """
+        Add documents to the index. Only the new documents are tokenized; their
+        counts are merged into the matrix on the next search or save, so a run
+        of adds costs one merge instead of a rebuild per call.
+        """
+        if self.term_freqs is None:
+            self.documents.extend(documents)
+            self._build_index(self.documents)
+            return
+        
         self.documents.extend(documents)
-        self._build_index(self.documents)
+        self._pending.append(self._count_terms(documents))
     
     async def search(self, query: str, top_k: int = 10) -> List[Dict]:
         """Search using BM25"""
-        if not self.bm25:
+        self._merge_pending()
+        if self._weights is None:
             return []
         
         # Tokenize query
         tokenized_query = self._tokenize(query)
         
         # Get scores
-        scores = self.bm25.get_scores(tokenized_query)
+        scores = self.get_scores(tokenized_query)
         
-        # Get top k indices
-        top_indices = np.argsort(scores)[::-1][:top_k]
+        # Only documents with positive scores are candidates - usually a small fraction
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > top_k:
+            # O(N) partition for the top k, then sort just those k
+            candidates = candidates[np.argpartition(scores[candidates], -top_k)[-top_k:]]
+        top_indices = candidates[np.argsort(scores[candidates])[::-1]]
         
-        results = []
-        for idx in top_indices:
-            if scores[idx] > 0:  # Only include documents with positive scores
-                results.append({
-                    "text": self.documents[idx],
-                    "score": float(scores[idx]),
-                    "metadata": {"index": int(idx)}
-                })
-        
-        return results
+        return [
+            {
+                "text": self.documents[idx],
+                "score": float(scores[idx]),
+                "metadata": {"index": int(idx)}
+            }
+            for idx in top_indices
+        ]
+    
+    @staticmethod
+    def _matrix_path(path: str) -> str:
+        return str(Path(path).with_suffix(".npz"))
     
     def save(self, path: str):
-        """Save BM25 index"""
-        with open(path, "wb") as f:
+        """Save BM25 index - documents and vocabulary in the pickle, term counts in a .npz beside it"""
+        self._merge_pending()
+        # Write to temp files and swap them in atomically. save_npz gets a file
+        # object since it would append ".npz" to a ".tmp" path
+        matrix_path = self._matrix_path(path)
+        with open(f"{matrix_path}.tmp", "wb") as f:
+            sparse.save_npz(f, self.term_freqs, compressed=False)
+        with open(f"{path}.tmp", "wb") as f:
             pickle.dump({
                 "documents": self.documents,
-                "tokenized_docs": self.tokenized_docs
-            }, f)
+                "vocabulary": self.vocabulary,
+                "doc_lengths": self.doc_lengths
+            }, f, protocol=pickle.HIGHEST_PROTOCOL)
+        
+        os.replace(f"{matrix_path}.tmp", matrix_path)
+        os.replace(f"{path}.tmp", path)
     
     def load(self, path: str):
-        """Load BM25 index"""
-        with open(path, "rb") as f:
-            data = pickle.load(f)
-            self.documents = data["documents"]
-            self.tokenized_docs = data["tokenized_docs"]
-            self.bm25 = BM25Okapi(self.tokenized_docs)
\ No newline at end of file
+        """
+        Load BM25 index. A legacy pickle, or one whose term matrix is missing
+        or stale, is rebuilt from its saved documents and written back in
+        the current format.
+        """
+        data = pickle.loads(read_file_uring(path))
+        self.documents = data["documents"]
+        self._pending = []
+        
+        if "tokenized_docs" in data:
+            # Index saved before the sparse format
+            logger.info("Converting legacy BM25 index to the sparse format")
+            self._rebuild_and_save(path)
+            return
+        
+        self.vocabulary = data["vocabulary"]
+        self.doc_lengths = data["doc_lengths"]
+        try:
+            self.term_freqs = sparse.load_npz(self._matrix_path(path)).tocsr()
+        except FileNotFoundError:
+            logger.warning("BM25 term matrix not found - rebuilding it from the saved documents")
+            self._rebuild_and_save(path)
+            return
+        
+        # The matrix replaces re-tokenizing on load, but only if it belongs to these documents
+        if self.term_freqs.shape != (len(self.vocabulary), len(self.documents)):
+            logger.warning("BM25 term matrix does not match the saved documents - rebuilding")
+            self._rebuild_and_save(path)
+            return
+        self._compute_weights()
+    
+    def _rebuild_and_save(self, path: str):
+        """Re-index the loaded documents and save them so the next load is direct"""
+        # Loads run on the server's threads, so no worker processes here
+        self._build_index(self.documents, parallel=False)
+        try:
+            self.save(path)
+        except OSError as e:
+            logger.warning(f"Could not save the rebuilt BM25 index: {e}")
@@ -0,0 +1,85 @@
+# retrieval/document_sidecar.py
+"""
+On-disk document text and metadata for the vector store, read on demand
+"""
+
+import os
+import json
+import functools
+from mmap import mmap as memory_map, ACCESS_READ
+from collections.abc import Sequence
+from typing import List, Dict, Any
+import numpy as np
+
+DOCS_SUFFIX = ".docs.jsonl"
+OFFSETS_SUFFIX = ".docs.npy"
+RECORD_CACHE_SIZE = 1024  # Parsed records kept for repeat hits on popular documents
+
+def write_document_sidecar(path: str, documents: List[str], metadata: List[Dict]):
+    """
+    Write one JSON line per document plus an array of byte offsets, each via a
+    temp file swapped in atomically. Record i spans offsets[i]:offsets[i+1].
+    """
+    offsets = np.zeros(len(documents) + 1, dtype=np.int64)
+    with open(f"{path}{DOCS_SUFFIX}.tmp", "wb") as f:
+        position = 0
+        for i, text in enumerate(documents):
+            meta = metadata[i] if i < len(metadata) else {}
+            line = json.dumps({"text": text, "metadata": meta}, ensure_ascii=False, default=str).encode("utf-8") + b"\n"
+            f.write(line)
+            position += len(line)
+            offsets[i + 1] = position
+
+    with open(f"{path}{OFFSETS_SUFFIX}.tmp", "wb") as f:
+        np.save(f, offsets, allow_pickle=False)
+
+    os.replace(f"{path}{DOCS_SUFFIX}.tmp", f"{path}{DOCS_SUFFIX}")
+    os.replace(f"{path}{OFFSETS_SUFFIX}.tmp", f"{path}{OFFSETS_SUFFIX}")
+
+def sidecar_exists(path: str) -> bool:
+    return os.path.exists(f"{path}{DOCS_SUFFIX}") and os.path.exists(f"{path}{OFFSETS_SUFFIX}")
+
+class DocumentSidecar:
+    """Memory-mapped JSONL sidecar - a record is parsed only when it is looked up"""
+    
+    def __init__(self, path: str):
+        self._offsets = np.load(f"{path}{OFFSETS_SUFFIX}", mmap_mode="r", allow_pickle=False)
+        self._file = open(f"{path}{DOCS_SUFFIX}", "rb")
+        # mmap refuses empty files
+        self._map = memory_map(self._file.fileno(), 0, access=ACCESS_READ) if self._offsets[-1] else b""
+        self.record = functools.lru_cache(maxsize=RECORD_CACHE_SIZE)(self._read_record)
+        self.documents = SidecarField(self, "text")
+        self.metadata = SidecarField(self, "metadata")
+    
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+    
+    def _read_record(self, index: int) -> Dict[str, Any]:
+        start, end = self._offsets[index], self._offsets[index + 1]
+        return json.loads(self._map[start:end])
+    
+    def close(self):
+        self.record.cache_clear()
+        if not isinstance(self._map, bytes):
+            self._map.close()
+        self._file.close()
+
+class SidecarField(Sequence):
+    """Read-only list view of one field ("text" or "metadata") of every record"""
+    
+    def __init__(self, sidecar: DocumentSidecar, field: str):
+        self._sidecar = sidecar
+        self._field = field
+    
+    def __len__(self) -> int:
+        return len(self._sidecar)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        index = int(index)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("sidecar index out of range")
+        return self._sidecar.record(index)[self._field]
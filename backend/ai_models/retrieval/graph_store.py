@@ -4,14 +4,23 @@ OPTIMIZED Knowledge graph store with performance improvements
 """
 
 import networkx as nx
+import asyncio
+import gc
+import os
 import pickle
-from typing import List, Dict, Any, Tuple, Set
+import threading
+from typing import List, Dict, Any, Tuple, Set, Optional
 import logging
 import time
 from collections import defaultdict
 
+from .uring_io import read_file_uring
+
 logger = logging.getLogger(__name__)
 
+# After a failed lazy load, searches return nothing for this long before the next attempt
+LOAD_RETRY_BACKOFF = 300.0  # seconds
+
 class GraphStore:
     """OPTIMIZED Knowledge graph for entity-relationship storage with performance improvements"""
     
@@ -31,6 +40,97 @@ class GraphStore:
             "cache_misses": 0,
             "searches": 0
         }
+        
+        # Lazy residency, see attach() - the graph is loaded on first search
+        # and dropped again after idle_ttl seconds without one
+        self._lazy_path: Optional[str] = None
+        self._idle_ttl = 0
+        self._loaded = False
+        self._last_used = 0.0
+        self._active_searches = 0  # Searches in progress - guarded by _residency_lock
+        self._load_failed_at = 0.0
+        self._residency_lock = threading.Lock()
+        self._evictor_stop = threading.Event()
+        self._evictor: Optional[threading.Thread] = None
+    
+    @property
+    def is_loaded(self) -> bool:
+        """False while an attached graph is waiting for its first search"""
+        return self._lazy_path is None or self._loaded
+    
+    def attach(self, path: str, idle_ttl: float):
+        """
+        Serve the graph at path lazily: it is loaded on the first search_entity
+        call and unloaded after idle_ttl seconds without a search.
+        """
+        self._lazy_path = path
+        self._idle_ttl = idle_ttl
+        self._loaded = False
+        self._load_failed_at = 0.0
+        if self._evictor is None:
+            self._evictor = threading.Thread(target=self._evict_when_idle, name="graph-evictor", daemon=True)
+            self._evictor.start()
+        logger.info(f"Knowledge graph attached from {path} - loads on first graph query")
+    
+    def close(self):
+        """Stop the idle evictor"""
+        self._evictor_stop.set()
+    
+    def _in_load_backoff(self) -> bool:
+        return bool(self._load_failed_at) and time.monotonic() - self._load_failed_at < LOAD_RETRY_BACKOFF
+    
+    def _pin(self, load: bool) -> bool:
+        """
+        Count a search against the resident graph so the evictor keeps it,
+        loading an attached graph first if load is set. False if the graph
+        is not resident and was not loaded.
+        """
+        with self._residency_lock:
+            if not self.is_loaded and not (load and self._load_attached()):
+                return False
+            self._active_searches += 1
+            self._last_used = time.monotonic()
+            return True
+    
+    def _unpin(self):
+        with self._residency_lock:
+            self._active_searches -= 1
+            self._last_used = time.monotonic()
+    
+    def _load_attached(self) -> bool:
+        """Load the attached graph - the caller holds _residency_lock"""
+        if self._in_load_backoff():
+            return False
+        try:
+            self.load(self._lazy_path)
+        except Exception:
+            # Every search would otherwise re-read and unpickle the file only to fail again
+            self._load_failed_at = time.monotonic()
+            logger.warning(f"Knowledge graph unavailable - next load attempt in {LOAD_RETRY_BACKOFF:.0f}s")
+            return False
+        self._load_failed_at = 0.0
+        self._loaded = True
+        return True
+    
+    def _evict_when_idle(self):
+        check_interval = max(1.0, min(60.0, self._idle_ttl / 4))
+        while not self._evictor_stop.wait(check_interval):
+            with self._residency_lock:
+                idle = time.monotonic() - self._last_used
+                if self._loaded and self._active_searches == 0 and idle >= self._idle_ttl:
+                    self._unload()
+    
+    def _unload(self):
+        """Drop the in-memory graph and its indexes; the next search reloads them"""
+        nodes = self.graph.number_of_nodes()
+        self.graph = nx.DiGraph()
+        self.entity_index = {}
+        self.entity_text_index = defaultdict(set)
+        self.search_cache = {}
+        self.neighbor_cache = {}
+        self._loaded = False
+        gc.collect()
+        logger.info(f"Unloaded idle knowledge graph ({nodes:,} nodes)")
     
     def add_triple(self, subject: str, predicate: str, object: str, metadata: Dict = None):
         """Add a triple to the knowledge graph"""
@@ -97,6 +197,18 @@ class GraphStore:
             del self.neighbor_cache[entity_lower]
     
     async def search_entity(self, entity: str, hop_distance: int = 2, limit: int = 20) -> List[Dict]:
+        """Entity search, loading an attached graph first if it is not resident"""
+        # Pinning a resident graph is quick; loading one runs on a worker thread
+        if not (self.is_loaded and self._pin(load=False)):
+            if self._in_load_backoff() or not await asyncio.to_thread(self._pin, True):
+                return []
+        
+        try:
+            return await self._search_entity(entity, hop_distance, limit)
+        finally:
+            self._unpin()
+    
+    async def _search_entity(self, entity: str, hop_distance: int, limit: int) -> List[Dict]:
         """OPTIMIZED entity search with caching and performance improvements"""
         self.stats["searches"] += 1
         
@@ -328,32 +440,33 @@ class GraphStore:
     
     def save(self, path: str):
         """Save graph to disk"""
-        with open(f"{path}.pkl", "wb") as f:
+        # Write to a temp file and swap it in atomically
+        with open(f"{path}.pkl.tmp", "wb") as f:
             pickle.dump({
                 "graph": self.graph,
                 "entity_index": self.entity_index,
                 "entity_text_index": dict(self.entity_text_index),
                 "stats": self.stats
             }, f)
+        os.replace(f"{path}.pkl.tmp", f"{path}.pkl")
         logger.info(f"Saved graph with {self.graph.number_of_nodes()} nodes and {self.graph.number_of_edges()} edges")
     
     def load(self, path: str):
         """Load graph from disk"""
         try:
-            with open(f"{path}.pkl", "rb") as f:
-                data = pickle.load(f)
-                self.graph = data["graph"]
-                self.entity_index = data["entity_index"]
-                
-                # Load optional new fields with defaults
-                if "entity_text_index" in data:
-                    self.entity_text_index = defaultdict(set, data["entity_text_index"])
-                else:
-                    self._rebuild_text_index()
-                
-                if "stats" in data:
-                    self.stats.update(data["stats"])
-                
+            data = pickle.loads(read_file_uring(f"{path}.pkl"))
+            self.graph = data["graph"]
+            self.entity_index = data["entity_index"]
+            
+            # Load optional new fields with defaults
+            if "entity_text_index" in data:
+                self.entity_text_index = defaultdict(set, data["entity_text_index"])
+            else:
+                self._rebuild_text_index()
+            
+            if "stats" in data:
+                self.stats.update(data["stats"])
+            
             logger.info(f"Loaded graph with {self.graph.number_of_nodes()} nodes and {self.graph.number_of_edges()} edges")
         except Exception as e:
             logger.error(f"Failed to load graph: {e}")
@@ -0,0 +1,48 @@
+# retrieval/hugepages.py
+"""
+Opt large index buffers into transparent huge pages (Linux madvise)
+"""
+
+import sys
+import ctypes
+import mmap
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MADV_HUGEPAGE = 14
+HUGEPAGE_SIZE = 2 * 1024 * 1024  # Smaller buffers cannot hold a single huge page
+
+_libc = None
+
+def _get_libc():
+    global _libc
+    if _libc is None:
+        _libc = ctypes.CDLL(None, use_errno=True)
+        _libc.madvise.argtypes = [ctypes.c_void_p, ctypes.c_size_t, ctypes.c_int]
+        _libc.madvise.restype = ctypes.c_int
+    return _libc
+
+def advise_hugepage(buf: np.ndarray) -> bool:
+    """
+    Ask the kernel to back a large array with 2 MiB pages, cutting TLB misses
+    on random access. Only applies in THP "madvise" or "always" mode; a no-op
+    elsewhere. Returns True if the advice was accepted.
+    """
+    if not sys.platform.startswith("linux") or buf is None or buf.nbytes < HUGEPAGE_SIZE:
+        return False
+
+    # madvise needs a page-aligned start; the partial first page is skipped
+    addr = buf.ctypes.data
+    page = mmap.PAGESIZE
+    aligned = (addr + page - 1) & ~(page - 1)
+    length = buf.nbytes - (aligned - addr)
+    try:
+        if _get_libc().madvise(aligned, length, MADV_HUGEPAGE) != 0:
+            logger.debug(f"madvise(MADV_HUGEPAGE) failed: {ctypes.get_errno()}")
+            return False
+    except (OSError, AttributeError) as e:
+        logger.debug(f"madvise unavailable: {e}")
+        return False
+    return True
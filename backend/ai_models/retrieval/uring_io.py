@@ -0,0 +1,84 @@
+# retrieval/uring_io.py
+"""
+Whole-file reads for the large index pickles, batched through io_uring when available
+"""
+
+import os
+import sys
+import logging
+from collections import deque
+from typing import Union
+
+logger = logging.getLogger(__name__)
+
+# io_uring is optional: Linux-only and needs the liburing bindings. Releases
+# before 2026.3.30 expose an older API under different names, so check for it
+try:
+    import liburing
+    URING_AVAILABLE = sys.platform.startswith("linux") and hasattr(liburing, "Ring") and hasattr(liburing, "Iovec")
+except ImportError:
+    URING_AVAILABLE = False
+
+CHUNK_SIZE = 16 * 1024 * 1024  # 16MB per read request
+MAX_IN_FLIGHT = 32             # Submission queue depth
+
+def _read_with_uring(path: str) -> bytearray:
+    """
+    Read a file into one preallocated buffer, with up to MAX_IN_FLIGHT chunked
+    reads queued at once. Each request reads straight into its own slice of
+    the buffer, so there are no per-chunk buffers and no join at the end.
+    """
+    size = os.path.getsize(path)
+    data = bytearray(size)
+    view = memoryview(data)
+    pending = deque((offset, min(CHUNK_SIZE, size - offset)) for offset in range(0, size, CHUNK_SIZE))
+
+    fd = os.open(path, os.O_RDONLY)
+    ring = liburing.Ring()
+    cqe = liburing.Cqe()
+    liburing.io_uring_queue_init(MAX_IN_FLIGHT, ring)
+    try:
+        in_flight = {}
+        while pending or in_flight:
+            # Keep the submission queue full
+            while pending and len(in_flight) < MAX_IN_FLIGHT:
+                offset, length = pending.popleft()
+                iov = liburing.Iovec([view[offset:offset + length]])
+                sqe = liburing.io_uring_get_sqe(ring)
+                liburing.io_uring_prep_readv(sqe, fd, iov, offset)
+                liburing.io_uring_sqe_set_data64(sqe, offset)
+                # The iovec must stay alive until its read completes
+                in_flight[offset] = (length, iov)
+            liburing.io_uring_submit(ring)
+
+            liburing.io_uring_wait_cqe(ring, cqe)
+            result, offset = cqe[0].res, cqe[0].user_data
+            liburing.io_uring_cq_advance(ring, 1)
+
+            length, _ = in_flight.pop(offset)
+            if result < 0:
+                raise OSError(-result, os.strerror(-result), path)
+            if result == 0:
+                raise EOFError(f"Unexpected end of file while reading {path}")
+            if result < length:
+                # Short read - queue the remainder of this chunk
+                pending.append((offset + result, length - result))
+    finally:
+        liburing.io_uring_queue_exit(ring)
+        os.close(fd)
+
+    return data
+
+def read_file_uring(path: str) -> Union[bytes, bytearray]:
+    """
+    Read a whole file into memory. Uses io_uring on Linux when liburing is
+    installed, otherwise (or if the ring fails for any reason) a plain read.
+    """
+    if URING_AVAILABLE:
+        try:
+            return _read_with_uring(path)
+        except Exception as e:
+            logger.debug(f"io_uring read of {path} failed ({e}), falling back to buffered read")
+
+    with open(path, "rb") as f:
+        return f.read()
@@ -7,11 +7,26 @@ import numpy as np
 import faiss
 import pickle
 import os
+from mmap import mmap as memory_map, ACCESS_READ
 from typing import List, Dict, Any, Tuple
 import logging
 
+from .hugepages import advise_hugepage
+from .document_sidecar import DocumentSidecar, write_document_sidecar, sidecar_exists
+
 logger = logging.getLogger(__name__)
 
+# Large corpora use an IVF-PQ index: sqrt(N) inverted lists with 8-bit PQ codes,
+# whose centroids are searched through an HNSW graph instead of a flat scan.
+# Below IVF_MIN_DOCS the exact flat index is fast enough and needs no training.
+# Search-time nprobe / efSearch come from config.retrieval.
+IVF_MIN_DOCS = 50000
+PQ_M = 64
+PQ_NBITS = 8
+HNSW_M = 32
+TRAIN_POINTS_PER_CENTROID = 39  # FAISS warns below this many points per centroid
+IVF_FOURCC_PREFIX = b"Iw"  # FAISS serializes every IVF index type with an "Iw.." fourcc
+
 class VectorStore:
     """FAISS-based vector store for semantic search"""
     
@@ -28,6 +43,7 @@ class VectorStore:
         self.index = None
         self.documents = []
         self.metadata = []
+        self._sidecar = None  # Set while documents/metadata are lazy views over the on-disk sidecar
         
         if os.path.exists(f"{index_path}.faiss"):
             self.load_index(index_path)
@@ -70,20 +86,68 @@ class VectorStore:
         self.index = faiss.IndexIDMap(self.index)
         logger.info("Using CPU FAISS index")
     
-    def add_documents(self, documents: List[Dict[str, Any]], batch_size: int = None):
-        """Add documents to the vector store with optimized batching and detailed progress monitoring"""
+    def _initialize_ivfpq_index(self, num_documents: int) -> int:
+        """
+        Replace the empty flat index with an untrained IVF-HNSW-PQ index sized for
+        num_documents. Returns how many vectors to collect before training.
+        """
+        nlist = int(np.sqrt(num_documents))
+        # HNSW coarse quantizer: O(log nlist) centroid lookup per query and per add
+        quantizer = faiss.IndexHNSWFlat(self.dimension, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        self.index = faiss.IndexIVFPQ(
+            quantizer, self.dimension, nlist, PQ_M, PQ_NBITS, faiss.METRIC_INNER_PRODUCT
+        )
+        self._apply_search_params()
+        logger.info(f"Using IVF-HNSW-PQ FAISS index (nlist={nlist}, m={PQ_M}, nbits={PQ_NBITS}, hnsw_m={HNSW_M})")
+        
+        train_size = max(nlist, 2 ** PQ_NBITS) * TRAIN_POINTS_PER_CENTROID
+        return min(num_documents, train_size)
+    
+    def _apply_search_params(self):
+        """Apply search-time nprobe / HNSW efSearch to IVF indexes (no-op for flat ones)"""
+        from config.settings import config
+        
+        try:
+            ivf = faiss.extract_index_ivf(self.index)
+        except RuntimeError:
+            return  # Not an IVF index
+        ivf.nprobe = config.retrieval.ivf_nprobe
+        
+        quantizer = faiss.downcast_index(ivf.quantizer)
+        if isinstance(quantizer, faiss.IndexHNSW):
+            # efSearch must cover nprobe or HNSW cannot return that many centroids
+            quantizer.hnsw.efSearch = max(config.retrieval.hnsw_ef_search, ivf.nprobe)
+    
+    def add_documents(self, documents: List[Dict[str, Any]], batch_size: int = None,
+                      encode_batch_size: int = None, embedding_cache: Any = None):
+        """
+        Add documents to the vector store with optimized batching and detailed progress monitoring
+        
+        Args:
+            documents: Documents with "text" and "metadata"
+            batch_size: Documents embedded and added per iteration
+            encode_batch_size: Texts per embedding forward pass (defaults to batch_size)
+            embedding_cache: Optional EmbeddingCache to skip texts embedded by earlier builds
+        """
         from config.settings import config
         import time
         import psutil
         import os
         
+        # Appending needs real lists
+        self._materialize_documents()
+        
         # Use config batch size if not specified
         if batch_size is None:
             batch_size = config.system.embedding_batch_size
+        if encode_batch_size is None:
+            encode_batch_size = batch_size
         
         # Initialize monitoring
         process = psutil.Process(os.getpid())
-        initial_cpu_percent = psutil.cpu_percent(interval=1, percpu=True)
+        # Non-blocking sampling: each call reports usage since the previous one,
+        # so the after-encode sample covers exactly the embedding work
+        initial_cpu_percent = psutil.cpu_percent(interval=None, percpu=True)
         initial_memory = process.memory_info().rss / 1024 / 1024 / 1024  # GB
         
         # Define chunk_size early to avoid variable scope issues
@@ -93,7 +157,7 @@ class VectorStore:
         logger.info(f"VECTOR STORE INDEXING - STARTING")
         logger.info("="*80)
         logger.info(f"Total documents to process: {len(documents):,}")
-        logger.info(f"Embedding batch size: {batch_size}")
+        logger.info(f"Embedding batch size: {batch_size} (forward pass: {encode_batch_size})")
         logger.info(f"Vector index batch size: {chunk_size}")
         logger.info(f"CPU cores available: {psutil.cpu_count()} (configured: {config.system.max_workers} workers)")
         logger.info(f"Initial RAM usage: {initial_memory:.2f} GB / {psutil.virtual_memory().total / 1024 / 1024 / 1024:.2f} GB")
@@ -101,6 +165,15 @@ class VectorStore:
         logger.info(f"Checkpoint interval: every {config.system.save_checkpoint_interval:,} documents")
         logger.info("="*80)
         
+        # Let FAISS training and adds use every core
+        faiss.omp_set_num_threads(os.cpu_count())
+        
+        # Switch a fresh index to IVF-PQ when the corpus is large enough
+        train_size = 0
+        if (self.index.ntotal == 0 and len(documents) >= IVF_MIN_DOCS
+                and self.dimension % PQ_M == 0 and not isinstance(self.index, faiss.IndexIVF)):
+            train_size = self._initialize_ivfpq_index(len(documents))
+        
         start_time = time.time()
         
         # Process in chunks to avoid memory issues
@@ -122,7 +195,7 @@ class VectorStore:
             logger.info(f"Processing documents {i+1} to {min(i+current_batch_size, len(documents))}")
             
             # Monitor CPU usage before encoding
-            cpu_before = psutil.cpu_percent(interval=0.1, percpu=True)
+            cpu_before = psutil.cpu_percent(interval=None, percpu=True)
             active_cores = sum(1 for cpu in cpu_before if cpu > 30)  # Count cores with >30% usage
             max_cpu = max(cpu_before) if cpu_before else 0
             logger.info(f"CPU cores active: {active_cores}/{len(cpu_before)} | Peak usage: {max_cpu:.1f}% | Cores: {[f'{cpu:.0f}%' for cpu in cpu_before[:10]]}{'...' if len(cpu_before) > 10 else ''}")
@@ -130,13 +203,18 @@ class VectorStore:
             # Generate embeddings
             logger.info("🔥 Generating embeddings with maximum CPU utilization...")
             embed_start = time.time()
-            embeddings = self.embedding_manager.encode(texts, 
-                                                     show_progress_bar=True,
-                                                     batch_size=batch_size)
+            if embedding_cache is not None:
+                embeddings = self.embedding_manager.encode_cached(texts, embedding_cache,
+                                                                  show_progress_bar=True,
+                                                                  batch_size=encode_batch_size)
+            else:
+                embeddings = self.embedding_manager.encode(texts, 
+                                                         show_progress_bar=True,
+                                                         batch_size=encode_batch_size)
             embed_time = time.time() - embed_start
             
             # Monitor CPU usage after encoding
-            cpu_after = psutil.cpu_percent(interval=0.1, percpu=True)
+            cpu_after = psutil.cpu_percent(interval=None, percpu=True)
             avg_cpu = sum(cpu_after) / len(cpu_after)
             peak_cpu = max(cpu_after) if cpu_after else 0
             cores_utilized = sum(1 for cpu in cpu_after if cpu > 50)  # Count heavily utilized cores
@@ -150,8 +228,8 @@ class VectorStore:
                 logger.warning(f"   - Check if multiprocessing is working correctly")
                 logger.warning(f"   - Verify sentence-transformers version supports multiprocessing")
             
-            # Normalize embeddings for cosine similarity
-            embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+            # Embeddings come back unit-normalized from the encoder (normalize_embeddings=True),
+            # ready for inner-product search - no second normalization pass needed
             
             # Generate IDs
             start_id = len(self.documents)
@@ -166,10 +244,24 @@ class VectorStore:
             all_ids.append(ids)
             
             # Add to FAISS index in chunks
-            if len(all_embeddings) * batch_size >= chunk_size or i + batch_size >= len(documents):
+            is_last_batch = i + batch_size >= len(documents)
+            flush = len(all_embeddings) * batch_size >= chunk_size or is_last_batch
+            
+            # An IVF-PQ index must be trained before the first add - keep
+            # collecting embeddings until there are enough training points
+            if flush and not self.index.is_trained:
+                pending = sum(len(e) for e in all_embeddings)
+                flush = pending >= train_size or is_last_batch
+            
+            if flush:
                 # Combine and add to index
-                combined_embeddings = np.vstack(all_embeddings)
+                combined_embeddings = np.vstack(all_embeddings).astype('float32')
                 combined_ids = np.hstack(all_ids)
+                if not self.index.is_trained:
+                    logger.info(f"Training IVF-PQ index on {len(combined_embeddings):,} embeddings...")
+                    train_start = time.time()
+                    self.index.train(combined_embeddings)
+                    logger.info(f"IVF-PQ training took {time.time() - train_start:.2f}s")
                 logger.info(f"Adding {len(combined_ids)} embeddings to FAISS index...")
                 faiss_start = time.time()
                 self.index.add_with_ids(combined_embeddings, combined_ids)
@@ -419,31 +511,90 @@ class VectorStore:
         # Create directory if it doesn't exist
         os.makedirs(os.path.dirname(save_path), exist_ok=True)
         
-        # Save FAISS index
-        faiss.write_index(self.index, f"{save_path}.faiss")
+        # Write to temp files and swap them in atomically, so a reader (or a
+        # crash mid-save) never sees a half-written index
+        # The sidecar may be the file being replaced, so read it fully first
+        self._materialize_documents()
+        faiss.write_index(self.index, f"{save_path}.faiss.tmp")
+        write_document_sidecar(save_path, self.documents, self.metadata)
+        os.replace(f"{save_path}.faiss.tmp", f"{save_path}.faiss")
         
-        # Save documents and metadata
-        with open(f"{save_path}.pkl", "wb") as f:
-            pickle.dump({
-                "documents": self.documents,
-                "metadata": self.metadata
-            }, f)
+        # The JSONL sidecar supersedes the old pickle
+        if os.path.exists(f"{save_path}.pkl"):
+            os.remove(f"{save_path}.pkl")
         
         logger.info(f"Saved vector store to {save_path}")
     
-    def load_index(self, path: str):
-        """Load index from disk"""
+    def _materialize_documents(self):
+        """Replace lazy sidecar views with in-memory lists and release the sidecar"""
+        if self._sidecar is None:
+            return
+        self.documents = list(self.documents)
+        self.metadata = list(self.metadata)
+        self._sidecar.close()
+        self._sidecar = None
+    
+    def _advise_hugepages(self):
+        """Back the raw vectors of an in-RAM flat index with huge pages"""
+        index = self.index
+        if isinstance(index, faiss.IndexIDMap):
+            index = faiss.downcast_index(index.index)
+        if isinstance(index, faiss.IndexFlat) and index.ntotal:
+            # Zero-copy numpy view over the index's own vector storage
+            advise_hugepage(faiss.rev_swig_ptr(index.get_xb(), index.ntotal * index.d))
+    
+    @staticmethod
+    def _is_ivf_file(faiss_path: str) -> bool:
+        """Peek at the index header to tell IVF indexes apart without loading them"""
+        with open(faiss_path, "rb") as f:
+            return f.read(4).startswith(IVF_FOURCC_PREFIX)
+    
+    def load_index(self, path: str, mmap: bool = True):
+        """
+        Load index from disk. With mmap, IVF inverted lists stay on disk and are
+        paged in on demand, and document text and metadata are read from the
+        mapped JSONL sidecar only when a search returns them. Indexes saved with
+        the older pickle sidecar still load.
+        """
         try:
             # Load FAISS index
-            logger.info(f"Loading FAISS index from {path}.faiss")
-            self.index = faiss.read_index(f"{path}.faiss")
+            faiss_path = f"{path}.faiss"
+            logger.info(f"Loading FAISS index from {faiss_path}")
+            if mmap and self._is_ivf_file(faiss_path):
+                self.index = faiss.read_index(faiss_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+                logger.info("FAISS index mmapped — first queries may be slower until warm")
+            else:
+                # Flat indexes cannot be mmapped and are read fully into RAM
+                self.index = faiss.read_index(faiss_path)
+                self._advise_hugepages()
+            self._apply_search_params()
             
             # Load documents and metadata
-            logger.info(f"Loading documents and metadata from {path}.pkl")
-            with open(f"{path}.pkl", "rb") as f:
-                data = pickle.load(f)
-                self.documents = data.get("documents", [])
-                self.metadata = data.get("metadata", [])
+            if self._sidecar is not None:
+                self._sidecar.close()
+                self._sidecar = None
+            if sidecar_exists(path):
+                logger.info(f"Opening documents and metadata sidecar for {path}")
+                sidecar = DocumentSidecar(path)
+                if mmap:
+                    self._sidecar = sidecar
+                    self.documents = sidecar.documents
+                    self.metadata = sidecar.metadata
+                else:
+                    self.documents = list(sidecar.documents)
+                    self.metadata = list(sidecar.metadata)
+                    sidecar.close()
+            else:
+                logger.info(f"Loading documents and metadata from legacy {path}.pkl")
+                with open(f"{path}.pkl", "rb") as f:
+                    if mmap:
+                        # Unpickle straight from the page cache instead of buffered reads
+                        with memory_map(f.fileno(), 0, access=ACCESS_READ) as mapped:
+                            data = pickle.load(mapped)
+                    else:
+                        data = pickle.load(f)
+                    self.documents = data.get("documents", [])
+                    self.metadata = data.get("metadata", [])
             
             # Validate loaded data
             if not self.documents:
@@ -24,11 +24,11 @@ def check_python_version():
     """Check if Python version is compatible"""
     print_step(1, "Checking Python version...")
     version = sys.version_info
-    if version.major == 3 and version.minor >= 8:
+    if version.major == 3 and version.minor >= 9:
         print(f"✓ Python {version.major}.{version.minor}.{version.micro} - Compatible")
         return True
     else:
-        print(f"✗ Python {version.major}.{version.minor}.{version.micro} - Requires Python 3.8+")
+        print(f"✗ Python {version.major}.{version.minor}.{version.micro} - Requires Python 3.9+")
         return False
 
 def install_requirements():
@@ -209,7 +209,7 @@ def check_indexes():
     
     index_files = [
         "indexes/vector_store/mental_health_index.faiss",
-        "indexes/vector_store/mental_health_index.pkl",
+        "indexes/vector_store/mental_health_index.docs.jsonl",
         "indexes/bm25_index.pkl"
     ]
     
@@ -33,8 +33,8 @@ def print_status(message, status="info"):
 def check_python_version():
     """Check if Python version is compatible"""
     version = sys.version_info
-    if version.major != 3 or version.minor < 8:
-        print_status(f"Python {version.major}.{version.minor} detected. Requires Python 3.8+", "error")
+    if version.major != 3 or version.minor < 9:
+        print_status(f"Python {version.major}.{version.minor} detected. Requires Python 3.9+", "error")
         return False
     print_status(f"Python {version.major}.{version.minor} - Compatible ✓", "success")
     return True
@@ -88,7 +88,7 @@ def check_indexes():
     """Check if required indexes exist"""
     index_paths = [
         "indexes/vector_store/mental_health_index.faiss",
-        "indexes/vector_store/mental_health_index.pkl",
+        "indexes/vector_store/mental_health_index.docs.jsonl",
         "indexes/bm25_index.pkl"
     ]
     
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Checks the sparse BM25 scoring against rank_bm25.BM25Okapi, which it replaced
+"""
+
+import pickle
+import random
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# Add the current directory to the path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from retrieval.bm25_search import BM25Search
+
+@pytest.fixture
+def bm25okapi():
+    """Reference implementation - only the comparison tests need rank_bm25"""
+    return pytest.importorskip("rank_bm25").BM25Okapi
+
+def _corpus(num_docs: int = 400, seed: int = 3):
+    rng = random.Random(seed)
+    vocab = [f"term{i}" for i in range(60)]
+    # "common" appears in most documents, so its IDF goes negative and gets the epsilon floor
+    return [
+        " ".join(rng.choices(vocab, k=rng.randint(1, 25)) + (["common"] if rng.random() < 0.8 else []))
+        for _ in range(num_docs)
+    ]
+
+QUERIES = [
+    "term1",
+    "term2 term3 term4",
+    "term5 term5",  # Repeated query terms count once per occurrence
+    "common",
+    "common term7",
+    "missing",
+    "term9 missing",
+]
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_scores_match_bm25okapi(bm25okapi, query):
+    documents = _corpus()
+    reference = bm25okapi([doc.lower().split() for doc in documents])
+    index = BM25Search(list(documents))
+    
+    tokens = query.lower().split()
+    np.testing.assert_allclose(index.get_scores(tokens), reference.get_scores(tokens), rtol=1e-5, atol=1e-6)
+
+def test_incremental_adds_match_bm25okapi(bm25okapi):
+    documents = _corpus()
+    reference = bm25okapi([doc.lower().split() for doc in documents])
+    index = BM25Search()
+    for start in range(0, len(documents), 64):
+        index.add_documents(documents[start:start + 64])
+    
+    for query in QUERIES:
+        tokens = query.lower().split()
+        np.testing.assert_allclose(index.get_scores(tokens), reference.get_scores(tokens), rtol=1e-5, atol=1e-6)
+
+def test_save_and_load_round_trip(tmp_path):
+    documents = _corpus()
+    path = str(tmp_path / "bm25_index.pkl")
+    BM25Search(list(documents)).save(path)
+    
+    loaded = BM25Search()
+    loaded.load(path)
+    tokens = "term2 term3".split()
+    np.testing.assert_allclose(loaded.get_scores(tokens), BM25Search(list(documents)).get_scores(tokens))
+
+def test_legacy_pickle_is_converted_and_saved(tmp_path):
+    documents = _corpus(num_docs=50)
+    path = tmp_path / "bm25_index.pkl"
+    with open(path, "wb") as f:
+        pickle.dump({"documents": documents, "tokenized_docs": [doc.lower().split() for doc in documents]}, f)
+    
+    index = BM25Search()
+    index.load(str(path))
+    np.testing.assert_allclose(index.get_scores(["term1"]), BM25Search(list(documents)).get_scores(["term1"]))
+    
+    # Written back in the current format, term matrix included
+    assert (tmp_path / "bm25_index.npz").exists()
+    with open(path, "rb") as f:
+        assert "tokenized_docs" not in pickle.load(f)
+
+def test_missing_term_matrix_is_rebuilt(tmp_path):
+    documents = _corpus(num_docs=50)
+    path = tmp_path / "bm25_index.pkl"
+    BM25Search(list(documents)).save(str(path))
+    (tmp_path / "bm25_index.npz").unlink()
+    
+    index = BM25Search()
+    index.load(str(path))
+    assert index.get_scores(["term1"]).shape == (len(documents),)
+    assert (tmp_path / "bm25_index.npz").exists()
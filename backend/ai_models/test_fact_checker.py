@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Checks how FactChecker parses batched fact-check results - one "CLAIM n:" block per claim
+"""
+
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+# Add the current directory to the path
+sys.path.insert(0, str(Path(__file__).parent))
+
+# config.settings refuses to load without a key; no LLM is called here
+os.environ.setdefault("GROQ_API_KEY", "test-key")
+
+from refinement.fact_checker import FactChecker
+
+CLAIMS = ["Exercise reduces anxiety", "Sleep affects mood", "Caffeine cures depression"]
+CONTEXT = [{"text": "Regular exercise lowers anxiety."}, {"text": "Poor sleep worsens mood."}]
+
+def _block(number: int, supported: str, sources: str = "1", confidence: str = "0.9", header: str = "CLAIM") -> str:
+    return (
+        f"{header} {number}:\n"
+        f"SUPPORTED: {supported}\n"
+        f"SOURCES: {sources}\n"
+        f"CONTRADICTIONS: no\n"
+        f"CONFIDENCE: {confidence}\n"
+        f"EXPLANATION: claim {number} checked\n"
+    )
+
+class FakeLLM:
+    """Returns the batched reply first, then one single-claim reply per individual check"""
+    
+    def __init__(self, batched_reply: str):
+        self.batched_reply = batched_reply
+        self.prompts = []
+    
+    async def ainvoke(self, prompt: str) -> str:
+        self.prompts.append(prompt)
+        if len(self.prompts) == 1:
+            return self.batched_reply
+        return "SUPPORTED: partially\nSOURCES: none\nCONTRADICTIONS: yes\nCONFIDENCE: 0.3\nEXPLANATION: rechecked"
+
+def _check(reply: str, claims=CLAIMS):
+    llm = FakeLLM(reply)
+    results = asyncio.run(FactChecker(llm).check_facts_batched(claims, CONTEXT))
+    return results, llm.prompts
+
+def test_blocks_in_order():
+    reply = _block(1, "yes") + "\n" + _block(2, "partially", "1, 2", "0.6") + "\n" + _block(3, "no", "none", "0.1")
+    results, prompts = _check(reply)
+
+    assert len(prompts) == 1
+    assert [r["claim"] for r in results] == CLAIMS
+    assert [r["supported"] for r in results] == ["yes", "partially", "no"]
+    assert results[1]["sources"] == [1, 2]
+    assert results[2]["sources"] == []
+    assert [r["confidence"] for r in results] == [0.9, 0.6, 0.1]
+    assert results[0]["explanation"] == "claim 1 checked"
+    assert not any(r["has_contradictions"] for r in results)
+
+def test_reordered_blocks_are_matched_by_number():
+    reply = _block(3, "no") + _block(1, "yes") + _block(2, "partially")
+    results, prompts = _check(reply)
+
+    assert len(prompts) == 1
+    assert [r["supported"] for r in results] == ["yes", "partially", "no"]
+    assert [r["claim"] for r in results] == CLAIMS
+
+def test_lowercase_headers_and_fields():
+    reply = (
+        _block(1, "yes", header="claim")
+        + _block(2, "no", header="Claim").replace("SUPPORTED:", "supported:").replace("CONFIDENCE:", "Confidence:")
+        + _block(3, "partially", header="CLAIM")
+    )
+    results, prompts = _check(reply)
+
+    assert len(prompts) == 1
+    assert [r["supported"] for r in results] == ["yes", "no", "partially"]
+    assert results[1]["confidence"] == 0.9
+
+def test_missing_block_is_checked_individually():
+    reply = _block(1, "yes") + _block(3, "no")
+    results, prompts = _check(reply)
+
+    # One batched call plus one call for the skipped claim
+    assert len(prompts) == 2
+    assert CLAIMS[1] in prompts[1] and CLAIMS[0] not in prompts[1]
+    assert [r["supported"] for r in results] == ["yes", "partially", "no"]
+    assert results[1]["claim"] == CLAIMS[1]
+    assert results[1]["has_contradictions"] is True
+
+def test_unparseable_reply_checks_every_claim():
+    results, prompts = _check("I could not verify these claims.")
+
+    assert len(prompts) == 1 + len(CLAIMS)
+    assert [r["claim"] for r in results] == CLAIMS
+    assert all(r["supported"] == "partially" for r in results)
+
+def test_claim_quoted_in_explanation_does_not_split_block():
+    reply = _block(1, "yes").replace("claim 1 checked", "unlike claim 2: this one holds") + _block(2, "no")
+    results, _ = _check(reply, CLAIMS[:2])
+
+    assert results[0]["supported"] == "yes"
+    assert results[0]["explanation"] == "unlike claim 2: this one holds"
+    assert results[1]["supported"] == "no"
+
+def test_repeated_block_last_one_wins():
+    reply = _block(1, "no") + _block(2, "yes") + _block(1, "yes")
+    results, prompts = _check(reply, CLAIMS[:2])
+
+    assert len(prompts) == 1
+    assert [r["supported"] for r in results] == ["yes", "yes"]
+
+def test_out_of_range_block_is_ignored():
+    reply = _block(1, "yes") + _block(2, "no") + _block(7, "partially")
+    results, prompts = _check(reply, CLAIMS[:2])
+
+    assert len(prompts) == 1
+    assert [r["supported"] for r in results] == ["yes", "no"]
+
+def test_single_claim_uses_single_prompt():
+    results, prompts = _check("", CLAIMS[:1])
+
+    assert len(prompts) == 1
+    assert "CLAIM <number>" not in prompts[0]
+    assert results[0]["claim"] == CLAIMS[0]
+
+def test_parse_defaults_for_malformed_fields():
+    parsed = FactChecker(None)._parse_fact_check_result("SUPPORTED: Yes\nCONFIDENCE: high\nSOURCES: none")
+
+    assert parsed["supported"] == "yes"
+    assert parsed["confidence"] == 0.5
+    assert parsed["sources"] == []
+    assert parsed["explanation"] == ""
@@ -284,7 +284,8 @@ class SingleModelTester:
         try:
             # First try to import existing instance
             try:
-                from main import genie
+                from main import get_genie
+                genie = get_genie()
                 if genie is not None:
                     self.genie = genie
                     self.current_provider, current_model = self.get_current_provider()
@@ -327,7 +328,7 @@ class SingleModelTester:
             
             # Store global instance for other imports
             import main
-            main.genie = self.genie
+            main._genie = self.genie
             
             return True
             
@@ -770,7 +771,8 @@ def check_environment():
     
     # Check if GenieAI is already initialized
     try:
-        from main import genie
+        from main import get_genie
+        genie = get_genie()
         if genie is not None:
             print(f"{SUCCESS}{CHECK_MARK} GenieAI already initialized{RESET}")
             system_info = genie.get_system_info()
@@ -804,7 +806,8 @@ async def interactive_test():
     
     # Use existing genie instance
     try:
-        from main import genie
+        from main import get_genie
+        genie = get_genie()
         if genie is None:
             print(f"{ERROR}GenieAI not initialized. Please run the main system first.{RESET}")
             return
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Checks the response scanning helpers behind ConfidenceScorer and ChainOfVerification
+against the straightforward list-based versions they replaced
+"""
+
+import os
+import re
+import sys
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# Add the current directory to the path
+sys.path.insert(0, str(Path(__file__).parent))
+
+# config.settings refuses to load without a key; no LLM is called here
+os.environ.setdefault("GROQ_API_KEY", "test-key")
+
+from refinement.confidence import _scan_structure
+from refinement.cove import ChainOfVerification, _WORD_RE, AHOCORASICK_AVAILABLE
+
+RESPONSES = [
+    "",
+    "   ",
+    "No punctuation at all",
+    "One sentence.",
+    "First. Second one here! Third, the longest sentence of them all?",
+    "...!!!???",
+    "Para one. Still one.\n\nPara two has a few more words in it.\n\n\n\nPara three.",
+    "  Leading and trailing breaks.\n\n",
+    "Numbers like 3.5 split sentences. So do e.g. abbreviations.",
+    "Mixed\n\nbreaks\n\nwithout\n\nending punctuation",
+]
+
+def _reference_structure(response: str):
+    """The paragraph and sentence lists _scan_structure replaced"""
+    paragraphs = response.strip().split('\n\n')
+    sentence_lengths = [len(s.split()) for s in re.split(r'[.!?]+', response) if s.strip()]
+    return len(paragraphs), (float(np.var(sentence_lengths)) if sentence_lengths else None)
+
+@pytest.mark.parametrize("response", RESPONSES)
+def test_scan_structure_matches_reference(response):
+    paragraphs, variance = _scan_structure(response)
+    expected_paragraphs, expected_variance = _reference_structure(response)
+
+    assert paragraphs == expected_paragraphs
+    if expected_variance is None:
+        assert variance is None
+    else:
+        assert variance == pytest.approx(expected_variance)
+
+def test_scan_structure_variance_is_exact_for_integers():
+    # Sentences of 1, 2 and 3 words: population variance 2/3
+    assert _scan_structure("A. B c. D e f.") == (1, pytest.approx(2 / 3))
+
+@pytest.fixture(params=["automaton", "fallback"])
+def cove(request):
+    if request.param == "automaton" and not AHOCORASICK_AVAILABLE:
+        pytest.skip("pyahocorasick not installed")
+    chain = ChainOfVerification(None)
+    if request.param == "fallback":
+        chain._automaton = None
+    return chain
+
+def _categories(chain: ChainOfVerification, response: str) -> set:
+    response_lower = response.lower()
+    return chain._find_marker_categories(response_lower, Counter(_WORD_RE.findall(response_lower)))
+
+def test_marker_lists_split_into_words_and_phrases(cove):
+    for category, words in cove._marker_words.items():
+        markers = set(cove.quality_criteria[category])
+        phrases = set(cove._marker_phrases[category])
+        assert words | phrases == markers
+        assert not words & phrases
+        assert all(" " not in word for word in words)
+        assert all(" " in phrase for phrase in phrases)
+
+@pytest.mark.parametrize("response, expected", [
+    ("", set()),
+    ("The weather is nice today.", set()),
+    # Single words must be whole tokens
+    ("I Understand.", {"empathy_markers"}),
+    ("Trying harder is a misunderstanding.", set()),
+    ("Try a short walk.", {"action_words"}),
+    ("Ask a Therapist.", {"professional_terms"}),
+    # Phrases match as substrings, case-insensitively
+    ("It SOUNDS LIKE a hard week.", {"empathy_markers", "specificity_markers"}),  # "like" is a word marker too
+    ("Thank you for sharing.", {"empathy_markers"}),
+    ("For instance, one way is journaling.", {"specificity_markers", "action_words"}),
+    ("Talk to a mental health professional, for example.", {"professional_terms", "specificity_markers"}),
+    ("I hear you. Especially now, you can start by resting. A doctor can help.",
+     {"empathy_markers", "specificity_markers", "action_words", "professional_terms"}),
+])
+def test_find_marker_categories(cove, response, expected):
+    assert _categories(cove, response) == expected
+
+def test_every_phrase_marker_is_found(cove):
+    # Every multi-word marker is found on its own, inside surrounding text
+    for category, phrases in cove._marker_phrases.items():
+        for phrase in phrases:
+            assert category in _categories(cove, f"Well, {phrase.upper()} - really.")